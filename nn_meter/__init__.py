@@ -12,7 +12,8 @@ from functools import partial, partialmethod
 from .predictor import (
     nnMeterPredictor,
     load_latency_predictor,
-    list_latency_predictors
+    list_latency_predictors,
+    bundle_latency_predictor
 )
 from .ir_converter import (
     model_file_to_graph,
@@ -19,8 +19,11 @@ class FrozenPbConverter:
         # Change split to more firendly scheme
         parser.fix_split_naming(self.model_graph)
 
-        # Get the static shape
-        ShapeInference(self.model_graph, dynamic_fetcher)
+        # Get the static shape, and fetch the shapes of unsupported nodes in a single run
+        try:
+            ShapeInference(self.model_graph, dynamic_fetcher)
+        finally:
+            dynamic_fetcher.close()
 
         # Strip constant and indentity nodes
         parser.strip_useless_nodes(self.model_graph)
@@ -4,6 +4,7 @@ import numpy as np
 from typing import List
 from nn_meter.utils.import_package import try_import_tensorflow
 
+
 class ShapeFetcher:
     def __init__(self, input_graph):
         """
@@ -21,8 +22,9 @@ class ShapeFetcher:
 
         with graph.as_default():
             self.tf.import_graph_def(graph_def=input_graph, name="")
-        
+
         self.ops = graph.get_operations()
+        self.op_index = {op.name: op for op in self.ops}
         placeholders = list(filter(lambda op: op.type == "Placeholder", self.ops))
         assert len(placeholders) == 1
         self.graph_input_tensor = placeholders[0].outputs[0]
@@ -32,41 +34,68 @@ class ShapeFetcher:
         self.imsize = graph_input_tensor_shape[1]
         self.graph = graph
 
+        self.sess = None
+        self.fake_input = np.random.randn(1, self.imsize, self.imsize, 3)
+        self.shape_tensors = {}  # tensor name to the shape tensor of it
+        self.fetched_shapes = {}  # op name to the fetched input and output shapes of it
+
     def get_shape_by_name(self, op_name):
         """
-        Get the node output shape by its name
+        Get the node output shape by its name. The shapes prefetched by `fetch_shapes_by_names` are returned without
+        running the graph.
 
         Parameters
         ----------
         op_name : str
             The name of the target node.
         """
-        input_tensors_to_fetch = []
-        output_tensors_to_fetch = []
-        for op in filter(lambda op: op.name == op_name, self.ops):
-            input_tensors_to_fetch.extend(op.inputs)
-            output_tensors_to_fetch.extend(op.outputs)
-        
-        input_shape_tensors = []
-        for tensor in input_tensors_to_fetch:
-            input_shape_tensors.append(self.tf.compat.v1.shape(tensor))
-        
-        output_shape_tensors = []
-        for tensor in output_tensors_to_fetch:
-            output_shape_tensors.append(self.tf.compat.v1.shape(tensor))
+        if op_name not in self.fetched_shapes:
+            self.fetch_shapes_by_names([op_name])
+        return self.fetched_shapes[op_name]
+
+    def fetch_shapes_by_names(self, op_names: List[str]):
+        """
+        Fetch the input and output shapes of all the given nodes by a single run of the graph in the persistent session,
+        and keep them for `get_shape_by_name`.
+
+        Parameters
+        ----------
+        op_names : List[str]
+            The names of the target nodes.
+        """
+        fetches = {}
+        for op_name in op_names:
+            op = self.op_index.get(op_name)
+            if op is not None:
+                for tensor in list(op.inputs) + list(op.outputs):
+                    fetches[tensor.name] = self._get_shape_tensor(tensor)
+
+        results = {}
+        if fetches:
+            if self.sess is None:
+                self.sess = self.tf.compat.v1.Session(graph=self.graph)
+            names = list(fetches.keys())
+            values = self.sess.run(
+                [fetches[name] for name in names], feed_dict={self.graph_input_tensor: self.fake_input}
+            )
+            results = {name: value.tolist() for name, value in zip(names, values)}
+
+        for op_name in op_names:
+            op = self.op_index.get(op_name)
+            if op is None:
+                self.fetched_shapes[op_name] = ([], [])
+            else:
+                self.fetched_shapes[op_name] = (
+                    [results[tensor.name] for tensor in op.inputs],
+                    [results[tensor.name] for tensor in op.outputs],
+                )
 
-        
-        intput_shape_results = []
-        output_shape_results = []
-        with self.tf.compat.v1.Session(graph=self.graph) as sess:
-            fake_input = np.random.randn(1, self.imsize, self.imsize, 3)
-            for shape_tensor in input_shape_tensors:
-                intput_shape_results.append(sess.run(
-                    shape_tensor, feed_dict={self.graph_input_tensor: fake_input}
-                ).tolist())
-            for shape_tensor in output_shape_tensors:
-                output_shape_results.append(sess.run(
-                    shape_tensor, feed_dict={self.graph_input_tensor: fake_input}
-                ).tolist())
+    def _get_shape_tensor(self, tensor):
+        if tensor.name not in self.shape_tensors:
+            self.shape_tensors[tensor.name] = self.tf.compat.v1.shape(tensor)
+        return self.shape_tensors[tensor.name]
 
-        return intput_shape_results, output_shape_results
\ No newline at end of file
+    def close(self):
+        if self.sess is not None:
+            self.sess.close()
+            self.sess = None
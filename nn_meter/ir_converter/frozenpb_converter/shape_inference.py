@@ -911,7 +911,12 @@ class ShapeInference:
                     )
         return [[0, 0, 0, 0]], [[0, 0, 0, 0]]
 
-    def __init__(self, model_graph, dynamic_fetcher):
+    def is_static_supported(self, node_type):
+        return node_type in self.TF_PRODCAST_MATH_OPS or \
+            node_type in self.TF_PROPAGATE_MATH_OPS or \
+            node_type + "_get_shape" in dir(self)
+
+    def __init__(self, model_graph, dynamic_fetcher, batch_dynamic=True):
         """
         Take the graph, and append output shape
         and input shape to the attributes of nodes.
@@ -920,19 +925,30 @@ class ShapeInference:
         ----------
         model_graph : ModelGraph
             The ModelGraph IR class.
+        dynamic_fetcher : ShapeFetcher
+            The fetcher of the shapes of the nodes not supported by static inference.
+        batch_dynamic : bool
+            Whether to fetch the shapes of all the nodes not supported by static inference in a single run of the
+            graph before inference, instead of running the graph for each of them.
         """
         graph = model_graph.get_graph()
         seq = ph.get_graph_seq(graph, model_graph.get_graph_head())
 
+        if batch_dynamic:
+            dynamic_nodes = [
+                node_name for node_name in seq if not self.is_static_supported(model_graph.get_node_type(node_name))
+            ]
+            if dynamic_nodes:
+                logging.info("Fetching the shapes of %d nodes by dynamic fetcher in a single run." % len(dynamic_nodes))
+                dynamic_fetcher.fetch_shapes_by_names(dynamic_nodes)
+
         # Pass #1
         for node_name in seq:
             node_type = model_graph.get_node_type(node_name)
             node_get_shape_name = node_type + "_get_shape"
 
             # if node type find in supported ops, use faster static inference
-            if node_type in self.TF_PRODCAST_MATH_OPS or \
-                node_type in self.TF_PROPAGATE_MATH_OPS or \
-                node_get_shape_name in dir(self) :
+            if self.is_static_supported(node_type):
 
                 if node_type in self.TF_PRODCAST_MATH_OPS:
                     input_shape, output_shape = ShapeInference.eval_prodcast(graph, graph[node_name])
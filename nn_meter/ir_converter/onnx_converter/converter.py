@@ -23,15 +23,28 @@ class OnnxConverter:
                 "outputs": [],
             }
 
+        # index the producers and consumers of tensors and the slice ops of each tensor in one pass. The slices of a
+        # tensor are merged into one node of the first slice op, with the outputs of the sibling slices.
+        self.slice_groups = {}
+        self.selected_slices = set()
+        sliced_tensors = set()
         for node in self.graph.node:
+            is_slice = node.op_type == SLICE_TYPE
             for input_name in node.input:
                 if input_name in self.tensors:
                     self.tensors[input_name]["outputs"].append(node)
+                    if is_slice:
+                        self.slice_groups.setdefault(input_name, []).append(
+                            (node.name, [output_name for output_name in node.output if output_name in self.tensors])
+                        )
             for output_name in node.output:
                 if output_name in self.tensors:
                     self.tensors[output_name]["inputs"].append(node)
+            if is_slice and node.input[0] not in sliced_tensors:
+                sliced_tensors.add(node.input[0])
+                self.selected_slices.add(node.name)
 
-    def fetch_attrs(self, node):
+    def fetch_attrs(self, node, sibling_tensors=None):
         from onnx import AttributeProto
         attrs = {}
         input_tensors = []
@@ -43,7 +56,9 @@ class OnnxConverter:
             if output_name in self.tensors:
                 output_tensors.append(self.tensors[output_name]["shape"])
         if node.op_type == SLICE_TYPE:
-            for tensor_name in self._get_sibling_slice_output_tensors(node):
+            if sibling_tensors is None:
+                sibling_tensors = self._get_sibling_slice_output_tensors(node)
+            for tensor_name in sibling_tensors:
                 output_tensors.append(self.tensors[tensor_name]["shape"])
         if (
             len(input_tensors) == 0
@@ -74,49 +89,36 @@ class OnnxConverter:
 
     def convert(self):
         result = {}
-        
-        sliced_tensors = set()
-        selected_slice = set()
         for node in self.graph.node:
-            if node.op_type == SLICE_TYPE:
-                tensor = node.input[0]
-                if tensor in sliced_tensors:
-                    continue
-                else:
-                    sliced_tensors.add(tensor)
-                    selected_slice.add(node.name)
+            if node.op_type == SLICE_TYPE and node.name not in self.selected_slices:
+                continue
+            if not node.output:
+                continue
 
-        for node in self.graph.node:
-            outbounds = []
             inbounds = []
-            if node.op_type == SLICE_TYPE and node.name not in selected_slice:
-                continue
-            
             for input_name in node.input:
                 if input_name in self.tensors:  # remove dummy ops
                     for pred_pred in self.tensors[input_name]['inputs']:
                         inbounds.append(pred_pred.name)
+            sibling_tensors = self._get_sibling_slice_output_tensors(node) if node.op_type == SLICE_TYPE else []
+            outbounds = []
             for output_name in node.output:
                 if output_name in self.tensors:
                     for succ_succ in self.tensors[output_name]['outputs']:
                         outbounds.append(succ_succ.name)
-                if node.op_type == SLICE_TYPE:
-                    for tensor_name in self._get_sibling_slice_output_tensors(node):
-                        outbounds.append(tensor_name)    
-                result[node.name] = {
-                    "attr": self.fetch_attrs(node),
-                    "outbounds": outbounds,
-                    "inbounds": inbounds,
-                }
+                outbounds.extend(sibling_tensors)
+            result[node.name] = {
+                "attr": self.fetch_attrs(node, sibling_tensors),
+                "outbounds": outbounds,
+                "inbounds": inbounds,
+            }
 
         return result
 
     def _get_sibling_slice_output_tensors(self, node):
         output_tensors = []
-        for slice in self.tensors[node.input[0]]["outputs"]:
-            if slice.name != node.name and slice.op_type == SLICE_TYPE:
-                for output_name in slice.output:
-                    if output_name in self.tensors:
-                        output_tensors.append(output_name)
+        for name, slice_outputs in self.slice_groups.get(node.input[0], []):
+            if name != node.name:
+                output_tensors.extend(slice_outputs)
 
         return output_tensors
@@ -1,5 +1,9 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import os
+from nn_meter.utils.import_package import try_import_onnx
+
+
 def get_tensor_shape(tensor):
     shape = []
     try:
@@ -11,3 +15,128 @@ def get_tensor_shape(tensor):
     if len(shape) == 4:
         shape = [shape[0], shape[2], shape[3], shape[1]]
     return shape
+
+
+# field numbers of the onnx protobuf messages, refer to onnx/onnx.proto
+_MODEL_GRAPH = 7
+_GRAPH_INITIALIZER = 5
+_TENSOR_PAYLOADS = {
+    4,  # float_data
+    5,  # int32_data
+    6,  # string_data
+    7,  # int64_data
+    9,  # raw_data
+    10,  # double_data
+    11,  # uint64_data
+}
+
+
+def _read_varint(fp):
+    result = shift = 0
+    while True:
+        byte = fp.read(1)
+        if not byte:
+            raise ValueError("Unexpected end of the onnx model file.")
+        result |= (byte[0] & 0x7f) << shift
+        if not byte[0] & 0x80:
+            return result
+        shift += 7
+
+
+def _encode_varint(value):
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def _iter_fields(fp, start, end):
+    """ yield (field number, start of the field, start of the value, end of the field) of the protobuf message in the
+    file from start to end. The values of length-delimited fields are skipped by seeking instead of being read.
+    """
+    pos = start
+    while pos < end:
+        fp.seek(pos)
+        key = _read_varint(fp)
+        field, wire_type = key >> 3, key & 0x7
+        value_start = fp.tell()
+        if wire_type == 0:
+            _read_varint(fp)
+            value_end = fp.tell()
+        elif wire_type == 1:
+            value_end = value_start + 8
+        elif wire_type == 2:
+            length = _read_varint(fp)
+            value_start = fp.tell()
+            value_end = value_start + length
+        elif wire_type == 5:
+            value_end = value_start + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type} in the onnx model.")
+        yield field, pos, value_start, value_end
+        pos = value_end
+
+
+def _read(fp, start, end):
+    fp.seek(start)
+    return fp.read(end - start)
+
+
+def _length_delimited(field, value):
+    return _encode_varint(field << 3 | 2) + _encode_varint(len(value)) + value
+
+
+def _strip_tensor(fp, start, end, max_payload_size):
+    """ return the bytes of the TensorProto from start to end of the file without its data payload, if the payload is
+    larger than max_payload_size. The name, data type, dims and external data references are kept.
+    """
+    fields = list(_iter_fields(fp, start, end))
+    payload_size = sum(value_end - value_start for field, _, value_start, value_end in fields
+                       if field in _TENSOR_PAYLOADS)
+    if payload_size <= max_payload_size:
+        return _read(fp, start, end)
+    return b"".join(
+        _read(fp, field_start, field_end) for field, field_start, _, field_end in fields
+        if field not in _TENSOR_PAYLOADS
+    )
+
+
+def _strip_graph(fp, start, end, max_payload_size):
+    stripped = bytearray()
+    kept_start = start  # the span of fields to be copied verbatim
+    for field, field_start, value_start, value_end in _iter_fields(fp, start, end):
+        if field == _GRAPH_INITIALIZER:
+            stripped += _read(fp, kept_start, field_start)
+            stripped += _length_delimited(field, _strip_tensor(fp, value_start, value_end, max_payload_size))
+            kept_start = value_end
+    stripped += _read(fp, kept_start, end)
+    return bytes(stripped)
+
+
+def load_model_without_weights(filename, max_payload_size=1024):
+    """
+    load the onnx model file with the graph structure and the dims of initializers only, i.e., the data of initializers
+    larger than `max_payload_size` bytes (e.g., the weights) are skipped without being read, and the data of
+    external-data models are never loaded. Small initializers, such as the shapes of Reshape ops, are kept for the shape
+    inference of `OnnxConverter`. The file is parsed in the protobuf wire format, seeking over the skipped data.
+    @params:
+    filename: path to the onnx model file
+    max_payload_size: the maximum size in bytes of the data of an initializer to be kept
+    """
+    onnx = try_import_onnx()
+    with open(filename, "rb") as fp:
+        size = os.fstat(fp.fileno()).st_size
+        model = bytearray()
+        kept_start = 0
+        for field, field_start, value_start, value_end in _iter_fields(fp, 0, size):
+            if field == _MODEL_GRAPH:
+                model += _read(fp, kept_start, field_start)
+                model += _length_delimited(field, _strip_graph(fp, value_start, value_end, max_payload_size))
+                kept_start = value_end
+        model += _read(fp, kept_start, size)
+    return onnx.load_model_from_string(bytes(model))
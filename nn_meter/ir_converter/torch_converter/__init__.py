@@ -1,3 +1,4 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
-from .converter import OnnxBasedTorchConverter, NNIBasedTorchConverter, NNIIRConverter
+from .converter import OnnxBasedTorchConverter, NNIBasedTorchConverter, NNIIRConverter, FxBasedTorchConverter
+from .conversion_cache import TorchConversionCache, fingerprint_torch_model
@@ -0,0 +1,189 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import json
+import importlib
+import tempfile
+from nn_meter.utils import get_user_data_folder
+from nn_meter.utils.lru_cache import LRUCache
+from nn_meter.utils.utils import NumpyEncoder
+from nn_meter.utils.graph_hash import hash_object
+from nn_meter.utils.import_package import try_import_torch
+
+
+__cache_folder__ = 'torch_conversion_cache'
+
+
+def _is_hyperparameter(value):
+    if isinstance(value, (tuple, list)):
+        return all(_is_hyperparameter(item) for item in value)
+    return isinstance(value, (bool, int, float, str, type(None)))
+
+
+def _get_module_records(model):
+    """ return the types and hyperparameters of the submodules, and the shapes and dtypes of the parameters and buffers
+    """
+    records = []
+    for name, module in model.named_modules():
+        hyperparameters = {
+            key: value for key, value in vars(module).items()
+            if not key.startswith("_") and key != "training" and _is_hyperparameter(value)
+        }
+        records.append([name, f"{type(module).__module__}.{type(module).__qualname__}", hyperparameters])
+    for name, tensor in list(model.named_parameters()) + list(model.named_buffers()):
+        records.append([name, list(tensor.shape), str(tensor.dtype)])
+    return records
+
+
+def _canonicalize_arg(value):
+    """ return the json serializable form of a constant argument of a traced node, e.g., `torch.float32` as its name.
+    Other values are kept as is, so that `hash_object` raises TypeError for the unknown ones.
+    """
+    torch = try_import_torch()
+    if isinstance(value, (torch.dtype, torch.device, torch.layout, torch.memory_format)):
+        return str(value)
+    return value
+
+
+def _get_traced_records(model):
+    """ return the connectivity of the model traced by `torch.fx`, i.e., the op, target and arguments of each node,
+    where the input nodes of the arguments are replaced by their indices. Raise the tracing error if the model could
+    not be traced by `torch.fx`.
+    """
+    from torch.fx import symbolic_trace
+    from torch.fx.node import map_aggregate, map_arg
+    graph = symbolic_trace(model).graph
+    indices = {node: index for index, node in enumerate(graph.nodes)}
+    records = []
+    for node in graph.nodes:
+        target = node.target
+        if callable(target):
+            target = f"{getattr(target, '__module__', None)}.{getattr(target, '__qualname__', repr(target))}"
+        args = map_arg((node.args, node.kwargs), lambda input: f"%{indices[input]}")
+        records.append([node.op, target, map_aggregate(args, _canonicalize_arg)])
+    return records
+
+
+def _get_package_versions(converter):
+    """ return the versions of nn-Meter, torch and the packages used by the torch converter, where the converted graphs
+    may change with any of them. The version of a package not installed is None.
+    """
+    from nn_meter import __version__
+    packages = {"onnx": ["onnx", "onnxsim"], "nni": ["nni"]}.get(converter, [])
+    versions = {"nn_meter": __version__, "torch": try_import_torch().__version__}
+    for package in packages:
+        try:
+            versions[package] = getattr(importlib.import_module(package), "__version__", None)
+        except ImportError:
+            versions[package] = None
+    return versions
+
+
+def fingerprint_torch_model(model, input_shape, converter):
+    """
+    return the structural fingerprint (sha256 hex digest) of the torch model, which covers the types and
+    hyperparameters of the submodules, the shapes and dtypes of the parameters and buffers, and the connectivity traced
+    by `torch.fx`, together with the input shape, the torch converter and the versions of nn-Meter, torch and the
+    packages used by the converter (onnx and onnxsim for "onnx", nni for "nni"). The values of the weights are excluded,
+    so that models of the same architecture share a fingerprint. Raise an error if the model could not be traced by
+    `torch.fx`, or if its traced arguments could not be hashed, as the connectivity of such models could not be
+    fingerprinted reliably.
+    @params:
+    model: the torch model (nn.Module)
+    input_shape: the shape of input tensor for conversion
+    converter: the name of the torch converter, refer to `torch_model_to_graph` for details
+    """
+    return hash_object([
+        _get_module_records(model), _get_traced_records(model), list(input_shape), converter,
+        _get_package_versions(converter)
+    ])
+
+
+class TorchConversionCache(LRUCache):
+    """
+    A two-tier cache of the nn-Meter IR graphs converted from torch models, keyed by `fingerprint_torch_model`. The
+    first tier is a bounded, thread-safe LRU in memory, and the second tier is a folder of json files on disk, which is
+    kept across runs. The files on disk are bounded by `disk_capacity` as well, and the ones least recently stored or
+    loaded from disk are removed first. All the files could be removed by `clear(disk=True)`, e.g., after upgrading the
+    torch converters. The graphs are stored in json, and each lookup returns a new copy of the graph.
+    """
+    def __init__(self, capacity=128, folder=None, disk_capacity=4096):
+        """
+        @params:
+        capacity: the maximum number of graphs in memory, the least recently used one is evicted first
+        folder: the folder of the cached graphs on disk, default to be `<user_data_folder>/torch_conversion_cache`
+        disk_capacity: the maximum number of graph files on disk, the least recently stored or loaded one is removed
+            first
+        """
+        super().__init__(capacity)
+        if folder is None:
+            folder = os.path.join(get_user_data_folder(), __cache_folder__)
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.disk_capacity = disk_capacity
+        self.disk_hits = 0
+
+    def _get_filename(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+    def _load_missing(self, key):
+        filename = self._get_filename(key)
+        try:
+            with open(filename, "r") as fp:
+                content = fp.read()
+            # the modification time orders the files by their last use for the eviction
+            os.utime(filename)
+        except FileNotFoundError:
+            # not cached, or removed by the eviction of another process
+            return None
+        self.disk_hits += 1
+        return content
+
+    def _evict_files(self):
+        filenames = []
+        for filename in os.listdir(self.folder):
+            if filename.endswith(".json"):
+                filename = os.path.join(self.folder, filename)
+                try:
+                    filenames.append((os.path.getmtime(filename), filename))
+                except FileNotFoundError:
+                    pass
+        filenames.sort()
+        for _, filename in filenames[:max(0, len(filenames) - self.disk_capacity)]:
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+
+    def get(self, key, default=None):
+        content = super().get(key)
+        return default if content is None else json.loads(content)
+
+    def put(self, key, graph):
+        content = json.dumps(graph, cls=NumpyEncoder)
+        with self._lock:
+            super().put(key, content)
+            # write to a temporary file first, so that concurrent readers never see a partial file
+            with tempfile.NamedTemporaryFile("w", dir=self.folder, suffix=".tmp", delete=False) as fp:
+                fp.write(content)
+            os.replace(fp.name, self._get_filename(key))
+            self._evict_files()
+
+    def clear(self, disk=False):
+        """ clear the cached graphs in memory, and the cached files on disk if `disk` is True
+        """
+        with self._lock:
+            super().clear()
+            self.disk_hits = 0
+            if disk:
+                for filename in os.listdir(self.folder):
+                    if filename.endswith(".json"):
+                        os.remove(os.path.join(self.folder, filename))
+
+    def stats(self):
+        with self._lock:
+            stats = super().stats()
+            total = self.hits + self.disk_hits + self.misses
+            stats["disk_hits"] = self.disk_hits
+            stats["hit_rate"] = (self.hits + self.disk_hits) / total if total else 0.0
+            return stats
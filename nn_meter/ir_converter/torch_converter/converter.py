@@ -1,8 +1,13 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import copy
 import tempfile
+from itertools import chain
 from ..onnx_converter import OnnxConverter
-from .opset_map import nni_attr_map, nni_type_map
+from .opset_map import (
+    nni_attr_map, nni_type_map, fx_module_type_map, fx_function_type_map, fx_passthrough_ops, fx_function_attr_index,
+    fx_attr_map
+)
 from nn_meter.utils.import_package import try_import_onnx, try_import_torch, try_import_onnxsim, try_import_nni
 
 
@@ -129,3 +134,165 @@ class OnnxBasedTorchConverter(OnnxConverter):
         assert check, "Simplified ONNX model could not be validated"
         super().__init__(model_simp)
 
+
+def _to_meta_module(model):
+    """ return a copy of the module whose parameters and buffers are empty tensors on the meta device, without copying
+    the data of the original tensors
+    """
+    torch = try_import_torch()
+    memo = {}
+    for tensor in chain(model.parameters(), model.buffers()):
+        meta_tensor = torch.empty_like(tensor, device="meta")
+        if isinstance(tensor, torch.nn.Parameter):
+            meta_tensor = torch.nn.Parameter(meta_tensor, requires_grad=tensor.requires_grad)
+        memo[id(tensor)] = meta_tensor
+    return copy.deepcopy(model, memo)
+
+
+def _get_shapes(tensor_meta):
+    """ return the list of shapes in the tensor metadata of `ShapeProp`, which is a `TensorMetadata` or a nested
+    container of them
+    """
+    if tensor_meta is None:
+        return []
+    if hasattr(tensor_meta, "shape"):
+        return [list(tensor_meta.shape)]
+    if isinstance(tensor_meta, dict):
+        tensor_meta = tensor_meta.values()
+    if isinstance(tensor_meta, (list, tuple)):
+        return [shape for item in tensor_meta for shape in _get_shapes(item)]
+    return []
+
+
+class FxBasedTorchConverter:
+    """
+    Convert a torch module to nn-Meter IR by tracing it with `torch.fx` and propagating the shapes with tensors on the
+    meta device, i.e., neither the data of the model is copied nor the model is executed. The leaf modules, functions
+    and tensor methods are mapped to nn-Meter IR types by `fx_module_type_map` and `fx_function_type_map`, and the
+    unknown ones are kept with their names as types.
+    """
+    def __init__(self, model, example_inputs):
+        torch = try_import_torch()
+        from torch.fx import symbolic_trace
+        from torch.fx.passes.shape_prop import ShapeProp
+
+        # trace the model in eval mode, as `torch.onnx.export` does, without changing the mode of the given model
+        self.graph_module = symbolic_trace(_to_meta_module(model).eval())
+        ShapeProp(self.graph_module).propagate(torch.empty_like(example_inputs, device="meta"))
+        self.modules = dict(self.graph_module.named_modules())
+
+    def convert(self):
+        nodes = self.graph_module.graph.nodes
+        # the concats consumed only by a concat on the same axis are merged into it, as onnxsim does
+        merged_concats = set()
+        for node in nodes:
+            axis = self._get_concat_axis(node)
+            if axis is not None:
+                for input in self._get_inputs(node):
+                    if self._get_concat_axis(input) == axis and len(input.users) == 1:
+                        merged_concats.add(input)
+
+        graph = {}
+        producers = {}  # fx node to the names of its producer nodes in the graph, for the nodes passed through
+        for node in nodes:
+            if node.op in ["placeholder", "get_attr", "output"] or node in merged_concats:
+                continue
+            output_shape = _get_shapes(node.meta.get("tensor_meta"))
+            if not output_shape:
+                # the nodes without tensor outputs, such as `size`
+                continue
+
+            inputs = self._get_inputs(node, merged_concats)
+            inbounds = [
+                producer for input in inputs
+                for producer in ([input.name] if input.name in graph else producers.get(input, []))
+            ]
+            type, attr = self._get_type_and_attr(node)
+            if type is None or type == "concat" and len(inputs) == 1:
+                producers[node] = inbounds
+                continue
+
+            input_shape = [
+                shape for input in inputs if input.op != "get_attr"
+                for shape in _get_shapes(input.meta.get("tensor_meta"))
+            ]
+            graph[node.name] = {
+                "attr": {
+                    "attr": attr,
+                    "type": type,
+                    "input_shape": _nchw_to_nhwc(input_shape),
+                    "output_shape": _nchw_to_nhwc(output_shape),
+                },
+                "inbounds": inbounds,
+                "outbounds": [],
+            }
+
+        for name, node in graph.items():
+            for inbound in node["inbounds"]:
+                graph[inbound]["outbounds"].append(name)
+        return graph
+
+    def _get_inputs(self, node, merged_concats=()):
+        """ return the fx nodes in the arguments of the node, where the merged concats are replaced by their inputs
+        """
+        from torch.fx.node import map_arg
+        inputs = []
+        map_arg((node.args, node.kwargs), inputs.append)
+        return [
+            expanded for input in inputs
+            for expanded in (self._get_inputs(input, merged_concats) if input in merged_concats else [input])
+        ]
+
+    def _get_op(self, node):
+        if node.op == "call_module":
+            return type(self.modules[node.target]).__name__
+        if node.op == "call_method":
+            return node.target
+        return getattr(node.target, "__name__", str(node.target))
+
+    def _get_concat_axis(self, node):
+        """ return the axis of the concat node, or None if the node is not a concat
+        """
+        if node.op not in ["call_function", "call_method"] or self._get_op(node) not in ["cat", "concat"]:
+            return None
+        return node.kwargs.get("dim", node.args[1] if len(node.args) > 1 else 0)
+
+    def _get_type_and_attr(self, node):
+        """ return the nn-Meter IR type and attrs of the fx node, or None type if the node is passed through
+        """
+        attr = {}
+        op = self._get_op(node)
+        if node.op == "call_module":
+            module = self.modules[node.target]
+            new_type = fx_module_type_map.get(op, op)
+            for attr_name in fx_attr_map["__all__"]:
+                if hasattr(module, attr_name):
+                    attr[attr_name] = getattr(module, attr_name)
+        else:
+            new_type = fx_function_type_map.get(op, op)
+            for attr_name, index in fx_function_attr_index.get(op, {}).items():
+                value = node.kwargs.get(attr_name, node.args[index] if index < len(node.args) else None)
+                if value is not None:
+                    attr[attr_name] = value
+
+        if op in ["AdaptiveAvgPool2d", "adaptive_avg_pool2d"]:
+            input_size = node.args[0].meta["tensor_meta"].shape[2:]
+            output_size = node.meta["tensor_meta"].shape[2:]
+            if list(output_size) != [1, 1]:
+                # adaptive pooling to a larger size is an average pooling, as it is exported to onnx
+                new_type = "avgpool"
+                attr = {"kernel_size": [i // o for i, o in zip(input_size, output_size)]}
+                attr["stride"] = attr["kernel_size"]
+        if op in fx_passthrough_ops:
+            return None, attr
+        if op == "getitem" and not hasattr(node.args[0].meta.get("tensor_meta"), "shape"):
+            # selecting an output of split or chunk
+            return None, attr
+
+        new_attr = {}
+        for attr_name, attr_value in attr.items():
+            new_attr_name, modifier = fx_attr_map["__all__"][attr_name]
+            if modifier is not None and not isinstance(attr_value, str):
+                attr_value = modifier(attr_value)
+            new_attr[new_attr_name] = attr_value
+        return new_type, new_attr
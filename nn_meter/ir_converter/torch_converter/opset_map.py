@@ -38,3 +38,87 @@ nni_attr_map = {
         "dim": ("axis", None),
     },
 }
+
+
+# the nn-Meter IR types of the leaf modules in torch.nn, by the name of module class
+fx_module_type_map = {
+    "Conv2d": "conv",
+    "BatchNorm2d": "bn",
+    "ReLU": "relu",
+    "ReLU6": "relu",
+    "Linear": "fc",
+    "MaxPool2d": "maxpool",
+    "AvgPool2d": "avgpool",
+    "AdaptiveAvgPool2d": "gap",
+    "Sigmoid": "sigmoid",
+    "Hardsigmoid": "hardsigmoid",
+    "Hardswish": "hswish",
+    "Softmax": "softmax",
+    "Flatten": "reshape",
+}
+
+# the nn-Meter IR types of the functions and tensor methods, by the name of function or method
+fx_function_type_map = {
+    "add": "add",
+    "iadd": "add",
+    "mul": "mul",
+    "imul": "mul",
+    "truediv": "div",
+    "div": "div",
+    "cat": "concat",
+    "concat": "concat",
+    "relu": "relu",
+    "relu_": "relu",
+    "relu6": "relu",
+    "hardtanh": "relu",
+    "sigmoid": "sigmoid",
+    "hardsigmoid": "hardsigmoid",
+    "hardswish": "hswish",
+    "softmax": "softmax",
+    "flatten": "reshape",
+    "view": "reshape",
+    "reshape": "reshape",
+    "transpose": "transpose",
+    "permute": "transpose",
+    "split": "split",
+    "chunk": "split",
+    "getitem": "split",  # slicing of a tensor, while the getitem of the outputs of split is passed through
+    "adaptive_avg_pool2d": "gap",
+    "mean": "gap",
+    "max_pool2d": "maxpool",
+    "avg_pool2d": "avgpool",
+}
+
+# the modules, functions and methods that pass their input through and are removed from the graph
+fx_passthrough_ops = [
+    "Identity",
+    "Dropout",
+    "dropout",
+    "contiguous",
+    "clone",
+    "detach",
+]
+
+# the positional indices of the attributes in the arguments of functions and methods
+fx_function_attr_index = {
+    "cat": {"dim": 1},
+    "concat": {"dim": 1},
+    "split": {"dim": 2},
+    "chunk": {"dim": 2},
+    "softmax": {"dim": 1},
+    "max_pool2d": {"kernel_size": 1, "stride": 2, "padding": 3},
+    "avg_pool2d": {"kernel_size": 1, "stride": 2, "padding": 3},
+}
+
+# the attributes of modules to be converted, in the same format as `nni_attr_map`
+fx_attr_map = {
+    "__all__": {
+        "kernel_size": ("ks", int_to_list_modifier),
+        "padding": ("pads", int_to_list_modifier),
+        "stride": ("strides", int_to_list_modifier),
+        "dilation": ("dilations", int_to_list_modifier),
+        "groups": ("group", None),
+        "eps": ("eps", None),
+        "dim": ("axis", None),
+    },
+}
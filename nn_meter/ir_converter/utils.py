@@ -3,13 +3,17 @@
 import json
 import logging
 from .onnx_converter import OnnxConverter
+from .onnx_converter.utils import load_model_without_weights
 from .frozenpb_converter import FrozenPbConverter
-from .torch_converter import NNIBasedTorchConverter, OnnxBasedTorchConverter, NNIIRConverter
+from .torch_converter import (
+    NNIBasedTorchConverter, OnnxBasedTorchConverter, NNIIRConverter, FxBasedTorchConverter, fingerprint_torch_model
+)
 from nn_meter.utils.import_package import try_import_onnx, try_import_torch, try_import_torchvision_models
 logging = logging.getLogger("nn-Meter")
 
 
-def model_file_to_graph(filename: str, model_type: str, input_shape=(1, 3, 224, 224), apply_nni=False):
+def model_file_to_graph(filename: str, model_type: str, input_shape=(1, 3, 224, 224), apply_nni=False, converter=None,
+                        cache=None, load_weights=True):
     """
     read the given file and convert the model in the file content to nn-Meter IR graph object 
     @params:
@@ -32,10 +36,26 @@ def model_file_to_graph(filename: str, model_type: str, input_shape=(1, 3, 224,
         converter is used, which requires onnx installation (well tested version is onnx>=1.9.0). NNI-based converter is much faster while the conversion is unstable 
         as it could fail in some case. Onnx-based converter is much slower but stable compared to NNI-based converter. This parameter is only accessed when 
         model_type == 'torch'
+
+    converter: string to specify the torch converter, allowed items are ["onnx", "nni", "fx"], which overrides
+        `apply_nni` if given. Fx-based converter traces the model by torch.fx and infers the shapes on the meta device,
+        so that the model is never executed, while the model should be symbolically traceable. This parameter is only
+        accessed when model_type == 'torch'
+
+    cache: a `TorchConversionCache` object to look up and store the converted graphs of torch models, refer to
+        `torch_model_to_graph` for details. This parameter is only accessed when model_type == 'torch'
+
+    load_weights: if False, the onnx model file is loaded by `load_model_without_weights`, which skips the data of the
+        weights and external data, since only the structure and shapes are converted. It falls back to `onnx.load`
+        without external data if the file could not be parsed in this way. This parameter is only accessed when
+        model_type == 'onnx'
     """
     if model_type == "onnx":
-        onnx = try_import_onnx()
-        model = onnx.load(filename)
+        if load_weights:
+            onnx = try_import_onnx()
+            model = onnx.load(filename)
+        else:
+            model = load_onnx_model_without_weights(filename)
         return onnx_model_to_graph(model)
 
     elif model_type == "pb":
@@ -72,13 +92,25 @@ def model_file_to_graph(filename: str, model_type: str, input_shape=(1, 3, 224,
         else:
             suppost_list = ", ".join([k for k in torchvision_zoo_dict])
             raise ValueError(f"Unsupported model name: {filename} in torchvision. Supporting list: {suppost_list}")
-        return torch_model_to_graph(model, input_shape, apply_nni)
+        return torch_model_to_graph(model, input_shape, apply_nni, converter, cache)
 
     else:
         raise ValueError(f"Unsupported model type: {model_type}")
 
 
-def model_to_graph(model, model_type, input_shape=(1, 3, 224, 224), apply_nni=False):
+def load_onnx_model_without_weights(filename):
+    """ load the onnx model file by `load_model_without_weights`, or by `onnx.load` without external data if the file
+    could not be parsed by it
+    """
+    try:
+        return load_model_without_weights(filename)
+    except Exception as e:
+        logging.warning(f"Failed to load {filename} without weights ({e}), use onnx.load instead.")
+        onnx = try_import_onnx()
+        return onnx.load(filename, load_external_data=False)
+
+
+def model_to_graph(model, model_type, input_shape=(1, 3, 224, 224), apply_nni=False, converter=None, cache=None):
     """
     convert the given model to nn-Meter IR graph object 
     @params:
@@ -91,11 +123,16 @@ def model_to_graph(model, model_type, input_shape=(1, 3, 224, 224), apply_nni=Fa
     
     input_shape: the shape of input tensor for inference (if necessary), a random tensor according to the shape will be generated and used. This parameter is only 
         accessed when model_type == 'torch'
+
+    apply_nni, converter: switch the torch converter used for torch model parsing. Refer to `model_file_to_graph` for
+        details.
+
+    cache: a `TorchConversionCache` object for torch models. Refer to `torch_model_to_graph` for details.
     """
     if model_type == "onnx":
         return onnx_model_to_graph(model)
     elif model_type == "torch":
-        return torch_model_to_graph(model, input_shape, apply_nni)
+        return torch_model_to_graph(model, input_shape, apply_nni, converter, cache)
     elif model_type == "nni-ir":
         return nni_model_to_graph(model)
     elif model_type == "nnmeter-ir":
@@ -114,7 +151,40 @@ def nni_model_to_graph(model):
     return converter.convert()
 
 
-def torch_model_to_graph(model, input_shape=(1, 3, 224, 224), apply_nni=False):
+def torch_model_to_graph(model, input_shape=(1, 3, 224, 224), apply_nni=False, converter=None, cache=None):
+    """
+    convert the torch model to nn-Meter IR graph object
+    @params:
+    model, input_shape, apply_nni: refer to `model_file_to_graph` for details.
+
+    converter: string to specify the torch converter, allowed items are ["onnx", "nni", "fx"]. If converter is None, the
+        converter is selected by `apply_nni`. Refer to `model_file_to_graph` for details.
+
+    cache: a `TorchConversionCache` object. If given, the converted graph is looked up by the structural fingerprint of
+        the model, the input shape and the converter before the conversion, and stored after the conversion. Models
+        which could not be fingerprinted, e.g., not traceable by `torch.fx`, are converted without the cache.
+    """
+    if converter is None:
+        converter = "nni" if apply_nni else "onnx"
+    if cache is not None:
+        try:
+            key = fingerprint_torch_model(model, input_shape, converter)
+        except Exception as e:
+            logging.warning(f"The torch model could not be fingerprinted ({e}), and is converted without the "
+                            f"conversion cache")
+            return _convert_torch_model(model, input_shape, converter)
+        graph = cache.get(key)
+        if graph is not None:
+            logging.info("The converted graph of the torch model is loaded from the conversion cache")
+            return graph
+
+    graph = _convert_torch_model(model, input_shape, converter)
+    if cache is not None:
+        cache.put(key, graph)
+    return graph
+
+
+def _convert_torch_model(model, input_shape, converter):
     torch = try_import_torch()
     args = torch.randn(*input_shape)
     try:
@@ -123,7 +193,7 @@ def torch_model_to_graph(model, input_shape=(1, 3, 224, 224), apply_nni=False):
             args = args.to("cuda")
     except:
         pass
-    if apply_nni: 
+    if converter == "nni":
         # apply NNI-based torch converter, which requires nni>=2.4 installation and should use nn interface from NNI 
         # `import nni.retiarii.nn.pytorch as nn` to define the PyTorch modules.
         try:
@@ -131,9 +201,20 @@ def torch_model_to_graph(model, input_shape=(1, 3, 224, 224), apply_nni=False):
             converter = NNIBasedTorchConverter(model, args)
         except:
             raise NotImplementedError("Your model is not fully converted by NNI-based converter. Please set apply_nni=False and try again.")
-    else:
+    elif converter == "fx":
+        # apply fx-based torch converter, which traces the model by torch.fx and infers the shapes on the meta device
+        # without executing the model. The model should be symbolically traceable.
+        try:
+            logging.info("Fx-based Torch Converter is applied for model conversion")
+            return FxBasedTorchConverter(model, args).convert()
+        except Exception as e:
+            raise NotImplementedError(f"Your model is not converted by fx-based converter ({e}). Please set "
+                                      f"converter='onnx' and try again.")
+    elif converter == "onnx":
         # apply Onnx-based torch converter, which requires onnx installation (well tested version is onnx==1.9.0) 
         # and the conversion is more stable
         logging.info("Onnx-based Torch Converter is applied for model conversion")
         converter = OnnxBasedTorchConverter(model, args)
+    else:
+        raise ValueError(f"Unsupported torch converter: {converter}")
     return converter.convert()
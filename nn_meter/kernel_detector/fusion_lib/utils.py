@@ -17,4 +17,4 @@ def get_fusion_unit(name):
     if not isinstance(graph, list):
         graph = [graph]
 
-    return [ModelGraph(graph=convert_nodes(g)) for g in graph]
+    return [ModelGraph(graph=convert_nodes(g), deepcopy=False) for g in graph]
@@ -0,0 +1,249 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import logging
+from nn_meter.utils.graph_tool import ModelGraph
+from .utils.ir_tools import copy_node, convert_nodes
+logging = logging.getLogger("nn-Meter")
+
+
+class DetectionState:
+    """
+    The kernels detected from a nn-Meter IR graph, with the bookkeeping to update them for node-level edits of the graph
+    by `update_detection_state`. A state is never modified by updates, so that several children could be derived from
+    one parent graph, e.g., in mutation-based NAS.
+
+    The kernels are kept by basic block ids in the order of the basic blocks. Each block is a tuple of (the names of its
+    nodes in the graph, the type of its root node after the fusion of multi-op blocks, its kernel or None for a block of
+    dummy ops). The kernels carry their attrs and shapes only, use `KernelDetector.detect` for the connections of
+    kernels.
+    """
+    def __init__(self, graph, converted, inbounds, outbounds, blocks, node_block, fused_types, next_block):
+        self.graph = graph  # node name to the nn-Meter IR node
+        self.converted = converted  # node name to the node attr converted by `convert_nodes`
+        self.inbounds = inbounds  # node name to its inbounds after `ModelGraph.refresh`, for nodes kept by the refresh
+        self.outbounds = outbounds
+        self.blocks = blocks  # block id to (members, root type, kernel)
+        self.node_block = node_block  # node name to the id of its basic block
+        self.fused_types = fused_types  # node name to the type of the node it is fused into by the multi-op blocks
+        self.next_block = next_block
+
+    def get_kernels(self):
+        return [kernel for _, _, kernel in self.blocks.values() if kernel is not None]
+
+
+def _refresh_adjacency(graph):
+    """ return the inbounds and outbounds of the nodes kept by `ModelGraph.refresh`, which is run on a skeleton graph of
+    the inbounds only
+    """
+    skeleton = {
+        name: {"inbounds": list(node["inbounds"])} if "inbounds" in node else {} for name, node in graph.items()
+    }
+    ModelGraph(graph=skeleton, deepcopy=False).refresh()
+    inbounds = {name: node.get("inbounds", []) for name, node in skeleton.items()}
+    outbounds = {name: node.get("outbounds", []) for name, node in skeleton.items()}
+    return inbounds, outbounds
+
+
+def _get_members(model_graph, node, names):
+    """ return the names of the graph nodes fused into the node
+    """
+    if node in names:
+        return [node]
+    if node in model_graph.get_graph():
+        primitives = model_graph.get_node_attr(node)["attr"].get("primitive_nodes") or node.split(";")
+    else:
+        primitives = node.split(";")  # a nested fused node, which is named after its primitive nodes
+    if primitives == [node]:
+        return []
+    return [member for primitive in primitives for member in _get_members(model_graph, primitive, names)]
+
+
+def _run_detection(kd, names, converted, inbounds, outbounds):
+    """ detect the basic blocks of the subgraph of the given node names, in the same way as `KernelDetector.detect` on
+    the refreshed graph. Return the model graph, the basic blocks of fused node names, and the members of fused nodes.
+    """
+    local = set(names)
+    graph = {}
+    for name in names:
+        graph[name] = {
+            "attr": copy_node({"attr": converted[name]})["attr"],
+            "inbounds": [inbound for inbound in inbounds[name] if inbound in local],
+            "outbounds": [outbound for outbound in outbounds[name] if outbound in local],
+        }
+    model_graph = ModelGraph(graph=graph, deepcopy=False)
+    fusion_graph = kd.splitter.build_fusion_graph(model_graph)
+    members = {node: _get_members(model_graph, node, local) for node in fusion_graph.nodes}
+    return model_graph, fusion_graph.get_basicblocks(), members
+
+
+def _is_ambiguous(kd, model_graph, bbs, core_bbs):
+    """ return True if the fusion of the basic blocks in the core could depend on the order of the nodes, which may be
+    different in the subgraph from that in the whole graph, i.e., a node could be fused by more than one block, or the
+    nodes of a block are not ordered by their edges
+    """
+    is_fusible = kd.reader.compiled.is_fusible
+    bb_of = {node: index for index, bb in enumerate(bbs) for node in bb}
+    for index in core_bbs:
+        bb = bbs[index]
+        for prev, node in zip(bb, bb[1:]):
+            if prev not in model_graph.get_node_inbounds(node):
+                return True
+        for node in bb:
+            node_type = model_graph.get_node_type(node)
+            claimants = {
+                bb_of[inbound] for inbound in model_graph.get_node_inbounds(node)
+                if is_fusible(model_graph.get_node_type(bbs[bb_of[inbound]][0]), node_type)
+            }
+            if len(claimants) > 1:
+                return True
+    return False
+
+
+def build_detection_state(kd, graph):
+    """ detect the kernels of the nn-Meter IR graph, and return the `DetectionState` to be updated by
+    `update_detection_state`. The kernels are the same as `KernelDetector.detect`, with the connections left out.
+    """
+    graph = {name: copy_node(node) for name, node in graph.items()}
+    converted = {name: node["attr"] for name, node in convert_nodes(graph).items()}
+    inbounds, outbounds = _refresh_adjacency(graph)
+    state = DetectionState(graph, converted, inbounds, outbounds, {}, {}, {}, 0)
+    new_state, _ = _rebuild_blocks(kd, state, graph, converted, inbounds, outbounds, set(), set(inbounds))
+    return new_state
+
+
+def update_detection_state(kd, state, replaced=None, added=None, removed=None):
+    """
+    return a new `DetectionState` of the graph edited by a node-level diff, and the ids of the blocks whose kernels are
+    new, i.e., to be predicted again. The state is not modified.
+
+    The fusion is run again on the subgraph of the blocks touching the changed nodes, together with a halo of nodes as
+    large as the biggest fusion unit, so that the multi-op blocks are matched in the same way as on the whole graph. The
+    region grows by the neighboring blocks until no fusion across its border is allowed by the rules, and falls back to
+    the whole graph if the fusion of the region depends on the order of nodes, or the region covers half of the blocks.
+    The edges are refreshed on the whole graph, which is cheap compared with the fusion.
+    @params:
+
+    replaced: dict of node name to the new nn-Meter IR node of an existing node
+
+    added: dict of node name to the nn-Meter IR node of a new node, which is appended to the graph
+
+    removed: list of the names of removed nodes
+    """
+    replaced, added, removed = replaced or {}, added or {}, list(removed or [])
+    graph, converted = dict(state.graph), dict(state.converted)
+    for name in removed:
+        if name not in graph:
+            raise KeyError(f"The removed node {name} is not in the graph.")
+        del graph[name]
+        del converted[name]
+    for name in replaced:
+        if name not in graph:
+            raise KeyError(f"The replaced node {name} is not in the graph.")
+    for name in added:
+        if name in graph:
+            raise ValueError(f"The added node {name} is already in the graph.")
+    changes = {**replaced, **added}
+    for name, node in convert_nodes(changes).items():
+        graph[name] = copy_node(changes[name])
+        converted[name] = node["attr"]
+
+    inbounds, outbounds = _refresh_adjacency(graph)
+    seeds = set(changes) | set(removed)
+    for name in inbounds:
+        if (name not in state.inbounds or inbounds[name] != state.inbounds[name]
+                or outbounds[name] != state.outbounds[name]):
+            seeds.add(name)
+    seeds.update(name for name in state.inbounds if name not in inbounds)
+    region = {state.node_block[name] for name in seeds if name in state.node_block}
+    new_nodes = {name for name in seeds if name in inbounds and name not in state.node_block}
+    return _rebuild_blocks(kd, state, graph, converted, inbounds, outbounds, region, new_nodes)
+
+
+def _rebuild_blocks(kd, state, graph, converted, inbounds, outbounds, region, new_nodes):
+    """ detect the basic blocks of the region grown from the given blocks and new nodes, and return the new state with
+    the blocks of the region replaced, and the ids of the new blocks
+    """
+    compiled = kd.reader.compiled
+    radius = max(len(unit.get_graph()) for units in compiled.fusion_units.values() for unit in units)
+    positions = {name: index for index, name in enumerate(inbounds)}
+
+    while True:
+        core = {member for block in region for member in state.blocks[block][0] if member in inbounds} | new_nodes
+        local, frontier = set(core), core
+        for _ in range(radius):
+            frontier = {
+                neighbor for name in frontier for neighbor in inbounds[name] + outbounds[name] if neighbor not in local
+            }
+            if not frontier:
+                break
+            local.update(frontier)
+        if len(local) == len(inbounds) or 2 * len(region) > len(state.blocks):
+            # detect on the whole graph
+            region, core = set(state.blocks), set(inbounds)
+            model_graph, bbs, members = _run_detection(kd, list(inbounds), converted, inbounds, outbounds)
+            core_bbs = list(range(len(bbs)))
+            break
+
+        names = sorted(local, key=positions.__getitem__)
+        model_graph, bbs, members = _run_detection(kd, names, converted, inbounds, outbounds)
+        fused_types = {member: model_graph.get_node_type(node) for node in members for member in members[node]}
+        root_types = {member: model_graph.get_node_type(bb[0]) for bb in bbs for node in bb for member in members[node]}
+
+        grown, core_bbs = set(), []
+        for index, bb in enumerate(bbs):
+            bb_members = [member for node in bb for member in members[node]]
+            outside = [member for member in bb_members if member not in core]
+            if len(outside) < len(bb_members):
+                core_bbs.append(index)
+                # a block across the border of the region
+                grown.update(state.node_block[member] for member in outside)
+        for name in core:
+            for outbound in outbounds[name]:
+                if outbound not in core and compiled.is_fusible(root_types[name], state.fused_types[outbound]):
+                    grown.add(state.node_block[outbound])
+            for inbound in inbounds[name]:
+                if (inbound not in core
+                        and compiled.is_fusible(state.blocks[state.node_block[inbound]][1], fused_types[name])):
+                    grown.add(state.node_block[inbound])
+        if grown - region:
+            region |= grown
+            continue
+        if _is_ambiguous(kd, model_graph, bbs, core_bbs):
+            logging.info("Fall back to the whole graph for the incremental kernel detection.")
+            region = set(state.blocks)
+            new_nodes = set(inbounds)
+            continue
+        break
+
+    # the blocks of the region are replaced, unless their nodes and kernels are not changed
+    old_blocks = {state.blocks[block][0]: block for block in region}
+    blocks = {block: value for block, value in state.blocks.items() if block not in region}
+    node_block, fused_types = dict(state.node_block), dict(state.fused_types)
+    for block in region:
+        for member in state.blocks[block][0]:
+            del node_block[member]
+            del fused_types[member]
+    next_block, new_blocks = state.next_block, []
+    for index in core_bbs:
+        bb = bbs[index]
+        bb_members = tuple(member for node in bb for member in members[node])
+        kernel = kd._bb_to_kernel(model_graph, bb, index, {})
+        block = old_blocks.get(bb_members)
+        old_kernel = state.blocks[block][2] if block is not None else None
+        if block is not None and (kernel is None and old_kernel is None
+                                  or kernel is not None and old_kernel is not None
+                                  and {**kernel, "name": old_kernel["name"]} == old_kernel):
+            kernel = old_kernel
+        else:
+            block, next_block = next_block, next_block + 1
+            if kernel is not None:
+                kernel["name"] = f"{kernel['op']}#{block}"
+                new_blocks.append(block)
+        blocks[block] = (bb_members, model_graph.get_node_type(bb[0]), kernel)
+        for node in bb:
+            for member in members[node]:
+                node_block[member] = block
+                fused_types[member] = model_graph.get_node_type(node)
+
+    state = DetectionState(graph, converted, inbounds, outbounds, blocks, node_block, fused_types, next_block)
+    return state, new_blocks
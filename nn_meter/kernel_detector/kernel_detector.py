@@ -1,53 +1,182 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import copy
+import logging
 from nn_meter.utils.graph_tool import ModelGraph
+from nn_meter.utils.compact_graph import CompactGraph
 from .utils.constants import DUMMY_TYPES
 from .utils.ir_tools import convert_nodes
 from .rule_reader import RuleReader
 from .rule_splitter import RuleSplitter
+from .template_cache import KernelTemplate, KernelTemplateCache, hash_topology
+from .incremental_detector import build_detection_state, update_detection_state
+logging = logging.getLogger("nn-Meter")
 
 
 class KernelDetector:
-    def __init__(self, rule_file):
+    def __init__(self, rule_file, compact=False, template_cache=None):
+        """
+        @params:
+        rule_file: path to the fusion rule file
+        compact: if True, the rule splitter and kernel extraction run on the array-backed `CompactGraph` instead of the
+            dict based `ModelGraph`, which gives the same kernels with less memory per graph
+        template_cache: a `KernelTemplateCache` to reuse the detected kernels of graphs of the same topology, see
+            `enable_template_cache`
+        """
+        self.compact = compact
+        self.template_cache = template_cache
         self.reader = RuleReader(rule_file)
         self.splitter = RuleSplitter(self.reader)
         self.model_graph = None
         self.bbs = []
         self._global_index = 0
 
-    def load_graph(self, graph):
+    def enable_template_cache(self, capacity=1024, cache=None):
+        """
+        reuse the basic-block partition of graphs of the same topology, e.g., the channel, kernel size or resolution
+        variants of a model in a search space. The kernels of a graph are detected once per topology fingerprint
+        (`hash_topology`), and later graphs of the same fingerprint only rebind the attrs and shapes of their nodes to
+        the cached kernels. Return the `KernelTemplateCache` object.
+        @params:
+
+        capacity: the maximum number of cached topologies, the least recently used one is evicted first
+
+        cache: an existing `KernelTemplateCache` object to share among detectors of the same fusion rules. If given,
+            `capacity` is ignored.
+        """
+        if cache is None:
+            cache = KernelTemplateCache(capacity)
+        self.template_cache = cache
+        return cache
+
+    def disable_template_cache(self):
+        self.template_cache = None
+
+    def detect(self, graph):
+        """
+        return the kernels of the nn-Meter IR graph. All states of the detection are kept in local variables instead of
+        the detector, so that one detector could be shared by concurrent threads. The given graph is never modified.
+        """
+        # `convert_nodes` returns a private copy of the graph containers, the caller's graph is never modified
         new_graph = convert_nodes(graph)
-        self.model_graph = ModelGraph(graph=new_graph)
-        self.model_graph.refresh()
+        template_cache = self.template_cache
+        if template_cache is None:
+            kernels, _ = self._detect_kernels(new_graph)
+            return kernels
+
+        key = hash_topology(new_graph)
+        template = template_cache.get(key)
+        if template is None:
+            kernels, template = self._detect_kernels(new_graph, with_template=True)
+            template_cache.put(key, template)
+        else:
+            kernels = self._rebind_template(template, list(new_graph.values()))
+        return kernels
+
+    def detect_state(self, graph):
+        """ detect the kernels of the nn-Meter IR graph, and return a `DetectionState` to be updated by `update_state`
+        for edits of the graph
+        """
+        return build_detection_state(self, graph)
+
+    def update_state(self, state, replaced=None, added=None, removed=None):
+        """ return the `DetectionState` of the graph of the state edited by a node-level diff, and the ids of the blocks
+        whose kernels are new. Only the fusion around the changed nodes is run again. Refer to `update_detection_state`
+        for details.
+        """
+        return update_detection_state(self, state, replaced, added, removed)
+
+    def _detect_kernels(self, new_graph, with_template=False):
+        """ detect the kernels of the converted graph. If `with_template`, return the `KernelTemplate` of the kernels
+        instead of the layer-kernel dict.
+        """
+        if with_template:
+            # the attr dicts of the converted nodes are kept by the fused nodes of `ModelGraph`, and the original ids by
+            # those of `CompactGraph`, to locate the nodes giving the attrs and shapes of the kernels
+            indices = {id(node["attr"]): index for index, node in enumerate(new_graph.values())}
+            name_indices = {name: index for index, name in enumerate(new_graph)}
+        model_graph = self._build_model_graph(new_graph)
+        fusion_graph = self.splitter.build_fusion_graph(model_graph)
+        bbs = fusion_graph.get_basicblocks()
+        kernels, layer_kernel_dict = self._extract_kernels(model_graph, bbs, fusion_graph)
+        if not with_template:
+            return kernels, layer_kernel_dict
+
+        items = []
+        for bb in bbs:
+            kernel = layer_kernel_dict.get(bb[0])
+            if kernel is None:
+                continue
+            if isinstance(model_graph, CompactGraph):
+                origin = name_indices[model_graph.names[model_graph.get_node_origin(bb[0])]]
+            else:
+                origin = indices[id(model_graph.get_node_attr(bb[0]))]
+            outbounds = tuple(kernel["outbounds"]) if "outbounds" in kernel else None
+            items.append((kernel["op"], kernel["name"], self._get_bb_types(model_graph, bb)[0], origin,
+                          tuple(kernel["inbounds"]), outbounds))
+        return kernels, KernelTemplate(items)
+
+    def _rebind_template(self, template, nodes):
+        kernels = []
+        for op, name, type, origin, inbounds, outbounds in template.items:
+            kernel = {
+                "op": op,
+                "name": name,
+            }
+            self._set_kernel_attrs(kernel, type, nodes[origin]["attr"])
+            kernel["inbounds"] = list(inbounds)
+            if outbounds is not None:
+                kernel["outbounds"] = list(outbounds)
+            kernels.append(kernel)
+        return kernels
+
+    def _build_model_graph(self, new_graph):
+        model_graph = ModelGraph(graph=new_graph, deepcopy=False)
+        model_graph.refresh()
+        if self.compact:
+            try:
+                model_graph = CompactGraph.from_dict(model_graph.get_graph())
+            except TypeError as e:
+                logging.info(f"Fall back to ModelGraph for kernel detection: {e}")
+        return model_graph
+
+    def load_graph(self, graph):
+        """ detect the basic blocks of the graph, and keep the states in the detector for `get_kernels`. Not
+        thread-safe, use `detect` instead for concurrent detection.
+        """
+        self.model_graph = self._build_model_graph(convert_nodes(graph))
         self.bbs = self.splitter.split(self.model_graph)
 
     def get_kernels(self):
+        kernels, self._layer_kernel_dict = self._extract_kernels(
+            self.model_graph, self.bbs, self.splitter._fusion_graph
+        )
+        self._global_index = len(self.bbs)
+        return kernels
+
+    def _extract_kernels(self, model_graph, bbs, fusion_graph):
         kernels = []
-        self._global_index = 0
-        self._layer_kernel_dict = {}
+        layer_kernel_dict = {}
 
-        for bb in self.bbs:
-            kernel = self._bb_to_kernel(bb)
-            self._global_index += 1
+        for index, bb in enumerate(bbs):
+            kernel = self._bb_to_kernel(model_graph, bb, index, layer_kernel_dict)
             if kernel is not None:
                 kernels.append(kernel)
 
-        self._fetch_connections(kernels)
-        return kernels
-
-    def _fetch_connections(self, kernels):
-        fusion_graph = self.splitter._fusion_graph
+        self._fetch_connections(kernels, fusion_graph, layer_kernel_dict)
+        return kernels, layer_kernel_dict
 
+    def _fetch_connections(self, kernels, fusion_graph, layer_kernel_dict):
         for kernel in kernels:
             kernel["inbounds"] = []
 
         for i in range(len(fusion_graph)):
             layer = fusion_graph[i]
-            kernel = self._layer_kernel_dict.get(layer)
+            kernel = layer_kernel_dict.get(layer)
 
             if kernel:
                 outbounds = [fusion_graph.find_root(outbound) for outbound in fusion_graph.get_outbounds(i)]
-                outbounds = [self._layer_kernel_dict[outbound] for outbound in outbounds]
+                outbounds = [layer_kernel_dict[outbound] for outbound in outbounds]
 
                 for outbound in outbounds:
                     outbound["inbounds"].append(kernel["name"])
@@ -55,14 +184,17 @@ class KernelDetector:
                 outbounds = [outbound["name"] for outbound in outbounds]
                 kernel["outbounds"] = outbounds
 
-    def _bb_to_kernel(self, bb):
-        types = [self.model_graph.get_node_type(node) for node in bb]
+    def _get_bb_types(self, model_graph, bb):
+        types = [model_graph.get_node_type(node) for node in bb]
         # logging.info(types)
-        types = [t for t in types if t and t not in DUMMY_TYPES]
+        return [t for t in types if t and t not in DUMMY_TYPES]
+
+    def _bb_to_kernel(self, model_graph, bb, index, layer_kernel_dict):
+        types = self._get_bb_types(model_graph, bb)
 
         if types:
             type = "-".join(types)
-            name = f"{type}#{self._global_index}"
+            name = f"{type}#{index}"
 
             kernel = {
                 "op": type,
@@ -70,35 +202,40 @@ class KernelDetector:
             }
 
             layer = bb[0]
-            self._layer_kernel_dict[layer] = kernel
-            type = types[0]
-            attr = self.model_graph.get_node_attr(layer)["attr"]
-            input_shape = self.model_graph.get_node_attr(layer)["input_shape"]
-            output_shape = self.model_graph.get_node_attr(layer)["output_shape"]
-
-            # Remove const from first biasadd of hswish
-            if type == "hswish":
-                input_shape = [input_shape[0]]
-            kernel["input_tensors"] = input_shape
-
-            if "ks" in attr:
-                kernel["ks"] = attr["ks"]
-            if "strides" in attr:
-                kernel["strides"] = attr["strides"]
-            if "split_dim" in attr:
-                kernel["split_dim"] = attr["split_dim"]
-
-            if len(input_shape) >= 1:
-                if len(input_shape[0]) == 4:
-                    kernel["inputh"] = input_shape[0][1]
-                    kernel["inputw"] = input_shape[0][2]
-                kernel["cin"] = input_shape[0][-1]
-
-            if len(output_shape) == 1:
-                kernel["cout"] = output_shape[0][-1]
-            elif len(output_shape) > 1:
-                kernel["output_tensors"] = output_shape
-
+            layer_kernel_dict[layer] = kernel
+            self._set_kernel_attrs(kernel, types[0], model_graph.get_node_attr(layer))
             return kernel
         else:
             return None
+
+    def _set_kernel_attrs(self, kernel, type, node_attr):
+        """ set the shapes and attrs of the kernel by the attr of its first layer, whose first op is of the given type.
+        The shapes and attrs are shared with the caller's graph by `convert_nodes`, so they are copied into the kernel,
+        which could then be modified by its consumers without touching the caller's graph.
+        """
+        attr = node_attr["attr"]
+        input_shape = [copy.copy(shape) for shape in node_attr["input_shape"]]
+        output_shape = node_attr["output_shape"]
+
+        # Remove const from first biasadd of hswish
+        if type == "hswish":
+            input_shape = [input_shape[0]]
+        kernel["input_tensors"] = input_shape
+
+        if "ks" in attr:
+            kernel["ks"] = copy.copy(attr["ks"])
+        if "strides" in attr:
+            kernel["strides"] = copy.copy(attr["strides"])
+        if "split_dim" in attr:
+            kernel["split_dim"] = copy.copy(attr["split_dim"])
+
+        if len(input_shape) >= 1:
+            if len(input_shape[0]) == 4:
+                kernel["inputh"] = input_shape[0][1]
+                kernel["inputw"] = input_shape[0][2]
+            kernel["cin"] = input_shape[0][-1]
+
+        if len(output_shape) == 1:
+            kernel["cout"] = output_shape[0][-1]
+        elif len(output_shape) > 1:
+            kernel["output_tensors"] = [copy.copy(shape) for shape in output_shape]
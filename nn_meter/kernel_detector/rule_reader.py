@@ -1,46 +1,45 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import json
+import hashlib
+import threading
+import numpy as np
+from types import MappingProxyType
 from .fusion_lib import get_fusion_unit
+from .utils.pattern_matcher import PatternMatcher
 from nn_meter.utils.graph_tool import ModelGraph
 
 
-class RuleReader:
-    rules_default = {
+class CompiledFusionRules:
+    """
+    The immutable tables compiled from the content of a fusion rule file, shared by all `RuleReader` objects of the same
+    content. Use `compile_fusion_rules` to get the cached object instead of building it directly.
+
+    The fusible pairs of op types are given by a boolean matrix of op type ids, whose last row and column stand for all
+    op types not mentioned by the rules. The fusion units, i.e., the multi-op blocks and the fusion rules of more than
+    two ops, are built once together with their `PatternMatcher`, and the rule flags (e.g., "MON") are resolved with
+    their defaults. The fusion unit graphs are shared and should be treated as read-only.
+    """
+    rules_default = MappingProxyType({
         "MON": 0,
         "FN": True,
-    }
+    })
 
-    multiop_blocks = ["se", "hswish", "channelshuffle", "gap"]
+    multiop_blocks = ("se", "hswish", "channelshuffle", "gap")
 
-    def __init__(self, rule_file=None):
-        self.rules = {}
-        if rule_file:
-            with open(rule_file, "r") as fp:
-                self.rules = json.load(fp)
-        self._extract_fusible()
-        self._parse_multiop_block()
-
-    def is_fusible(self, node_type, outnode_type):
-        return (node_type, outnode_type) in self.fusible
+    def __init__(self, rules):
+        self.rules = MappingProxyType(rules)
 
-    def query_rule(self, rule):
-        if rule not in self.rules or self.rules[rule]["obey"] is None:
-            return self.rules_default[rule]
-        else:
-            return self.rules[rule]["obey"]
-
-    def _extract_fusible(self):
         def get_name(i):
             return f"{ops[i]}_{i}"
 
-        self.fusible = []
-        self.fusion_units = {}
-        for name, rule in self.rules.items():
+        fusible = []
+        fusion_units = {}
+        for name, rule in rules.items():
             if rule["obey"] and name.startswith("BF"):
                 ops = name.split("_")[1:]
                 if len(ops) == 2:
-                    self.fusible.append((ops[0], ops[1]))
+                    fusible.append((ops[0], ops[1]))
                 elif len(ops) > 2:
                     fusion_unit = {}
                     for i in range(0, len(ops)):
@@ -52,8 +51,81 @@ class RuleReader:
                             "inbounds": [get_name(i - 1)] if i > 0 else [],
                             "outbounds": [get_name(i + 1)] if i < len(ops) - 1 else [],
                         }
-                    self.fusion_units["-".join(ops)] = [ModelGraph(graph=fusion_unit)]
-
-    def _parse_multiop_block(self):
+                    fusion_units["-".join(ops)] = (ModelGraph(graph=fusion_unit, deepcopy=False),)
         for block in self.multiop_blocks:
-            self.fusion_units[block] = get_fusion_unit(block)
+            fusion_units[block] = tuple(get_fusion_unit(block))
+
+        self.fusible = tuple(fusible)
+        self.op_types = tuple(dict.fromkeys(type for pair in fusible for type in pair))
+        self.type_ids = MappingProxyType({type: index for index, type in enumerate(self.op_types)})
+        matrix = np.zeros((len(self.op_types) + 1, len(self.op_types) + 1), dtype=bool)
+        for node_type, outnode_type in fusible:
+            matrix[self.type_ids[node_type], self.type_ids[outnode_type]] = True
+        matrix.setflags(write=False)
+        self.fusible_matrix = matrix
+        self.fusible_table = tuple(tuple(row) for row in matrix.tolist())  # for scalar lookups in Python loops
+
+        self.fusion_units = MappingProxyType(fusion_units)
+        self.matchers = MappingProxyType({
+            type: tuple(PatternMatcher(block) for block in blocks)
+            for type, blocks in fusion_units.items()
+        })
+        self.flags = MappingProxyType({rule: self._resolve_rule(rule) for rule in self.rules_default})
+
+    def _resolve_rule(self, rule):
+        if rule not in self.rules or self.rules[rule]["obey"] is None:
+            return self.rules_default[rule]
+        else:
+            return self.rules[rule]["obey"]
+
+    def get_type_id(self, type):
+        """ return the id of the op type in the fusible matrix, all unknown op types share the last id
+        """
+        return self.type_ids.get(type, len(self.op_types))
+
+    def is_fusible(self, node_type, outnode_type):
+        return self.fusible_table[self.get_type_id(node_type)][self.get_type_id(outnode_type)]
+
+    def query_rule(self, rule):
+        if rule in self.flags:
+            return self.flags[rule]
+        return self._resolve_rule(rule)
+
+
+_compiled_rules = {}
+_compiled_rules_lock = threading.Lock()
+
+
+def compile_fusion_rules(rule_file=None):
+    """
+    return the `CompiledFusionRules` of the rule file. The compiled rules are cached in the process by the sha256 of the
+    file content, so that building many detectors of the same rules parses the rules and fusion units only once.
+    """
+    content = b"{}"
+    if rule_file:
+        with open(rule_file, "rb") as fp:
+            content = fp.read()
+    key = hashlib.sha256(content).hexdigest()
+    with _compiled_rules_lock:
+        compiled = _compiled_rules.get(key)
+        if compiled is None:
+            compiled = _compiled_rules[key] = CompiledFusionRules(json.loads(content))
+    return compiled
+
+
+class RuleReader:
+    rules_default = CompiledFusionRules.rules_default
+
+    multiop_blocks = CompiledFusionRules.multiop_blocks
+
+    def __init__(self, rule_file=None):
+        self.compiled = compile_fusion_rules(rule_file)
+        self.rules = self.compiled.rules
+        self.fusible = self.compiled.fusible
+        self.fusion_units = self.compiled.fusion_units
+
+    def is_fusible(self, node_type, outnode_type):
+        return self.compiled.is_fusible(node_type, outnode_type)
+
+    def query_rule(self, rule):
+        return self.compiled.query_rule(rule)
@@ -1,7 +1,6 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 from .rule_reader import RuleReader
-from .utils.match_helper import MatchHelper
 from .utils.fusion_aware_graph import FusionAwareGraph
 from nn_meter.utils.graph_tool import ModelGraph
 
@@ -9,57 +8,89 @@ from nn_meter.utils.graph_tool import ModelGraph
 class RuleSplitter:
     def __init__(self, rule_reader: RuleReader):
         self.rule_reader = rule_reader
+        # the pattern matchers of fusion units are pre-built with the compiled rules
+        self.matchers = rule_reader.compiled.matchers
 
     def fuse_multiop_blocks(self, model_graph: ModelGraph):
-        for type, blocks in self.rule_reader.fusion_units.items():
-            for block in blocks:
-                subgraphs = model_graph.find_subgraphs(block, MatchHelper.op_type_matcher)
+        for type, matchers in self.matchers.items():
+            for matcher in matchers:
+                subgraphs = matcher.find(model_graph)
                 for subgraph in subgraphs:
                     model_graph.fuse(subgraph.keys(), type)
 
     def split(self, model_graph: ModelGraph):
         """
-        Apply rules to graph
+        Apply rules to graph, return the basic blocks. The fusion graph is kept in `_fusion_graph`, use
+        `build_fusion_graph` instead for concurrent splitting.
+        """
+        self._fusion_graph = self.build_fusion_graph(model_graph)
+        return self._fusion_graph.get_basicblocks()
+
+    def build_fusion_graph(self, model_graph: ModelGraph):
+        """
+        Apply rules to graph, return the `FusionAwareGraph` whose basic blocks are fused. No state is kept in the
+        splitter.
+
+        Each node in topological order, if not fused yet, becomes the root of a basic block and keeps fusing its fusible
+        outnodes, with a worklist of candidate outnodes per root instead of stepping back and rescanning the outbounds
+        after every fuse. The fuses are made in the same order as the stepping algorithm, so that the basic blocks and
+        the outbounds of the fusion graph are the same:
+            MON == 0: fuse while the root has a single outnode, and replace the outbounds of the root by the outnode's
+            MON == 1: fuse the first fusible outnode in the iteration order of the root's outbounds, which are updated
+                by the outnode's, until no fusible outnode is left
         """
         self.preprocess(model_graph)
         fusion_graph = FusionAwareGraph(model_graph)
+        compiled = self.rule_reader.compiled
+        fusible = compiled.fusible_table
+        type_ids = [compiled.get_type_id(fusion_graph.get_type(i)) for i in range(len(fusion_graph))]
+        mon = compiled.query_rule("MON")
 
-        i = -1
-        while i < len(fusion_graph) - 1:
-            i += 1
+        for i in range(len(fusion_graph)):
             if fusion_graph.is_fused(i):
                 continue
             fusion_graph.mark_ready(i)
-            if not fusion_graph.get_outbounds(i):
-                continue
-            # MON
-            mon = self.rule_reader.query_rule("MON")
+            fusible_row = fusible[type_ids[i]]
+
             if mon == 0:  # can't fuse if having multiple out node
-                if len(fusion_graph.get_outbounds(i)) > 1:
-                    continue
-            # FN: TODO: which one is the first node
-            fused = False
-            for j in fusion_graph.get_outbounds(i):
-                if fusion_graph.is_fused(j):
-                    continue
-                outnode_type = fusion_graph.get_type(j)
-                node_type = fusion_graph.get_type(i)
-                if not self.rule_reader.is_fusible(node_type, outnode_type):
-                    continue
-                # fuse node
-                if mon == 0:
+                outbounds = fusion_graph.get_outbounds(i)
+                while len(outbounds) == 1:
+                    j = next(iter(outbounds))
+                    if fusion_graph.is_fused(j) or not fusible_row[type_ids[j]]:
+                        break
                     fusion_graph.fuse(i, j)
-                else:
+                    fusion_graph.mark_ready(j)
+                    outbounds = fusion_graph.get_outbounds(i)
+
+            elif mon == 1:  # only fused to first outnode
+                outbounds = fusion_graph.get_outbounds(i)
+                candidates = {j for j in outbounds if not fusion_graph.is_fused(j) and fusible_row[type_ids[j]]}
+                while candidates:
+                    if len(candidates) == 1:
+                        j = candidates.pop()
+                    else:
+                        # FN: TODO: which one is the first node
+                        j = next(j for j in outbounds if j in candidates)
+                        candidates.discard(j)
+                    new_outbounds = [k for k in fusion_graph.get_outbounds(j) if k not in outbounds]
                     fusion_graph.fuse(i, j, True)
-                fusion_graph.mark_ready(j)
+                    fusion_graph.mark_ready(j)
+                    candidates.update(
+                        k for k in new_outbounds if not fusion_graph.is_fused(k) and fusible_row[type_ids[k]]
+                    )
+
+            else:  # fused to all fusible outnodes
                 fused = True
-                if mon == 1:  # only fused to first outnode
-                    break
-            if fused:
-                i -= 1
+                while fused:
+                    fused = False
+                    for j in fusion_graph.get_outbounds(i):
+                        if fusion_graph.is_fused(j) or not fusible_row[type_ids[j]]:
+                            continue
+                        fusion_graph.fuse(i, j, True)
+                        fusion_graph.mark_ready(j)
+                        fused = True
 
-        self._fusion_graph = fusion_graph
-        return fusion_graph.get_basicblocks()
+        return fusion_graph
 
     def preprocess(self, model_graph: ModelGraph):
         self.fuse_multiop_blocks(model_graph)
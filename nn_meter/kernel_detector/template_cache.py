@@ -0,0 +1,48 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import hashlib
+from nn_meter.utils.lru_cache import LRUCache
+
+
+def hash_topology(graph):
+    """
+    return the sha256 hex digest of the topology of a graph converted by `convert_nodes`, i.e., the op types and the
+    inbounds of the nodes in the order of the graph dict. Nodes are identified by their indices instead of names, and
+    the shapes and attrs are ignored, so that the variants of a model with different channels, kernel sizes or input
+    resolution share the same hash, as long as they are converted to the same op types.
+    """
+    index = {name: i for i, name in enumerate(graph)}
+    missing = {}  # inbounds not in the graph are identified by the order of their first appearance
+    records = []
+    for node in graph.values():
+        attr = node["attr"]
+        inbounds = node.get("inbounds")
+        if inbounds is not None:
+            inbounds = [
+                index[inbound] if inbound in index else -1 - missing.setdefault(inbound, len(missing))
+                for inbound in inbounds
+            ]
+        records.append([attr["type"], inbounds, "_tagged" in attr["attr"]])
+    return hashlib.sha256(json.dumps(records, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class KernelTemplate:
+    """
+    The kernels detected from a graph with the shapes and attrs left out, to be rebound to the nodes of another graph of
+    the same topology. Each item is (op, name, type of the first op, index of the node giving the attrs and shapes in
+    the converted graph, inbounds, outbounds).
+    """
+    def __init__(self, items):
+        self.items = tuple(items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class KernelTemplateCache(LRUCache):
+    """
+    A bounded, thread-safe LRU cache of `KernelTemplate` keyed by `hash_topology` of the converted graph.
+    """
+    def __init__(self, capacity=1024):
+        super().__init__(capacity)
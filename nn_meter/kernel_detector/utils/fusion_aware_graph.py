@@ -1,6 +1,5 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
-import networkx as nx
 from .union_find import UF
 from nn_meter.utils.graph_tool import ModelGraph
 
@@ -8,7 +7,7 @@ from nn_meter.utils.graph_tool import ModelGraph
 class FusionAwareGraph:
     def __init__(self, model_graph: ModelGraph):
         self._model_graph = model_graph
-        self._dag = list(nx.topological_sort(model_graph.get_networkx_graph()))
+        self._dag = model_graph.get_topological_order()
         self._uf = UF(len(self._dag))
 
         reverse = {}
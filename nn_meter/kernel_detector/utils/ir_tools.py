@@ -1,14 +1,32 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
-import copy
 from .constants import OP_ALIAS
 
 
+def copy_node(node):
+    """
+    return a copy of the containers of a node that are modified by normalization and fusion, i.e., the node dict, the
+    inbounds and outbounds lists, node["attr"] and node["attr"]["attr"]. Other values such as shapes and attribute
+    payloads are shared with the original node, and should be treated as read-only.
+    """
+    new_node = dict(node)
+    if "inbounds" in node:
+        new_node["inbounds"] = list(node["inbounds"])
+    if "outbounds" in node:
+        new_node["outbounds"] = list(node["outbounds"])
+    if "attr" in node:
+        new_node["attr"] = dict(node["attr"])
+        if isinstance(node["attr"].get("attr"), dict):
+            new_node["attr"]["attr"] = dict(node["attr"]["attr"])
+    return new_node
+
+
 def convert_nodes(graph):
     """
-    Resolve inconsistency between ONNX and Tensorflow
+    Resolve inconsistency between ONNX and Tensorflow. The given graph is not modified. Instead of a deep copy, the
+    nodes of the returned graph are copied by `copy_node`, so that large attribute payloads are never copied.
     """
-    new_graph = copy.deepcopy(graph)
+    new_graph = {name: copy_node(node) for name, node in graph.items()}
 
     for _, node in new_graph.items():
         type = node["attr"]["type"]
@@ -0,0 +1,152 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from collections import Counter
+
+
+class PatternMatcher:
+    """
+    Find the subgraphs of a model graph which are isomorphic to a small pattern graph (e.g., a fusion unit), as a
+    drop-in replacement of `ModelGraph.find_subgraphs(pattern, MatchHelper.op_type_matcher)`, which runs VF2 over the
+    whole model graph for every pattern.
+
+    The model nodes are indexed by op type, and the search is anchored on the pattern node of the rarest op type in the
+    model graph, then extended along the inbound and outbound edges of matched nodes. The matching semantics are the
+    same as VF2 with `MatchHelper.op_type_matcher`: pattern nodes of type "dummy" match any node, nodes tagged by
+    `_tagged` never match, and the matched nodes induce exactly the edges (with multiplicity) of the pattern. A chain
+    pattern is therefore matched in time linear to the size of the model graph. The model graph could be a `ModelGraph`
+    or a `CompactGraph`, whose adjacency view gives the nodes by names or ids respectively.
+
+    The same mappings as VF2 are returned, each as a dict of model node name to pattern node name excluding the dummy
+    nodes, with the items in the order VF2 maps the pattern nodes. Note that the order of the mappings themselves is
+    unspecified, as it is for VF2, which iterates over a set of nodes.
+    """
+    def __init__(self, pattern):
+        graph = pattern.get_graph()
+        # the order of nodes in the networkx view, refer to `ModelGraph.get_networkx_graph`
+        order = {}
+        for name, node in graph.items():
+            order.setdefault(name, len(order))
+            for inbound in node.get("inbounds", []):
+                order.setdefault(inbound, len(order))
+        # a node referred only by inbounds has no type, and could never be matched
+        self.valid = all(name in graph for name in order)
+
+        self.nodes = sorted(order, key=order.get)
+        self.types = {name: graph[name]["attr"]["type"] for name in graph}
+        self.edges = Counter(
+            (inbound, name) for name, node in graph.items() for inbound in node.get("inbounds", [])
+        )
+        self.preds = {name: set() for name in self.nodes}
+        self.succs = {name: set() for name in self.nodes}
+        for src, dst in self.edges:
+            self.preds[dst].add(src)
+            self.succs[src].add(dst)
+        self.output_order = [name for name in self._get_vf2_order(order) if self.types.get(name) != "dummy"]
+
+    def _get_vf2_order(self, order):
+        """ return the order VF2 maps the pattern nodes, which depends on the pattern only: the first unmapped successor
+        of the mapped nodes, otherwise the first unmapped predecessor, otherwise the first unmapped node.
+        """
+        mapped, mapped_set = [], set()
+        while len(mapped) < len(self.nodes):
+            candidates = {s for m in mapped for s in self.succs[m]} - mapped_set
+            if not candidates:
+                candidates = {p for m in mapped for p in self.preds[m]} - mapped_set
+            if not candidates:
+                candidates = set(self.nodes) - mapped_set
+            node = min(candidates, key=order.get)
+            mapped.append(node)
+            mapped_set.add(node)
+        return mapped
+
+    def _get_search_order(self, anchor):
+        """ start from the anchor and extend along the edges of the pattern, so that each node but the first of a
+        connected component is searched among the neighbors of a matched node
+        """
+        searched, order = {anchor}, [(anchor, None, None)]
+        while len(order) < len(self.nodes):
+            for node, _, _ in order:
+                extended = False
+                for succ in sorted(self.succs[node] - searched, key=self.nodes.index):
+                    order.append((succ, node, "succ"))
+                    searched.add(succ)
+                    extended = True
+                for pred in sorted(self.preds[node] - searched, key=self.nodes.index):
+                    order.append((pred, node, "pred"))
+                    searched.add(pred)
+                    extended = True
+                if extended:
+                    break
+            else:
+                # disconnected pattern, start a new component
+                node = next(n for n in self.nodes if n not in searched)
+                order.append((node, None, None))
+                searched.add(node)
+        return order
+
+    def find(self, model_graph):
+        """ return the list of matched subgraphs in the model graph
+        """
+        if not self.valid:
+            return []
+        # the nodes indexed by op type and the edges given by inbounds, maintained by the model graph across fusions
+        adjacency = model_graph.get_adjacency()
+        by_type = adjacency.by_type
+
+        def get_candidates(ptype):
+            if ptype == "dummy":
+                return adjacency.get_nodes()
+            # a model node of type "dummy" matches any pattern node as well
+            return list(by_type.get(ptype, ())) + list(by_type.get("dummy", ()))
+
+        def is_type_matched(name, ptype):
+            if adjacency.is_tagged(name):
+                return False
+            gtype = adjacency.get_type(name)
+            return ptype == "dummy" or gtype == "dummy" or gtype == ptype
+
+        typed = [n for n in self.nodes if self.types[n] != "dummy"]
+        if typed:
+            anchor = min(typed, key=lambda n: len(by_type.get(self.types[n], ())))
+        else:
+            anchor = self.nodes[0]
+        search_order = self._get_search_order(anchor)
+
+        matches = []
+        mapping, used = {}, set()  # pattern node to model node
+
+        def is_feasible(pnode, name):
+            # the edges between the new node and the matched nodes should be the same as the pattern, including
+            # self-loops
+            if adjacency.count_edges(name, name) != self.edges.get((pnode, pnode), 0):
+                return False
+            for qnode, qname in mapping.items():
+                if adjacency.count_edges(qname, name) != self.edges.get((qnode, pnode), 0):
+                    return False
+                if adjacency.count_edges(name, qname) != self.edges.get((pnode, qnode), 0):
+                    return False
+            return True
+
+        def search(depth):
+            if depth == len(search_order):
+                matches.append({mapping[pnode]: pnode for pnode in self.output_order})
+                return
+            pnode, via, direction = search_order[depth]
+            ptype = self.types[pnode]
+            if via is None:
+                candidates = get_candidates(ptype)
+            elif direction == "succ":
+                candidates = adjacency.get_succs(mapping[via])
+            else:
+                candidates = adjacency.get_preds(mapping[via])
+            for name in candidates:
+                if name in used or not is_type_matched(name, ptype) or not is_feasible(pnode, name):
+                    continue
+                mapping[pnode] = name
+                used.add(name)
+                search(depth + 1)
+                del mapping[pnode]
+                used.discard(name)
+
+        search(0)
+        return matches
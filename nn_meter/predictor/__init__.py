@@ -1,3 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
-from .nn_meter_predictor import nnMeterPredictor, list_latency_predictors, load_latency_predictor
+from .nn_meter_predictor import (
+    nnMeterPredictor, list_latency_predictors, load_latency_predictor, bundle_latency_predictor
+)
+from .latency_lut import LatencyLUT, load_search_space
+from .prediction_handle import PredictionHandle
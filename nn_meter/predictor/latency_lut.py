@@ -0,0 +1,328 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import math
+import logging
+import itertools
+import numpy as np
+logging = logging.getLogger("nn-Meter")
+
+
+class _IRBuilder:
+    """ build a small nn-Meter IR graph in the Tensorflow flavor op by op
+    """
+    def __init__(self):
+        self.graph = {}
+
+    def _add(self, name, type, inbounds, input_shape, output_shape, attr=None):
+        self.graph[name] = {
+            "inbounds": inbounds,
+            "attr": {
+                "name": name,
+                "type": type,
+                "output_shape": [output_shape],
+                "attr": attr or {},
+                "input_shape": input_shape,
+            },
+            "outbounds": [],
+        }
+        for inbound in inbounds:
+            self.graph[inbound]["outbounds"].append(name)
+        return name
+
+    def shape(self, name):
+        return self.graph[name]["attr"]["output_shape"][0]
+
+    def placeholder(self, name, shape):
+        return self._add(name, "Placeholder", [], [], list(shape), {"shape": list(shape)})
+
+    def conv(self, name, x, cout, ks, stride, depthwise=False):
+        b, h, w, cin = self.shape(x)
+        output_shape = [b, math.ceil(h / stride), math.ceil(w / stride), cin if depthwise else cout]
+        attr = {
+            "padding": "SAME",
+            "strides": [stride, stride],
+            "data_format": "NHWC",
+            "dilations": [1, 1],
+            "kernel_shape": [ks, ks],
+            "weight_shape": [ks, ks, cin, 1 if depthwise else cout],
+            "pads": [0, 0, 0, 0],
+        }
+        type = "DepthwiseConv2dNative" if depthwise else "Conv2D"
+        return self._add(name, type, [x], [self.shape(x)], output_shape, attr)
+
+    def unary(self, name, type, x, attr=None):
+        return self._add(name, type, [x], [self.shape(x)], self.shape(x), attr)
+
+    def add(self, name, x, y):
+        return self._add(name, "Add", [x, y], [self.shape(x), self.shape(y)], self.shape(x))
+
+    def mean(self, name, x):
+        b, _, _, c = self.shape(x)
+        return self._add(name, "Mean", [x], [self.shape(x)], [b, c], {"reduction_indices": [1, 2]})
+
+    def matmul(self, name, x, cout):
+        b, _ = self.shape(x)
+        return self._add(name, "MatMul", [x], [self.shape(x)], [b, cout])
+
+    def conv_bn_relu6(self, name, x, cout, ks, stride, depthwise=False, relu=True):
+        x = self.conv(f"{name}/conv", x, cout, ks, stride, depthwise)
+        x = self.unary(f"{name}/bn", "FusedBatchNorm", x, {"data_format": "NHWC"})
+        if relu:
+            x = self.unary(f"{name}/relu6", "Relu6", x)
+        return x
+
+
+def build_inverted_residual_graph(resolution, cin, cout, kernel_size, expand_ratio, stride):
+    """ return the nn-Meter IR graph of a MobileNetV2 inverted residual block, i.e., 1x1 expansion conv (skipped if
+    `expand_ratio` is 1), depthwise conv and 1x1 projection conv, with a residual add if `stride` is 1 and `cin` equals
+    `cout`. The shape of input tensor is [1, resolution, resolution, cin].
+    """
+    builder = _IRBuilder()
+    x = input = builder.placeholder("input", [1, resolution, resolution, cin])
+    hidden = int(round(cin * expand_ratio))
+    if expand_ratio != 1:
+        x = builder.conv_bn_relu6("expand", x, hidden, 1, 1)
+    x = builder.conv_bn_relu6("depthwise", x, hidden, kernel_size, stride, depthwise=True)
+    x = builder.conv_bn_relu6("project", x, cout, 1, 1, relu=False)
+    if stride == 1 and cin == cout:
+        builder.add("residual", x, input)
+    return builder.graph
+
+
+def build_stem_graph(resolution, cout, kernel_size, stride):
+    """ return the nn-Meter IR graph of the stem conv-bn-relu6 on an RGB input of [1, resolution, resolution, 3]
+    """
+    builder = _IRBuilder()
+    x = builder.placeholder("input", [1, resolution, resolution, 3])
+    builder.conv_bn_relu6("stem", x, cout, kernel_size, stride)
+    return builder.graph
+
+
+def build_head_graph(resolution, cin, channels, num_classes):
+    """ return the nn-Meter IR graph of the classification head, i.e., 1x1 conv-bn-relu6 (skipped if `channels` is
+    None), global average pooling and the fully connected layer. The shape of input tensor is
+    [1, resolution, resolution, cin].
+    """
+    builder = _IRBuilder()
+    x = builder.placeholder("input", [1, resolution, resolution, cin])
+    if channels:
+        x = builder.conv_bn_relu6("head", x, channels, 1, 1)
+    x = builder.mean("pool", x)
+    builder.matmul("fc", x, num_classes)
+    return builder.graph
+
+
+def load_search_space(search_space):
+    """ load the search space spec from a dict or a json/yaml file, and fill the default values. An example of the
+    MobileNetV2-style search space spec is:
+
+        {
+            "resolutions": [192, 224],
+            "stem": {"channels": 32, "kernel_size": 3, "stride": 2},
+            "layers": [
+                {"stride": 1, "kernel_sizes": [3], "expand_ratios": [1], "channels": [16]},
+                {"stride": 2, "kernel_sizes": [3, 5, 7], "expand_ratios": [3, 6], "channels": [24, 32]},
+                ...
+            ],
+            "head": {"channels": 1280, "num_classes": 1000}
+        }
+
+    "stem" and "head" are optional. Without "stem", the input channel of the first layer is given by "input_channels"
+    (default to be 3). The input channel of each layer is the chosen output channel of its previous layer.
+    """
+    if isinstance(search_space, str):
+        with open(search_space, "r") as fp:
+            if search_space.endswith(".json"):
+                search_space = json.load(fp)
+            else:
+                import yaml
+                search_space = yaml.load(fp, yaml.FullLoader)
+
+    stem, head = search_space.get("stem"), search_space.get("head")
+    spec = {
+        "resolutions": [int(r) for r in search_space["resolutions"]],
+        "stem": None if stem is None else {
+            "channels": int(stem["channels"]),
+            "kernel_size": int(stem.get("kernel_size", 3)),
+            "stride": int(stem.get("stride", 2)),
+        },
+        "layers": [],
+        "head": None if head is None else {
+            "channels": head.get("channels"),
+            "num_classes": int(head.get("num_classes", 1000)),
+        },
+    }
+    for layer in search_space["layers"]:
+        spec["layers"].append({
+            "stride": int(layer.get("stride", 1)),
+            "kernel_sizes": [int(k) for k in layer["kernel_sizes"]],
+            "expand_ratios": [float(e) for e in layer["expand_ratios"]],
+            "channels": [int(c) for c in layer["channels"]],
+        })
+    if not spec["layers"]:
+        raise ValueError("The search space should contain at least one layer.")
+    # the input channel of the first layer
+    spec["input_channels"] = spec["stem"]["channels"] if stem else int(search_space.get("input_channels", 3))
+    return spec
+
+
+class LatencyLUT:
+    """
+    A latency lookup table of a parametric search space. The latency of each candidate op of each layer (and of the stem
+    and the head) is stored in a flat table indexed by the resolution, so that the latency of an architecture is
+    estimated by summing table lookups without graph conversion or kernel detection. Note that the fusion across layers
+    is ignored.
+
+    An architecture is encoded as an integer vector [resolution index, kernel size index of layer 0, expand ratio index
+    of layer 0, channel index of layer 0, kernel size index of layer 1, ...]. Refer to `LatencyLUT.encode`.
+
+    @params:
+    spec: the search space spec given by `load_search_space`
+    table: float array of shape (n_resolutions, n_entries), the latency of layer candidates in ms. The candidates of
+        layer l are stored from `offsets[l]`, indexed by (input channel index, kernel size index, expand ratio index,
+        channel index)
+    stem: float array of shape (n_resolutions,), the latency of the stem
+    head: float array of shape (n_resolutions, n_channels of the last layer), the latency of the head
+    """
+    chunk_size = 1 << 18
+
+    def __init__(self, spec, table, stem, head):
+        self.spec = spec
+        self.table = np.ascontiguousarray(table, dtype=np.float64)
+        self.stem = np.asarray(stem, dtype=np.float64)
+        self.head = np.asarray(head, dtype=np.float64)
+        self.dims = np.array(self.get_layer_dims(spec), dtype=np.intp).reshape(-1, 4)
+        sizes = self.dims.prod(axis=1)
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        if self.table.shape != (len(spec["resolutions"]), sizes.sum()):
+            raise ValueError(f"The shape of latency table {self.table.shape} does not match the search space.")
+
+    @staticmethod
+    def get_layer_dims(spec):
+        """ return the list of (n_input_channels, n_kernel_sizes, n_expand_ratios, n_channels) of each layer
+        """
+        dims, n_cin = [], 1
+        for layer in spec["layers"]:
+            dims.append((n_cin, len(layer["kernel_sizes"]), len(layer["expand_ratios"]), len(layer["channels"])))
+            n_cin = len(layer["channels"])
+        return dims
+
+    @property
+    def num_layers(self):
+        return len(self.spec["layers"])
+
+    def encode(self, archs):
+        """ encode a list of architectures to an integer array of shape (n_archs, 1 + 3 * n_layers). Each architecture
+        is a dict of {"resolution": 224, "layers": [{"kernel_size": 3, "expand_ratio": 6, "channels": 24}, ...]}
+        """
+        layers = self.spec["layers"]
+        encoded = np.empty((len(archs), 1 + 3 * self.num_layers), dtype=np.intp)
+        for i, arch in enumerate(archs):
+            if len(arch["layers"]) != self.num_layers:
+                raise ValueError(f"Expect {self.num_layers} layers, but got {len(arch['layers'])}.")
+            encoded[i, 0] = self.spec["resolutions"].index(arch["resolution"])
+            for l, (choice, layer) in enumerate(zip(arch["layers"], layers)):
+                encoded[i, 1 + 3 * l] = layer["kernel_sizes"].index(choice["kernel_size"])
+                encoded[i, 2 + 3 * l] = layer["expand_ratios"].index(choice["expand_ratio"])
+                encoded[i, 3 + 3 * l] = layer["channels"].index(choice["channels"])
+        return encoded
+
+    def sample(self, num, seed=None):
+        """ return `num` uniformly sampled encoded architectures
+        """
+        rng = np.random.default_rng(seed)
+        high = np.concatenate([[len(self.spec["resolutions"])], self.dims[:, 1:].ravel()])
+        return rng.integers(0, high, size=(num, len(high))).astype(np.intp)
+
+    def score(self, encoded):
+        """ return the estimated latency in ms of each encoded architecture as an array of shape (n_archs,)
+        """
+        encoded = np.asarray(encoded, dtype=np.intp)
+        if encoded.ndim == 1:
+            return self.score(encoded[None])[0]
+        n_entries = self.table.shape[1]
+        flat_table = self.table.ravel()
+        latency = np.empty(len(encoded), dtype=np.float64)
+        for start in range(0, len(encoded), self.chunk_size):
+            chunk = encoded[start: start + self.chunk_size]
+            res, ks, e, c = chunk[:, 0], chunk[:, 1::3], chunk[:, 2::3], chunk[:, 3::3]
+            cin = np.zeros_like(c)
+            cin[:, 1:] = c[:, :-1]
+            index = ((cin * self.dims[:, 1] + ks) * self.dims[:, 2] + e) * self.dims[:, 3] + c
+            index += self.offsets + res[:, None] * n_entries
+            latency[start: start + len(chunk)] = \
+                flat_table[index].sum(axis=1) + self.stem[res] + self.head[res, c[:, -1]]
+        return latency
+
+    def save(self, filename):
+        """ save the table to a `.npz` file
+        """
+        np.savez_compressed(
+            filename, spec=np.array(json.dumps(self.spec)), table=self.table, stem=self.stem, head=self.head,
+            offsets=self.offsets, dims=self.dims
+        )
+        logging.keyinfo(f"Latency lookup table has been saved to {filename}")
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            return cls(json.loads(str(data["spec"])), data["table"], data["stem"], data["head"])
+
+
+def build_latency_lut(predictor, search_space, batch_size=256):
+    """
+    precompute the latency of every candidate op of a search space by the kernel predictors and fusion rules of
+    `predictor`, and return a `LatencyLUT` object. Each candidate is converted to a small nn-Meter IR graph and
+    predicted in batch.
+
+    @params:
+    predictor: a loaded `nnMeterPredictor` object
+    search_space: the search space spec, or the path to a json/yaml file of it. Refer to `load_search_space` for the
+        format.
+    batch_size: the number of candidate graphs in each `predict_batch` call
+    """
+    spec = load_search_space(search_space)
+    resolutions, layers = spec["resolutions"], spec["layers"]
+    dims = LatencyLUT.get_layer_dims(spec)
+
+    # enumerate all candidate graphs, each is identified by its position in the table
+    graphs, positions = [], []
+    for r, resolution in enumerate(resolutions):
+        h = resolution
+        if spec["stem"]:
+            stem = spec["stem"]
+            graphs.append(build_stem_graph(h, stem["channels"], stem["kernel_size"], stem["stride"]))
+            positions.append(("stem", r, 0))
+            h = math.ceil(h / stem["stride"])
+        entry = 0
+        cin_choices = [spec["input_channels"]]
+        for layer, dim in zip(layers, dims):
+            candidates = [cin_choices, layer["kernel_sizes"], layer["expand_ratios"], layer["channels"]]
+            for cin, ks, e, cout in itertools.product(*candidates):
+                graphs.append(build_inverted_residual_graph(h, cin, cout, ks, e, layer["stride"]))
+                positions.append(("table", r, entry))
+                entry += 1
+            h = math.ceil(h / layer["stride"])
+            cin_choices = layer["channels"]
+        if spec["head"]:
+            for c, cin in enumerate(cin_choices):
+                graphs.append(build_head_graph(h, cin, spec["head"]["channels"], spec["head"]["num_classes"]))
+                positions.append(("head", r, c))
+
+    logging.keyinfo(f"Build latency lookup table for {len(graphs)} candidates ...")
+    latency = []
+    for start in range(0, len(graphs), batch_size):
+        latency.extend(predictor.predict_batch(graphs[start: start + batch_size], "nnmeter-ir"))
+
+    table = np.zeros((len(resolutions), sum(np.prod(dim) for dim in dims)))
+    stem = np.zeros(len(resolutions))
+    head = np.zeros((len(resolutions), len(layers[-1]["channels"])))
+    for (name, r, index), py in zip(positions, latency):
+        if name == "table":
+            table[r, index] = py
+        elif name == "stem":
+            stem[r] = py
+        else:
+            head[r, index] = py
+    return LatencyLUT(spec, table, stem, head)
@@ -1,13 +1,23 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import os
+import time
 import logging
 from packaging import version
-from .utils import load_config_file, loading_to_local, loading_customized_predictor
-from .prediction.predict_by_kernel import nn_predict
+from .utils import (
+    load_config_file, loading_to_local, loading_customized_predictor, compile_predictors, get_memory_usage
+)
+from .prediction.predict_by_kernel import nn_predict, nn_predict_batch, predict_kernel_latencies
+from .prediction_handle import PredictionHandle
+from .prediction.kernel_cache import KernelLatencyCache
+from .prediction_cache import PredictionCache
+from .predictor_bundle import convert_predictor_to_bundle, find_predictor_bundle, get_default_bundle
+from .latency_lut import build_latency_lut
 from nn_meter.kernel_detector import KernelDetector
 from nn_meter.utils import get_user_data_folder
+from nn_meter.utils.graph_hash import hash_graph, hash_file
 from nn_meter.ir_converter import model_file_to_graph, model_to_graph
+from nn_meter.ir_converter.torch_converter import TorchConversionCache
 logging = logging.getLogger("nn-Meter")
 
 
@@ -49,7 +59,16 @@ def load_predictor_config(predictor_name: str, predictor_version: float = None):
         raise NotImplementedError('No predictor that meets the required name and version, please try again.')
 
 
-def load_latency_predictor(predictor_name: str, predictor_version: float = None):
+def get_predictor_folder(pred_info):
+    """ return the local folder of the kernel predictors and fusion rules of the predictor
+    """
+    if "download" in pred_info:
+        return os.path.join(get_user_data_folder(), 'predictor', pred_info['name'])
+    return pred_info['package_location']
+
+
+def load_latency_predictor(predictor_name: str, predictor_version: float = None, engine: str = "sklearn",
+                           lazy: bool = False, prefetch: bool = False, bundle: str = None):
     """ 
     return the predictor model according to the given predictor name and version
     @params:
@@ -59,28 +78,199 @@ def load_latency_predictor(predictor_name: str, predictor_version: float = None)
     
     predictor_version: string to specify the version of the target latency predictor. If not specified (default as None), the lateast version of the 
         predictor will be loaded.
+
+    engine: string to specify the inference engine of kernel predictors, allowed items are ["sklearn", "native",
+        "bundle"]. If engine == "native", each random forest is compiled once into flat NumPy node arrays and evaluated
+        in vectorized form, which gives the same results as sklearn with much lower per-call overhead. The native engine
+        memory-maps the flat node arrays from the predictor bundle if there is a valid one, refer to
+        `bundle_latency_predictor`. If engine == "bundle", the kernel predictors must be loaded from a valid predictor
+        bundle.
+
+    lazy: if True, each kernel predictor is loaded the first time it is used in prediction, instead of loading all
+        kernel predictors up front. This reduces the start-up time and memory when the predicted models only use a few
+        kernel types.
+
+    prefetch: only accessed when lazy == True. If True, the kernel predictors not yet used are loaded in a background
+        thread.
+
+    bundle: the folder of the predictor bundle, only accessed when engine is "native" or "bundle". Default to be
+        `<predictor folder>/bundle`. A bundle given by this parameter must be valid.
     """
-    user_data_folder = get_user_data_folder()
+    since, rss = time.time(), get_memory_usage()
+    if engine not in ["sklearn", "native", "bundle"]:
+        raise ValueError(f"Unsupported inference engine: {engine}")
     pred_info = load_predictor_config(predictor_name, predictor_version)
+    ppath = get_predictor_folder(pred_info)
+    if engine == "sklearn":
+        if bundle is not None:
+            raise ValueError('The predictor bundle is only used by the "native" or "bundle" engine.')
+        if os.path.isdir(get_default_bundle(ppath)):
+            logging.info(f'The predictor bundle of {pred_info["name"]} is not used by the sklearn engine, '
+                         f'set engine="native" or engine="bundle" to use it.')
+    elif engine == "bundle" or bundle is not None:
+        bundle = bundle or get_default_bundle(ppath)
+        if find_predictor_bundle(ppath, bundle) is None:
+            raise FileNotFoundError(f'There is no valid predictor bundle of {pred_info["name"]} in {bundle}, please '
+                                    f'run "nn-meter bundle" to convert the predictor first.')
+    else:
+        bundle = get_default_bundle(ppath)
+
     if "download" in pred_info:
-        kernel_predictors, fusionrule = loading_to_local(pred_info, os.path.join(user_data_folder, 'predictor'))
+        kernel_predictors, fusionrule = loading_to_local(pred_info, os.path.dirname(ppath), lazy, bundle)
     else:
-        kernel_predictors, fusionrule = loading_customized_predictor(pred_info)
-        
-    return nnMeterPredictor(kernel_predictors, fusionrule)
+        kernel_predictors, fusionrule = loading_customized_predictor(pred_info, lazy, bundle)
+
+    if engine == "native":
+        kernel_predictors = compile_predictors(kernel_predictors)
+    if lazy and prefetch:
+        kernel_predictors.prefetch()
+
+    if rss is not None:
+        logging.info(f"Load predictor {pred_info['name']} in {time.time() - since:.3f} s, "
+                     f"RSS: {rss:.1f} MB -> {get_memory_usage():.1f} MB")
+    else:
+        logging.info(f"Load predictor {pred_info['name']} in {time.time() - since:.3f} s")
+    return nnMeterPredictor(kernel_predictors, fusionrule, pred_info['name'], pred_info['version'])
+
+
+def bundle_latency_predictor(predictor_name: str, predictor_version: float = None, output: str = None):
+    """
+    convert the kernel predictors of the given predictor to a compact memory-mappable bundle. By default the bundle is
+    saved in the predictor folder, where `load_latency_predictor` with engine "native" or "bundle" detects it and
+    memory-maps the kernel predictors instead of unpickling them. The bundle gives the same predictions as the pkl
+    files. Return the path of the bundle folder.
+    @params:
+
+    predictor_name: string to specify the name of the target latency predictor.
+
+    predictor_version: string to specify the version of the target latency predictor. If not specified (default as
+        None), the lateast version of the predictor will be converted.
+
+    output: the folder to save the bundle, default to be `<predictor folder>/bundle`. A bundle in another folder is
+        loaded by `load_latency_predictor(..., bundle=output)`.
+    """
+    pred_info = load_predictor_config(predictor_name, predictor_version)
+    ppath = get_predictor_folder(pred_info)
+    if "download" in pred_info:
+        loading_to_local(pred_info, os.path.dirname(ppath), lazy=True)  # download the predictor if necessary
+    return convert_predictor_to_bundle(ppath, output)
 
 
 class nnMeterPredictor:
-    def __init__(self, predictors, fusionrule):
+    def __init__(self, predictors, fusionrule, name=None, version=None):
         self.kernel_predictors = predictors
         self.fusionrule = fusionrule
+        self.name = name
+        self.version = version
         self.kd = KernelDetector(self.fusionrule)
+        self.kernel_cache = None
+        self.prediction_cache = None
+        self.conversion_cache = None
+
+    def enable_kernel_cache(self, capacity=65536, filename=None, cache=None):
+        """
+        memoize kernel-level latency predictions, so that kernels with the same type and features as a previously
+        predicted one cost only a dict lookup. Return the `KernelLatencyCache` object, whose `stats()` reports hits and
+        misses and whose `save(filename)` persists the cached items for later runs.
+        @params:
+
+        capacity: the maximum number of cached kernel predictions, the least recently used item is evicted first
+
+        filename: path to a cache file saved by `KernelLatencyCache.save`. If the file exists, the cached items are
+            reloaded.
+
+        cache: an existing `KernelLatencyCache` object to share among predictors. If given, `capacity` and `filename`
+            are ignored.
+        """
+        if cache is None:
+            cache = KernelLatencyCache(capacity)
+            if filename is not None and os.path.isfile(filename):
+                cache.load(filename)
+        self.kernel_cache = cache
+        return cache
+
+    def disable_kernel_cache(self):
+        self.kernel_cache = None
+
+    def enable_detection_cache(self, capacity=1024, cache=None):
+        """
+        reuse the detected kernels of models of the same topology, so that the channel, kernel size or resolution
+        variants of a model only rebind their shapes to the cached basic-block partition instead of running the kernel
+        detection again. Return the `KernelTemplateCache` object. Refer to `KernelDetector.enable_template_cache` for
+        details.
+        @params:
+
+        capacity: the maximum number of cached topologies, the least recently used one is evicted first
+
+        cache: an existing `KernelTemplateCache` object to share among predictors of the same fusion rules. If given,
+            `capacity` is ignored.
+        """
+        return self.kd.enable_template_cache(capacity, cache)
+
+    def disable_detection_cache(self):
+        self.kd.disable_template_cache()
+
+    def enable_conversion_cache(self, capacity=128, folder=None, cache=None, disk_capacity=4096):
+        """
+        cache the nn-Meter IR graphs converted from torch models, keyed by the structural fingerprint of the model
+        (module types, hyperparameters and connectivity, excluding weights), the input shape, the torch converter and
+        the package versions. Repeated architectures, e.g., the subnets sampled from a supernet, are then converted only
+        once. Models which could not be traced by `torch.fx` are converted without the cache. The graphs are kept in
+        memory and in a folder on disk across runs. Return the `TorchConversionCache` object.
+        @params:
+
+        capacity: the maximum number of graphs in memory, the least recently used one is evicted first
+
+        folder: the folder of the cached graphs on disk, default to be `<user_data_folder>/torch_conversion_cache`
+
+        cache: an existing `TorchConversionCache` object to share among predictors. If given, `capacity`, `folder` and
+            `disk_capacity` are ignored.
+
+        disk_capacity: the maximum number of graph files in the folder, the least recently stored or loaded one is
+            removed first. Call `clear(disk=True)` of the returned object to remove all of them.
+        """
+        if cache is None:
+            cache = TorchConversionCache(capacity, folder, disk_capacity)
+        self.conversion_cache = cache
+        return cache
+
+    def disable_conversion_cache(self):
+        self.conversion_cache = None
+
+    def enable_prediction_cache(self, filename=None, max_entries=100000):
+        """
+        cache the predicted latency of whole models on disk. Before any conversion or detection, `predict` looks up the
+        cache by the hash of the model file content, or by the structural hash of the nn-Meter IR graph. Items are
+        scoped by the predictor name, version and fusion rules, and the least recently used items are evicted beyond
+        `max_entries`. Return the `PredictionCache` object.
+        @params:
+
+        filename: path to the SQLite database file, default to be `<user_data_folder>/prediction_cache.db`
+
+        max_entries: the maximum number of cached models
+        """
+        self.prediction_cache = PredictionCache(filename, max_entries)
+        self._fusion_rule_hash = hash_file(self.fusionrule)
+        return self.prediction_cache
+
+    def disable_prediction_cache(self):
+        if self.prediction_cache is not None:
+            self.prediction_cache.close()
+        self.prediction_cache = None
+
+    def _query_prediction_cache(self, key):
+        return self.prediction_cache.get(key, self.name, self.version, self._fusion_rule_hash)
+
+    def _update_prediction_cache(self, keys, latency):
+        for key in keys:
+            self.prediction_cache.put(key, latency, self.name, self.version, self._fusion_rule_hash)
 
     def predict(
-        self, model, model_type, input_shape=(1, 3, 224, 224), apply_nni=False
+        self, model, model_type, input_shape=(1, 3, 224, 224), apply_nni=False, load_weights=True
     ):
         """
-        return the predicted latency in microseconds (ms)
+        return the predicted latency in microseconds (ms). The kernel detection keeps no state in the predictor, so that
+        one loaded predictor could be shared by concurrent threads.
         @params:
 
         model: the model to be predicted, allowed file include
@@ -100,16 +290,186 @@ class nnMeterPredictor:
             converter is used, which requires onnx installation (well tested version is onnx>=1.9.0). NNI-based converter is much faster while the conversion is unstable 
             as it could fail in some case. Onnx-based converter is much slower but stable compared to NNI-based converter. This parameter is only accessed when 
             model_type == 'torch'
+
+        load_weights: if False, the weights in an ONNX model file are skipped while loading, since only the structure
+            and shapes are used for prediction. Refer to `model_file_to_graph` for details. This parameter is only
+            accessed when `model` is the path to an ONNX model file
         """
         logging.info("Start latency prediction ...")
-        if isinstance(model, str):
-            graph = model_file_to_graph(model, model_type, input_shape, apply_nni=apply_nni)
-        else:
-            graph = model_to_graph(model, model_type, input_shape=input_shape, apply_nni=apply_nni)
-        
+        graph, cache_keys, py = self._to_graph_with_prediction_cache(
+            model, model_type, input_shape, apply_nni, load_weights
+        )
+        if py is not None:
+            logging.info(f"Predict latency (cached): {py} ms")
+            return py
+
         # logging.info(graph)
-        self.kd.load_graph(graph)
+        kernels = self.kd.detect(graph)
 
-        py = nn_predict(self.kernel_predictors, self.kd.get_kernels()) # in unit of ms
+        py = nn_predict(self.kernel_predictors, kernels, self.kernel_cache, (self.name, self.version))  # in unit of ms
+        if self.prediction_cache is not None:
+            self._update_prediction_cache(cache_keys, py)
         logging.info(f"Predict latency: {py} ms")
         return py
+
+    def _to_graph_with_prediction_cache(self, model, model_type, input_shape, apply_nni, load_weights=True):
+        """ convert the model to nn-Meter IR graph, and look up the prediction cache by the hash of the model file
+        content before the conversion and by the structural hash of the graph after it. Return the graph (None if the
+        model file is hit), the cache keys of the model and the cached latency (None if missed).
+        """
+        cache_keys = []
+        if self.prediction_cache is not None and isinstance(model, str) and os.path.isfile(model):
+            # fast path: look up the cache by the file content before any conversion
+            cache_keys.append("file:" + hash_file(model, model_type, input_shape, apply_nni))
+            py = self._query_prediction_cache(cache_keys[-1])
+            if py is not None:
+                return None, cache_keys, py
+
+        if isinstance(model, str):
+            graph = model_file_to_graph(
+                model, model_type, input_shape, apply_nni=apply_nni, cache=self.conversion_cache,
+                load_weights=load_weights
+            )
+        else:
+            graph = model_to_graph(
+                model, model_type, input_shape=input_shape, apply_nni=apply_nni, cache=self.conversion_cache
+            )
+
+        if self.prediction_cache is not None:
+            cache_keys.append("graph:" + hash_graph(graph))
+            py = self._query_prediction_cache(cache_keys[-1])
+            if py is not None:
+                self._update_prediction_cache(cache_keys[:-1], py)
+                return graph, cache_keys, py
+        return graph, cache_keys, None
+
+    def predict_handle(
+        self, model, model_type, input_shape=(1, 3, 224, 224), apply_nni=False, load_weights=True
+    ):
+        """
+        predict the latency of the model as `predict` does, and return a `PredictionHandle`, whose `latency` is the
+        predicted latency in microseconds (ms). The handle keeps the graph, kernels and kernel latencies of the model,
+        so that the edited children of the model could be predicted by `predict_incremental`.
+        @params:
+
+        model, model_type, input_shape, apply_nni, load_weights: refer to `nnMeterPredictor.predict` for details.
+        """
+        logging.info("Start latency prediction with a handle ...")
+        if isinstance(model, str):
+            graph = model_file_to_graph(
+                model, model_type, input_shape, apply_nni=apply_nni, cache=self.conversion_cache,
+                load_weights=load_weights
+            )
+        else:
+            graph = model_to_graph(
+                model, model_type, input_shape=input_shape, apply_nni=apply_nni, cache=self.conversion_cache
+            )
+
+        state = self.kd.detect_state(graph)
+        handle = self._predict_state(state, None)
+        logging.info(f"Predict latency: {handle.latency} ms")
+        return handle
+
+    def predict_incremental(self, handle, replaced=None, added=None, removed=None):
+        """
+        return the `PredictionHandle` of the nn-Meter IR graph of the handle edited by a node-level diff, whose
+        `latency` is the predicted latency in microseconds (ms). Only the fusion around the changed nodes is run again,
+        and only the changed kernels are predicted, while the latencies of the other kernels are reused. The given
+        handle is not modified. The latency is the same as `predict` on the edited graph, up to the rounding of summing
+        the kernel latencies in a different order.
+        @params:
+
+        handle: the `PredictionHandle` given by `predict_handle` or `predict_incremental`
+
+        replaced: dict of node name to the new nn-Meter IR node of an existing node
+
+        added: dict of node name to the nn-Meter IR node of a new node, which is appended to the graph
+
+        removed: list of the names of removed nodes
+        """
+        state, new_blocks = self.kd.update_state(handle.state, replaced, added, removed)
+        handle = self._predict_state(state, handle.latencies, new_blocks)
+        logging.info(f"Predict latency (incremental, {len(new_blocks)} kernels updated): {handle.latency} ms")
+        return handle
+
+    def _predict_state(self, state, latencies, new_blocks=None):
+        """ return the `PredictionHandle` of the state, predicting the kernels of the new blocks, or all kernels if
+        `latencies` is None
+        """
+        if latencies is None:
+            new_blocks = [block for block, (_, _, kernel) in state.blocks.items() if kernel is not None]
+            latencies = {}
+        else:
+            latencies = {block: latencies[block] for block in state.blocks if block in latencies}
+        pys = predict_kernel_latencies(
+            self.kernel_predictors, [state.blocks[block][2] for block in new_blocks], self.kernel_cache,
+            (self.name, self.version)
+        )
+        latencies.update(zip(new_blocks, pys))
+        return PredictionHandle(state, latencies, self.kernel_predictors)
+
+    def build_latency_lut(self, search_space, output=None, batch_size=256):
+        """
+        precompute the latency lookup table of a parametric NAS search space with the kernel predictors and fusion rules
+        of this predictor, and return a `LatencyLUT` object. Architectures in the search space could then be scored by
+        `LatencyLUT.score` in a vectorized way. Refer to `nn_meter.predictor.latency_lut` for details.
+        @params:
+
+        search_space: the search space spec, or the path to a json/yaml file of it. Refer to `load_search_space` for the
+            format.
+
+        output: the `.npz` file to save the lookup table, or None
+        
+        batch_size: the number of candidate graphs in each `predict_batch` call
+        """
+        lut = build_latency_lut(self, search_space, batch_size)
+        if output:
+            lut.save(output)
+        return lut
+
+    def predict_batch(
+        self, models, model_type, input_shape=(1, 3, 224, 224), apply_nni=False, load_weights=True
+    ):
+        """
+        return the list of predicted latency in microseconds (ms), one item for each model. Kernel detection is run for
+        each model, while the kernel features of the whole batch are stacked and predicted by one regression call per
+        kernel type.
+        @params:
+
+        models: list of models to be predicted. Each item follows the same format as parameter `model` in
+            `nnMeterPredictor.predict`. The prediction cache, if enabled, is looked up and updated for each model as
+            `predict` does.
+
+        model_type: string to specify the type of models, allowed items are ["pb", "torch", "onnx", "nnmeter-ir",
+            "nni-ir"]
+
+        input_shape: the shape of input tensor for inference (if necessary). Refer to `nnMeterPredictor.predict` for
+            details.
+
+        apply_nni: switch the torch converter used for torch model parsing. Refer to `nnMeterPredictor.predict` for
+            details.
+
+        load_weights: if False, the weights in ONNX model files are skipped while loading. Refer to
+            `nnMeterPredictor.predict` for details.
+        """
+        logging.info(f"Start latency prediction for {len(models)} models ...")
+        pys = [None] * len(models)
+        kernels_list, uncached = [], []
+        for i, model in enumerate(models):
+            graph, cache_keys, pys[i] = self._to_graph_with_prediction_cache(
+                model, model_type, input_shape, apply_nni, load_weights
+            )
+            if pys[i] is None:
+                kernels_list.append(self.kd.detect(graph))
+                uncached.append((i, cache_keys))
+
+        if kernels_list:
+            batch_pys = nn_predict_batch(
+                self.kernel_predictors, kernels_list, self.kernel_cache, (self.name, self.version)
+            )  # in unit of ms
+            for (i, cache_keys), py in zip(uncached, batch_pys):
+                pys[i] = py
+                if self.prediction_cache is not None:
+                    self._update_prediction_cache(cache_keys, py)
+        logging.info(f"Predict latency: {pys} ms ({len(models) - len(uncached)} cached)")
+        return pys
@@ -1,6 +1,8 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import logging
+import numpy as np
+from functools import lru_cache
 from nn_meter.utils import get_conv_flop_params, get_dwconv_flop_params, get_fc_flop_params
 
 def get_flops_params(kernel_type, hw, cin, cout, kernelsize, stride):
@@ -99,3 +101,181 @@ def get_predict_features(config):
         mdicts[layer][op] = features
         layer += 1
     return mdicts
+
+
+# number of feature columns of each feature branch in `get_predict_features`
+_feature_widths = {
+    "conv": 7, "fc": 4, "pool": 5, "global": 2, "channelshuffle": 2, "split": 2,
+    "se": 2, "concat": 6, "hswish": 2, "bn": 2, "add": 3,
+}
+
+
+@lru_cache(maxsize=None)
+def _classify_op(op):
+    """
+    return a tuple of (feature branch, merged kernel name, reads conv attrs, reads input tensor) of a kernel op, which
+    resolves the substring checks of `get_predict_features` once per distinct op. The feature branch is None if there
+    is no matching predictor for the op.
+    """
+    if "conv" in op:
+        branch = "conv"
+    elif "fc" in op or "fc-relu" in op:
+        branch = "fc"
+    elif "pool" in op and "global" not in op:
+        branch = "pool"
+    elif "global-pool" in op or "global-avgpool" in op or "gap" in op:
+        branch = "global"
+    elif "channelshuffle" in op:
+        branch = "channelshuffle"
+    elif "split" in op:
+        branch = "split"
+    elif "se" in op or "SE" in op:
+        branch = "se"
+    elif "concat" in op:
+        branch = "concat"
+    elif op in ["hswish"]:
+        branch = "hswish"
+    elif op in ["bn", "relu", "bn-relu"]:
+        branch = "bn"
+    elif op in ["add-relu", "add"]:
+        branch = "add"
+    else:
+        branch = None
+
+    # to speed up, conv and dwconv related kernels are merged into one kernel by their name
+    if "conv" in op and "dwconv" not in op:
+        rkernel = "conv-bn-relu"
+    elif "dwconv" in op:
+        rkernel = "dwconv-bn-relu"
+    else:
+        rkernel = op
+    return (
+        branch, rkernel,
+        "conv" in op or "maxpool" in op or "avgpool" in op,
+        op in ["channelshuffle", "split"]
+    )
+
+
+def get_feature_matrices(kernel_units_list):
+    """
+    extract the prediction features of a batch of models in the same semantics as `get_predict_features`, but grouped
+    by merged kernel name in one pass without intermediate dicts. The features of each kernel type are filled into one
+    preallocated float64 array, which could be fed to the kernel predictor directly, and the FLOPs and params of conv,
+    dwconv and fc kernels are computed in vectorized form.
+
+    return a tuple of (matrices, orders). matrices is a dict of merged kernel name to (features, owners), where features
+    is an array of shape (n_kernels, n_features) and owners is the index of the model each row belongs to. orders is the
+    list of merged kernel names of each model in the order of their first appearance, which keeps the order of summing
+    kernel latencies the same as `predict_model`.
+    @params:
+
+    kernel_units_list: list of the divided kernel units and the features of each model.
+    """
+    # count the kernels of each type to preallocate the arrays
+    counts, branches, orders = {}, {}, []
+    for kernel_units in kernel_units_list:
+        order = {}
+        for item in kernel_units:
+            branch, rkernel, _, _ = _classify_op(item["op"])
+            if branch is None:
+                continue
+            counts[rkernel] = counts.get(rkernel, 0) + 1
+            branches[rkernel] = branch
+            order[rkernel] = None
+        orders.append(list(order))
+    matrices = {
+        rkernel: (np.zeros((count, _feature_widths[branches[rkernel]])), np.empty(count, dtype=np.intp))
+        for rkernel, count in counts.items()
+    }
+    filled = dict.fromkeys(counts, 0)
+
+    for index, kernel_units in enumerate(kernel_units_list):
+        _fill_model_features(kernel_units, index, matrices, filled)
+
+    for rkernel, (features, _) in matrices.items():
+        if branches[rkernel] == "conv":
+            hw, cin, cout, ks, s = features[:, :5].T
+            if rkernel == "dwconv-bn-relu":
+                params = cout * (ks * ks + 1)
+            else:
+                params = cout * (ks * ks * cin + 1)
+            features[:, 5] = 2 * hw / s * hw / s * params / 2e6
+            features[:, 6] = params / 1e6
+        elif branches[rkernel] == "fc":
+            flop = (2 * features[:, 0] + 1) * features[:, 1]
+            features[:, 2] = flop / 2e6
+            features[:, 3] = flop / 1e6
+    return matrices, orders
+
+
+def _fill_model_features(kernel_units, index, matrices, filled):
+    """
+    fill the features of the kernels of one model into the rows of `matrices` given by `filled`. The attrs are carried
+    over between the kernels of the model as `get_predict_features` does, while they are local to each call, so that
+    the first kernels of a model never inherit the attrs of the previous model in the batch.
+    """
+    for item in kernel_units:
+        branch, rkernel, read_conv_attrs, read_input_tensor = _classify_op(item["op"])
+        if read_conv_attrs:
+            cout = item["cout"]
+            cin = item["cin"]
+            ks = item["ks"][1]
+            s = item["strides"][1] if "strides" in item else 1
+            inputh = item["inputh"]
+        if read_input_tensor:
+            [b, inputh, inputw, cin] = item["input_tensors"][0]
+        if branch is None:
+            continue
+
+        features, owners = matrices[rkernel]
+        row = features[filled[rkernel]]
+        owners[filled[rkernel]] = index
+        filled[rkernel] += 1
+
+        if branch == "conv" or branch == "pool":
+            # the FLOPs and params of conv kernels are filled later
+            row[:5] = inputh, cin, cout, ks, s
+        elif branch == "fc":
+            cout = item["cout"]
+            cin = item["cin"]
+            row[:2] = cin, cout
+        elif branch == "global":
+            inputh = 1
+            cin = item["cin"]
+            row[:] = inputh, cin
+        elif branch == "channelshuffle" or branch == "split":
+            row[:] = inputh, cin
+        elif branch == "se":
+            inputh = item["input_tensors"][-1][-2]
+            cin = item["input_tensors"][-1][-1]
+            row[:] = inputh, cin
+        elif branch == "concat":  # maximum 4 branches
+            itensors = item["input_tensors"]
+            inputh = itensors[0][1]
+            row[0] = inputh
+            row[1] = len(itensors) if len(itensors) <= 4 else 6
+            for i, it in enumerate(itensors[:4]):
+                row[2 + i] = it[-1]
+        elif branch == "hswish":
+            if "inputh" in item:
+                inputh = item["inputh"]
+            else:
+                if len(item["input_tensors"][0]) == 2:
+                    inputh = item["input_tensors"][0][0]
+                else:
+                    inputh = item["input_tensors"][0][1]
+            cin = item["cin"]
+            row[:] = inputh, cin
+        elif branch == "bn":
+            itensors = item["input_tensors"]
+            if len(itensors[0]) == 4:
+                inputh = itensors[0][1]
+                cin = itensors[0][3]
+            else:
+                inputh = itensors[0][0]
+                cin = itensors[0][1]
+            row[:] = inputh, cin
+        elif branch == "add":
+            itensors = item["input_tensors"]
+            inputh = itensors[0][1]
+            row[:] = inputh, itensors[0][3], itensors[1][3]
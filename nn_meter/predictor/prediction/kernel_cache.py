@@ -0,0 +1,40 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import pickle
+import logging
+from nn_meter.utils.lru_cache import LRUCache
+logging = logging.getLogger("nn-Meter")
+
+
+class KernelLatencyCache(LRUCache):
+    """
+    A bounded, thread-safe LRU cache of kernel-level latency predictions. The key of an item is
+    (predictor name, predictor version, merged kernel name, feature tuple), so that one cache could be shared
+    by several predictors.
+    """
+    def __init__(self, capacity=65536):
+        super().__init__(capacity)
+
+    @staticmethod
+    def make_key(predictor_key, kernel, features):
+        return (*predictor_key, kernel, tuple(features))
+
+    def save(self, filename):
+        """ persist the cached items to a pickle file
+        """
+        items = self.items()
+        with open(filename, "wb") as fp:
+            pickle.dump(items, fp)
+        logging.info(f"save {len(items)} kernel latency items to {filename}")
+
+    def load(self, filename):
+        """ reload cached items from a pickle file saved by `KernelLatencyCache.save`
+        """
+        if not os.path.isfile(filename):
+            raise FileNotFoundError(f"The kernel latency cache file {filename} does not exist.")
+        with open(filename, "rb") as fp:
+            items = pickle.load(fp)
+        for key, value in items:
+            self.put(key, value)
+        logging.info(f"load {len(items)} kernel latency items from {filename}")
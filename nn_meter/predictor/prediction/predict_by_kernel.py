@@ -1,7 +1,8 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import numpy as np
 from .utils import get_kernel_name
-from .extract_feature import get_predict_features
+from .extract_feature import get_feature_matrices, _classify_op
 
 
 def merge_conv_kernels(kernelname):
@@ -16,11 +17,43 @@ def merge_conv_kernels(kernelname):
         return kernelname
 
 
-def predict_model(model, predictors):
+def predict_kernel(pred, kernel, features, kernel_cache=None, predictor_key=None):
+    """
+    return the predicted latency of each feature row of one kernel type. If kernel_cache is given, only the feature rows
+    missing in the cache are sent to the predictor.
+    @params:
+    pred: the loaded pkl predictor of the kernel
+    kernel: the merged kernel name
+    features: list or array of feature rows
+    kernel_cache: a `KernelLatencyCache` object or None
+    predictor_key: a tuple of (predictor name, predictor version) to identify the predictor in the kernel_cache
+    """
+    if kernel_cache is None:
+        return pred.predict(features)
+
+    features = np.asarray(features, dtype=np.float64)
+    keys = [kernel_cache.make_key(predictor_key, kernel, feature) for feature in features.tolist()]
+    pys = [kernel_cache.get(key) for key in keys]
+    missed = {}
+    for i, py in enumerate(pys):
+        if py is None:
+            missed.setdefault(keys[i], []).append(i)
+    if missed:
+        missed_pys = pred.predict(features[[indices[0] for indices in missed.values()]])
+        for (key, indices), py in zip(missed.items(), missed_pys):
+            kernel_cache.put(key, py)
+            for i in indices:
+                pys[i] = py
+    return pys
+
+
+def predict_model(model, predictors, kernel_cache=None, predictor_key=None):
     """
     @params:
     model: the model config with prediction features
     predictors: loaded pkl predictors
+    kernel_cache: a `KernelLatencyCache` object to memoize kernel-level predictions, or None
+    predictor_key: a tuple of (predictor name, predictor version) to identify the predictor in the kernel_cache
     """
     py = 0
     dicts = {}
@@ -36,20 +69,98 @@ def predict_model(model, predictors):
         kernelname = get_kernel_name(kernel)
         if kernelname in predictors:
             pred = predictors[kernelname]
-            pys = pred.predict(dicts[kernel]) # in unit of ms
+            pys = predict_kernel(pred, kernel, dicts[kernel], kernel_cache, predictor_key)  # in unit of ms
             if len(pys) != 0:
                 py += sum(pys)
 
     return py
 
 
-def nn_predict(predictors, kernel_units):
+def predict_feature_matrices(matrices, orders, predictors, kernel_cache=None, predictor_key=None):
+    """
+    predict a batch of models from the feature matrices given by `get_feature_matrices`, with one regression call per
+    kernel type across the whole batch. Return the list of predicted latency of each model.
+    @params:
+    matrices: dict of merged kernel name to (features, owners)
+    orders: list of merged kernel names of each model in the order of their first appearance
+    predictors: loaded pkl predictors
+    kernel_cache: a `KernelLatencyCache` object to memoize kernel-level predictions, or None
+    predictor_key: a tuple of (predictor name, predictor version) to identify the predictor in the kernel_cache
+    """
+    sums = {}
+    for kernel, (features, owners) in matrices.items():
+        kernelname = get_kernel_name(kernel)
+        if kernelname in predictors:
+            pred = predictors[kernelname]
+            kernel_pys = predict_kernel(pred, kernel, features, kernel_cache, predictor_key)  # in unit of ms
+            # scatter the predictions back to their models
+            sums[kernel] = np.bincount(owners, weights=kernel_pys, minlength=len(orders))
+
+    pys = []
+    for index, order in enumerate(orders):
+        # sum per model in the same order as `predict_model`
+        py = 0
+        for kernel in order:
+            if kernel in sums:
+                py += sums[kernel][index]
+        pys.append(py)
+    return pys
+
+
+def nn_predict(predictors, kernel_units, kernel_cache=None, predictor_key=None):
+    """
+    @params:
+    predictors: dictionary object, key: kernel name, object: loaded pkl latency model
+    kernel_units: the divided kernel units and the features of a model.
+    kernel_cache: a `KernelLatencyCache` object to memoize kernel-level predictions, or None
+    predictor_key: a tuple of (predictor name, predictor version) to identify the predictor in the kernel_cache
+    """
+
+    return nn_predict_batch(predictors, [kernel_units], kernel_cache, predictor_key)[0]
+
+
+def nn_predict_batch(predictors, kernel_units_list, kernel_cache=None, predictor_key=None):
     """
     @params:
     predictors: dictionary object, key: kernel name, object: loaded pkl latency model
+    kernel_units_list: list of the divided kernel units and the features of each model.
+    kernel_cache: a `KernelLatencyCache` object to memoize kernel-level predictions, or None
+    predictor_key: a tuple of (predictor name, predictor version) to identify the predictor in the kernel_cache
+    """
+    matrices, orders = get_feature_matrices(kernel_units_list)
+    pys = predict_feature_matrices(matrices, orders, predictors, kernel_cache, predictor_key)
+    return pys
+
+
+def predict_kernel_latencies(predictors, kernel_units, kernel_cache=None, predictor_key=None):
+    """
+    return the predicted latency of each kernel, or 0 for the kernels without a matching predictor. The features of each
+    kernel are extracted on their own, as `get_predict_features` does for all kernels whose features are given by their
+    own attrs.
+    @params:
+    predictors: dictionary object, key: kernel name, object: loaded pkl latency model
     kernel_units: the divided kernel units and the features of a model.
+    kernel_cache: a `KernelLatencyCache` object to memoize kernel-level predictions, or None
+    predictor_key: a tuple of (predictor name, predictor version) to identify the predictor in the kernel_cache
     """
+    if not kernel_units:
+        return []
+    matrices, orders = get_feature_matrices([[kernel] for kernel in kernel_units])
+    return predict_feature_matrices(matrices, orders, predictors, kernel_cache, predictor_key)
 
-    features = get_predict_features(kernel_units)
-    py = predict_model(features, predictors)
+
+def sum_kernel_latencies(predictors, kernel_units, latencies):
+    """
+    return the latency of a model from the latency of its kernels given by `predict_kernel_latencies`, summed in the
+    same order as `nn_predict`, i.e., per merged kernel type in the order of their first appearance.
+    """
+    sums = {}
+    for kernel, py in zip(kernel_units, latencies):
+        branch, rkernel, _, _ = _classify_op(kernel["op"])
+        if branch is None or get_kernel_name(rkernel) not in predictors:
+            continue
+        sums[rkernel] = sums.get(rkernel, 0.0) + py
+    py = 0
+    for kernel_py in sums.values():
+        py += kernel_py
     return py
@@ -0,0 +1,131 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import numpy as np
+
+
+class FlatForest:
+    """
+    A random forest regressor compiled into flat NumPy node arrays. All trees are evaluated together for a feature
+    matrix in vectorized form, which avoids the input validation and joblib dispatch costs of sklearn `predict` on
+    small batches. The prediction follows the arithmetic of sklearn `ForestRegressor.predict` step by step (float32
+    inputs, float64 thresholds, per-tree accumulation in estimator order), so the outputs are identical.
+    """
+    # upper bound of the number of (tree, sample) pairs evaluated at once
+    chunk_size = 1 << 20
+
+    def __init__(self, feature, threshold, children_left, children_right, value, roots, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """ compile a fitted sklearn forest (or a single tree) regressor with one output into flat node arrays
+        """
+        from sklearn.tree import DecisionTreeRegressor
+        from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+        if isinstance(model, DecisionTreeRegressor):
+            estimators = [model]
+        elif isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+            estimators = model.estimators_
+        else:
+            # e.g., gradient boosting, whose `estimators_` is a 2-D array of trees combined in a different way
+            raise TypeError(f"Unsupported predictor type {type(model).__name__} for FlatForest.")
+        if not all(isinstance(estimator, DecisionTreeRegressor) for estimator in estimators):
+            raise TypeError(f"Unsupported estimators in {type(model).__name__} for FlatForest.")
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise TypeError("FlatForest only supports regressors with one output.")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            roots.append(offset)
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(offset, offset + n_nodes, dtype=np.intp)
+            # leaves point to themselves, so that extra traversal steps keep them in place
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.intp))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.intp))
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children_left=np.concatenate(lefts),
+            children_right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.array(roots, dtype=np.intp),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+        )
+
+    array_names = ["feature", "threshold", "children_left", "children_right", "value", "roots"]
+
+    def get_meta(self):
+        return {"max_depth": int(self.max_depth), "n_features": int(self.n_features), "n_trees": int(self.n_trees)}
+
+    def save(self, dirname, prefix):
+        """ save the node arrays as raw `.npy` files named `<prefix>.<array_name>.npy` in `dirname`
+        """
+        for name in self.array_names:
+            np.save(os.path.join(dirname, f"{prefix}.{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+
+    @classmethod
+    def load(cls, dirname, prefix, meta, mmap_mode="r"):
+        """ load the node arrays saved by `FlatForest.save`. With mmap_mode="r", the arrays are memory-mapped read-only,
+        so that loading is nearly instant and processes share the same page-cache copy.
+        """
+        arrays = {
+            name: np.load(os.path.join(dirname, f"{prefix}.{name}.npy"), mmap_mode=mmap_mode)
+            for name in cls.array_names
+        }
+        return cls(**arrays, max_depth=meta["max_depth"], n_features=meta["n_features"])
+
+    def apply(self, X):
+        """ return the leaf index of each tree for each sample, in shape of (n_trees, n_samples)
+        """
+        n_samples = X.shape[0]
+        X = X.ravel()
+        nodes = np.repeat(self.roots, n_samples)
+        offsets = np.tile(np.arange(n_samples, dtype=np.intp) * self.n_features, self.n_trees)
+        # only (tree, sample) pairs that have not reached a leaf are kept in `active`
+        active = np.flatnonzero(self.children_left[nodes] != nodes)
+        for _ in range(self.max_depth):
+            if active.size == 0:
+                break
+            current = nodes[active]
+            go_left = X[offsets[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.children_left[current], self.children_right[current])
+            nodes[active] = current
+            active = active[self.children_left[current] != current]
+        return nodes.reshape(self.n_trees, n_samples)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X should be in shape of (n_samples, {self.n_features}), but got {X.shape}.")
+        X = np.ascontiguousarray(X)
+
+        y_hat = np.zeros(X.shape[0], dtype=np.float64)
+        step = max(1, self.chunk_size // self.n_trees)
+        for start in range(0, X.shape[0], step):
+            leaves = self.apply(X[start: start + step])
+            # sum the trees one after another as sklearn does, then average
+            y_hat[start: start + step] = np.cumsum(self.value[leaves], axis=0)[-1]
+        y_hat /= self.n_trees
+        return y_hat
@@ -0,0 +1,83 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import time
+import sqlite3
+import logging
+import threading
+from nn_meter.utils import get_user_data_folder
+logging = logging.getLogger("nn-Meter")
+
+
+__cache_db_filename__ = 'prediction_cache.db'
+
+
+class PredictionCache:
+    """
+    A persistent whole-graph latency cache stored in a SQLite database. Each item is keyed by a model key (a file
+    content hash or a graph structural hash, refer to `nn_meter.utils.graph_hash`) together with the predictor name, the
+    predictor version and the hash of the fusion rule file, so that updating a predictor never returns stale results.
+    When the number of items exceeds `max_entries`, the least recently used items are evicted.
+    """
+    def __init__(self, filename=None, max_entries=100000):
+        if filename is None:
+            filename = os.path.join(get_user_data_folder(), __cache_db_filename__)
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        self.filename = filename
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT NOT NULL, predictor_name TEXT NOT NULL, predictor_version TEXT NOT NULL, "
+                "fusion_rule_hash TEXT NOT NULL, latency REAL NOT NULL, last_access REAL NOT NULL, "
+                "PRIMARY KEY (key, predictor_name, predictor_version, fusion_rule_hash))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON predictions (last_access)")
+
+    def get(self, key, predictor_name, predictor_version, fusion_rule_hash):
+        scope = (key, str(predictor_name), str(predictor_version), fusion_rule_hash)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT latency FROM predictions WHERE key=? AND predictor_name=? AND predictor_version=? "
+                "AND fusion_rule_hash=?",
+                scope
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE predictions SET last_access=? WHERE key=? AND predictor_name=? AND predictor_version=? "
+                "AND fusion_rule_hash=?",
+                (time.time(), *scope)
+            )
+        return row[0]
+
+    def put(self, key, latency, predictor_name, predictor_version, fusion_rule_hash):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+                (key, str(predictor_name), str(predictor_version), fusion_rule_hash, float(latency), time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM predictions WHERE rowid IN (SELECT rowid FROM predictions ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            logging.info(f"evict {count - self.max_entries} items from prediction cache {self.filename}")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM predictions")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,31 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from .prediction.predict_by_kernel import sum_kernel_latencies
+
+
+class PredictionHandle:
+    """
+    The predicted latency of a nn-Meter IR graph, together with its kernels and their latencies, to predict the edited
+    children of the graph by `nnMeterPredictor.predict_incremental`. A handle is never modified, so that several
+    children could be predicted from one parent handle.
+    """
+    def __init__(self, state, latencies, predictors):
+        """
+        @params:
+        state: the `DetectionState` of the graph
+        latencies: dict of block id in the state to the predicted latency of its kernel
+        predictors: the kernel predictors, to sum the kernel latencies in the same order as `nnMeterPredictor.predict`
+        """
+        self.state = state
+        self.latencies = latencies
+        blocks = [block for block, (_, _, kernel) in state.blocks.items() if kernel is not None]
+        self.latency = sum_kernel_latencies(
+            predictors, [state.blocks[block][2] for block in blocks], [latencies[block] for block in blocks]
+        )
+
+    @property
+    def graph(self):
+        return self.state.graph
+
+    def get_kernels(self):
+        return self.state.get_kernels()
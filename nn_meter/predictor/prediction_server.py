@@ -0,0 +1,219 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import time
+import queue
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from nn_meter.ir_converter import model_file_to_graph, model_to_graph
+from nn_meter.utils.utils import NumpyEncoder
+logging = logging.getLogger("nn-Meter")
+
+
+def _percentile(times, p):
+    """ return the p-th percentile of the sorted service times in ms, or None if there is no time
+    """
+    return times[min(len(times) - 1, int(p * len(times)))] * 1e3 if times else None
+
+
+class _PendingRequest:
+    def __init__(self, graph):
+        self.graph = graph
+        self.since = time.time()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Coalesce prediction requests that arrive within `batch_window` seconds into one `predict_batch` call, i.e., one
+    batched regression call per kernel type. The queue of pending requests is bounded by `max_queue_size`; `submit`
+    raises `queue.Full` when it is exceeded.
+    """
+    def __init__(self, predictor, batch_window=0.005, max_batch_size=64, max_queue_size=1024):
+        self.predictor = predictor
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue(max_queue_size)
+        self._stats_lock = threading.Lock()
+        self._start_time = time.time()
+        self._num_requests = 0
+        self._num_batches = 0
+        self._num_errors = 0
+        self._service_times = []
+        self._thread = threading.Thread(target=self._run, name="nn-Meter-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, graph, timeout=None):
+        """ submit a nn-Meter IR graph and wait for its predicted latency in ms
+        """
+        request = _PendingRequest(graph)
+        self._queue.put_nowait(request)
+        if not request.done.wait(timeout):
+            raise TimeoutError("prediction request timed out")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._process(batch)
+                    return
+                batch.append(request)
+            self._process(batch)
+
+    def _process(self, batch):
+        try:
+            results = self.predictor.predict_batch([request.graph for request in batch], "nnmeter-ir")
+            errors = [None] * len(batch)
+        except Exception:
+            # isolate the failing requests by predicting them one by one
+            results, errors = [], []
+            for request in batch:
+                try:
+                    results.append(self.predictor.predict(request.graph, "nnmeter-ir"))
+                    errors.append(None)
+                except Exception as e:
+                    results.append(None)
+                    errors.append(e)
+
+        now = time.time()
+        with self._stats_lock:
+            self._num_batches += 1
+            for request, result, error in zip(batch, results, errors):
+                self._num_requests += 1
+                self._num_errors += error is not None
+                self._service_times.append(now - request.since)
+            del self._service_times[:-10000]  # keep the latest items only
+        for request, result, error in zip(batch, results, errors):
+            request.result, request.error = result, error
+            request.done.set()
+
+    def stats(self):
+        with self._stats_lock:
+            elapsed = time.time() - self._start_time
+            times = sorted(self._service_times)
+            return {
+                "requests": self._num_requests,
+                "errors": self._num_errors,
+                "batches": self._num_batches,
+                "average_batch_size": self._num_requests / self._num_batches if self._num_batches else 0.0,
+                "queue_size": self._queue.qsize(),
+                "throughput": self._num_requests / elapsed if elapsed > 0 else 0.0,  # requests per second
+                "service_time_ms_p50": _percentile(times, 0.5),
+                "service_time_ms_p99": _percentile(times, 0.99),
+            }
+
+
+class _PredictionRequestHandler(BaseHTTPRequestHandler):
+    def _send_json(self, code, content):
+        body = json.dumps(content, cls=NumpyEncoder).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, {name: batcher.stats() for name, batcher in self.server.batchers.items()})
+        elif self.path == "/health":
+            self._send_json(200, {"predictors": list(self.server.batchers)})
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            content = json.loads(self.rfile.read(length))
+            predictor_name = content.get("predictor", self.server.default_predictor)
+            batcher = self.server.batchers[predictor_name]
+            model, model_type = content["model"], content.get("model_type", "nnmeter-ir")
+            if isinstance(model, str):
+                graph = model_file_to_graph(model, model_type)
+            else:
+                graph = model_to_graph(model, model_type)
+        except KeyError as e:
+            self._send_json(400, {"error": f"Invalid request, missing or unknown item: {e}"})
+            return
+        except Exception as e:
+            self._send_json(400, {"error": f"Invalid request: {e}"})
+            return
+
+        try:
+            latency = batcher.submit(graph, timeout=self.server.request_timeout)
+        except queue.Full:
+            self._send_json(503, {"error": "Too many pending requests, please retry later."})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"Prediction failed: {e}"})
+            return
+        self._send_json(200, {"predictor": predictor_name, "latency": latency})
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s" % (self.address_string(), format % args))
+
+
+class PredictionServer(ThreadingHTTPServer):
+    """
+    A long-running HTTP server which preloads latency predictors once and serves predictions. Requests that arrive
+    within a short window are coalesced into one batched prediction for each predictor.
+
+    Endpoints:
+        POST /predict: request body in json format {"model": <nn-Meter IR graph or path to model file>, "model_type":
+            "nnmeter-ir", "predictor": <predictor name>}. "model_type" is default to be "nnmeter-ir" and "predictor" is
+            default to be the first predictor. Return {"predictor": <predictor name>, "latency": <latency in ms>}.
+        GET /stats: return the latency and throughput statistics of each predictor.
+        GET /health: return the names of the served predictors.
+
+    @params:
+    predictors: dict of predictor name to loaded `nnMeterPredictor` object
+    address: a tuple of (host, port) to listen to. Use port 0 to pick a free port, which could be read from
+        `server_address`.
+    """
+    daemon_threads = True
+
+    def __init__(self, predictors, address=("127.0.0.1", 8765), batch_window=0.005, max_batch_size=64,
+                 max_queue_size=1024, request_timeout=60):
+        super().__init__(address, _PredictionRequestHandler)
+        self.batchers = {
+            name: MicroBatcher(predictor, batch_window, max_batch_size, max_queue_size)
+            for name, predictor in predictors.items()
+        }
+        self.default_predictor = next(iter(predictors))
+        self.request_timeout = request_timeout
+
+    def start(self):
+        """ serve in a background daemon thread, return the thread
+        """
+        thread = threading.Thread(target=self.serve_forever, name="nn-Meter-server", daemon=True)
+        thread.start()
+        return thread
+
+    def server_close(self):
+        super().server_close()
+        for batcher in self.batchers.values():
+            batcher.stop()
@@ -0,0 +1,93 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import json
+import logging
+from glob import glob
+from functools import partial
+from .prediction.tree_ensemble import FlatForest
+logging = logging.getLogger("nn-Meter")
+
+
+__bundle_dirname__ = 'bundle'
+__manifest_filename__ = 'manifest.json'
+
+
+def convert_predictor_to_bundle(ppath, output=None):
+    """ convert the kernel predictors (*.pkl) in a predictor folder to a compact bundle of contiguous NumPy arrays,
+    which could be memory-mapped by `load_latency_predictor` for nearly instant start-up. The fusion rules are not
+    bundled, and are always read from the predictor folder. Return the path of the bundle folder.
+
+    @params:
+    ppath: the predictor folder containing the kernel predictors (*.pkl)
+    output: the folder to save the bundle, default to be `<ppath>/bundle`, which is detected by `load_latency_predictor`
+        with the "native" or "bundle" engine. A bundle in another folder is loaded by the `bundle` parameter of
+        `load_latency_predictor`.
+    """
+    from .utils import load_predictor_file
+    output = output or get_default_bundle(ppath)
+    os.makedirs(output, exist_ok=True)
+    manifest_path = os.path.join(output, __manifest_filename__)
+    if os.path.isfile(manifest_path):
+        os.remove(manifest_path)
+
+    manifest = {"kernels": {}}
+    for p in sorted(glob(os.path.join(ppath, "**.pkl"))):
+        pname = os.path.basename(p).replace(".pkl", "")
+        try:
+            forest = FlatForest.from_sklearn(load_predictor_file(p))
+        except TypeError as e:
+            raise ValueError(f"Cannot convert predictor {p} to bundle: {e}")
+        forest.save(output, pname)
+        stat = os.stat(p)
+        manifest["kernels"][pname] = {**forest.get_meta(), "source_size": stat.st_size, "source_mtime": stat.st_mtime}
+        logging.info(f"convert predictor {p} to bundle")
+
+    # the manifest is written at last, so that an interrupted conversion is never detected as a bundle
+    with open(manifest_path, "w") as fp:
+        json.dump(manifest, fp, indent=4)
+    logging.keyinfo(f"Predictor bundle has been saved to {os.path.abspath(output)}")
+    return output
+
+
+def get_default_bundle(ppath):
+    return os.path.join(ppath, __bundle_dirname__)
+
+
+def find_predictor_bundle(ppath, bundle=None):
+    """ return the manifest of the bundle converted from the predictor folder `ppath`, or None if there is no valid
+    bundle. A bundle is invalid if any of its source pkl files in `ppath` has been changed after the conversion.
+
+    @params:
+    ppath: the predictor folder containing the kernel predictors (*.pkl)
+    bundle: the bundle folder, default to be `<ppath>/bundle`
+    """
+    bundle = bundle or get_default_bundle(ppath)
+    manifest_path = os.path.join(bundle, __manifest_filename__)
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, "r") as fp:
+        manifest = json.load(fp)
+    for pname, meta in manifest["kernels"].items():
+        source = os.path.join(ppath, pname + ".pkl")
+        if os.path.isfile(source):
+            stat = os.stat(source)
+            if stat.st_size != meta["source_size"] or stat.st_mtime != meta["source_mtime"]:
+                logging.warning(f"The predictor bundle in {bundle} is outdated, please convert it again. Use the pkl "
+                                f"files instead.")
+                return None
+    return manifest
+
+
+def load_predictor_bundle(bundle, manifest, lazy=False):
+    """ load kernel predictors from the bundle folder as memory-mapped `FlatForest` objects
+    """
+    from .utils import LazyPredictorDict
+    logging.info(f"load predictor bundle {bundle}")
+    loaders = {
+        pname: partial(FlatForest.load, bundle, pname, meta, mmap_mode="r")
+        for pname, meta in manifest["kernels"].items()
+    }
+    if lazy:
+        return LazyPredictorDict(loaders)
+    return {pname: loader() for pname, loader in loaders.items()}
@@ -1,10 +1,15 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import os
+import sys
+import time
 import yaml
 import pickle
 import logging
+import threading
 from glob import glob
+from functools import partial
+from collections.abc import Mapping
 from nn_meter.utils import download_from_url, create_user_configs
 logging = logging.getLogger("nn-Meter")
 
@@ -12,32 +17,27 @@ logging = logging.getLogger("nn-Meter")
 __user_config_folder__ = os.path.expanduser('~/.nn_meter/config')
 
 
-def loading_to_local(pred_info, dir):
+def loading_to_local(pred_info, dir, lazy=False, bundle=None):
     """ loading builtin predictors to local
 
     @params:
 
     pred_info: a dictionary containing predictor information
     dir: the local directory to store the kernel predictors and fusion rules
+    lazy: if True, return a `LazyPredictorDict` which loads each kernel predictor the first time it is accessed
+    bundle: the folder of a predictor bundle to memory-map the kernel predictors from, refer to `load_predictor_files`
     """
     os.makedirs(dir, exist_ok=True)
     hardware = pred_info['name']
     ppath = os.path.join(dir, hardware)
 
-    isdownloaded = check_predictors(ppath, pred_info["kernel_predictors"])
+    isdownloaded = check_predictors(ppath, pred_info["kernel_predictors"], bundle)
     if not isdownloaded:
         logging.keyinfo(f'Download from {pred_info["download"]} ...')
         download_from_url(pred_info["download"], dir)
 
     # load predictors
-    predictors = {}
-    ps = glob(os.path.join(ppath, "**.pkl"))
-    for p in ps:
-        pname =  os.path.basename(p).replace(".pkl", "")
-        with open(p, "rb") as f:
-            logging.info("load predictor %s" % p)
-            model = pickle.load(f)
-            predictors[pname] = model
+    predictors = load_predictor_files(ppath, lazy, bundle)
     fusionrule = os.path.join(ppath, "fusion_rules.json")
     # logging.info(fusionrule)
     if not os.path.isfile(fusionrule):
@@ -47,28 +47,23 @@ def loading_to_local(pred_info, dir):
     return predictors, fusionrule
 
 
-def loading_customized_predictor(pred_info):
+def loading_customized_predictor(pred_info, lazy=False, bundle=None):
     """ loading customized predictor
 
     @params:
     pred_info: a dictionary containing predictor information
+    lazy: if True, return a `LazyPredictorDict` which loads each kernel predictor the first time it is accessed
+    bundle: the folder of a predictor bundle to memory-map the kernel predictors from, refer to `load_predictor_files`
     """
     hardware = pred_info['name']
     ppath = pred_info['package_location']
 
-    isexist = check_predictors(ppath, pred_info["kernel_predictors"])
+    isexist = check_predictors(ppath, pred_info["kernel_predictors"], bundle)
     if not isexist:
         raise FileExistsError(f"The predictor {hardware} in {ppath} does not exist.")
 
     # load predictors
-    predictors = {}
-    ps = glob(os.path.join(ppath, "**.pkl"))
-    for p in ps:
-        pname =  os.path.basename(p).replace(".pkl", "")
-        with open(p, "rb") as f:
-            logging.info("load predictor %s" % p)
-            model = pickle.load(f)
-            predictors[pname] = model
+    predictors = load_predictor_files(ppath, lazy, bundle)
     fusionrule = os.path.join(ppath, "fusion_rules.json")
     # logging.info(fusionrule)
     if not os.path.isfile(fusionrule):
@@ -78,13 +73,151 @@ def loading_customized_predictor(pred_info):
     return predictors, fusionrule
 
 
-def check_predictors(ppath, kernel_predictors):
+def load_predictor_file(filename):
+    with open(filename, "rb") as f:
+        logging.info("load predictor %s" % filename)
+        return pickle.load(f)
+
+
+def load_predictor_files(ppath, lazy=False, bundle=None):
+    """ load all kernel predictors in the folder `ppath`, return a dict or a `LazyPredictorDict` if lazy is True. If
+    `bundle` is the folder of a valid predictor bundle converted from `ppath`, the kernel predictors are memory-mapped
+    from the bundle instead of unpickled from *.pkl files.
+    """
+    if bundle is not None:
+        from .predictor_bundle import find_predictor_bundle, load_predictor_bundle
+        manifest = find_predictor_bundle(ppath, bundle)
+        if manifest is not None:
+            return load_predictor_bundle(bundle, manifest, lazy)
+
+    filenames = {}
+    for p in glob(os.path.join(ppath, "**.pkl")):
+        filenames[os.path.basename(p).replace(".pkl", "")] = p
+    if lazy:
+        return LazyPredictorDict({pname: partial(load_predictor_file, p) for pname, p in filenames.items()})
+    return {pname: load_predictor_file(p) for pname, p in filenames.items()}
+
+
+class LazyPredictorDict(Mapping):
+    """
+    A read-only mapping from kernel name to kernel predictor, in which each predictor is loaded the first time it is
+    accessed. Predictors that are never used by the predicted models are never loaded. Call `prefetch()` to load the
+    rest predictors in a background thread. The loading time of each predictor is recorded in `load_time`.
+
+    @params:
+    loaders: dict of kernel name to a function without arguments returning the loaded predictor
+    """
+    def __init__(self, loaders, transform=None):
+        self._loaders = dict(loaders)
+        self._predictors = {}
+        self._transform = transform
+        self._lock = threading.Lock()
+        self._prefetch_thread = None
+        self.load_time = {}
+
+    def __getitem__(self, pname):
+        predictor = self._predictors.get(pname)
+        if predictor is not None:
+            return predictor
+        if pname not in self._loaders:
+            raise KeyError(pname)
+        with self._lock:
+            if pname not in self._predictors:
+                since = time.time()
+                predictor = self._loaders[pname]()
+                if self._transform is not None:
+                    predictor = self._transform(pname, predictor)
+                self._predictors[pname] = predictor
+                self.load_time[pname] = time.time() - since
+            return self._predictors[pname]
+
+    def __contains__(self, pname):
+        return pname in self._loaders
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self):
+        return len(self._loaders)
+
+    @property
+    def loaded(self):
+        return list(self._predictors)
+
+    def set_transform(self, transform):
+        """ set a function `transform(pname, predictor)` applied to each predictor after loading
+        """
+        with self._lock:
+            if self._predictors:
+                raise RuntimeError("set_transform should be called before any predictor is loaded.")
+            self._transform = transform
+
+    def prefetch(self):
+        """ load the predictors not yet loaded in a background daemon thread
+        """
+        def _load_all():
+            for pname in self._loaders:
+                self[pname]
+        if self._prefetch_thread is None:
+            self._prefetch_thread = threading.Thread(target=_load_all, name="nn-Meter-prefetch", daemon=True)
+            self._prefetch_thread.start()
+        return self._prefetch_thread
+
+
+def compile_predictor(pname, model):
+    """ compile a loaded sklearn kernel predictor into `FlatForest` for vectorized inference. Predictors of
+    unsupported types are kept as they are.
+    """
+    from .prediction.tree_ensemble import FlatForest
+    if isinstance(model, FlatForest):
+        return model
+    try:
+        return FlatForest.from_sklearn(model)
+    except TypeError:
+        logging.info(f"predictor {pname} is not supported by the native engine, use it as it is.")
+        return model
+
+
+def compile_predictors(predictors):
+    """ compile the loaded sklearn kernel predictors into `FlatForest` for vectorized inference.
+
+    @params:
+    predictors: dictionary object, key: kernel name, object: loaded pkl latency model
+    """
+    if isinstance(predictors, LazyPredictorDict):
+        predictors.set_transform(compile_predictor)
+        return predictors
+    return {pname: compile_predictor(pname, model) for pname, model in predictors.items()}
+
+
+def get_memory_usage():
+    """ return the resident set size (RSS) of the current process in MB, or None if it is unavailable
+    """
+    try:
+        with open("/proc/self/statm", "r") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak RSS, in bytes on macOS and in kilobytes elsewhere
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss / 2 ** 20 if sys.platform == "darwin" else maxrss / 2 ** 10
+    except ImportError:
+        return None
+
+
+def check_predictors(ppath, kernel_predictors, bundle=None):
     """
     @params:
 
     model: a pytorch/onnx/tensorflow model object or a str containing path to the model file
     """
     logging.info("checking local kernel predictors at " + ppath)
+    from .predictor_bundle import find_predictor_bundle
+    manifest = find_predictor_bundle(ppath, bundle) if bundle is not None and os.path.isdir(ppath) else None
+    if manifest is not None and all(kp in manifest["kernels"] for kp in kernel_predictors):
+        return True
     if os.path.isdir(ppath):
         filenames = glob(os.path.join(ppath, "**.pkl"))
         # check if all the pkl files are included
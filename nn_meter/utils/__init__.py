@@ -6,6 +6,7 @@ from .config_manager import (
     change_user_data_folder
 )
 from .utils import download_from_url
+from .lru_cache import LRUCache
 from .evaluation import (
     latency_metrics,
     get_conv_flop_params,
@@ -0,0 +1,346 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import logging
+import numpy as np
+logging = logging.getLogger("nn-Meter")
+
+_UNKNOWN_DIM = np.iinfo(np.int64).min  # the packed value of unknown (None) dims
+_ATTR_KEYS = ("name", "type", "attr", "input_shape", "output_shape")
+
+
+def _pack_shapes(shapes):
+    """ pack the shapes of all nodes, each a list of tensor shapes, into three arrays (tensor_ptr, dim_ptr, dims), so
+    that the tensors of node i are tensor_ptr[i]:tensor_ptr[i + 1], and the dims of tensor t are
+    dims[dim_ptr[t]:dim_ptr[t + 1]]
+    """
+    tensor_ptr, dim_ptr, dims = [0], [0], []
+    for shape in shapes:
+        for tensor in shape or ():
+            for dim in tensor:
+                if dim is None:
+                    dims.append(_UNKNOWN_DIM)
+                elif isinstance(dim, (int, np.integer)) and not isinstance(dim, bool):
+                    dims.append(int(dim))
+                else:
+                    raise TypeError(f"Cannot pack shape {shape}, only integer and None dims are supported")
+            dim_ptr.append(len(dims))
+        tensor_ptr.append(len(dim_ptr) - 1)
+    return np.array(tensor_ptr, dtype=np.int64), np.array(dim_ptr, dtype=np.int64), np.array(dims, dtype=np.int64)
+
+
+def _unpack_shape(packed, index):
+    tensor_ptr, dim_ptr, dims = packed
+    bounds = dim_ptr[tensor_ptr[index]:tensor_ptr[index + 1] + 1].tolist()
+    values = dims[bounds[0]:bounds[-1]].tolist()
+    base = bounds[0]
+    return [
+        [None if dim == _UNKNOWN_DIM else dim for dim in values[start - base:stop - base]]
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def _to_csr(lists):
+    indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(items) for items in lists])
+    indices = np.fromiter((item for items in lists for item in items), dtype=np.int32, count=indptr[-1])
+    return indptr, indices
+
+
+class CompactGraph:
+    """
+    An array-backed alternative of `ModelGraph` for kernel detection on large models. Node names are interned to integer
+    ids in the order of the graph dict, op types to integer codes, the inbounds and outbounds are stored as CSR arrays
+    of node ids, and the input and output shapes of all nodes are packed into NumPy arrays. Only the `attr` dict of each
+    node is kept as is, shared with the source graph.
+
+    `RuleSplitter` and `KernelDetector` run on it natively: the methods of `ModelGraph` used by them are provided with
+    node ids in place of node names, with the same results, and the graph serves as its own adjacency view for
+    `PatternMatcher`. `fuse` appends the fused node with a new id, and stores the rewired inbounds and outbounds as
+    lists overriding the CSR arrays. Convert from and to the nn-Meter IR by `from_dict` and `to_dict`.
+    """
+    def __init__(self, names, types, inbounds, outbounds, attrs, input_shapes, output_shapes, attr_extras=None):
+        """
+        @params:
+        names: list of node names, whose indices are the node ids
+        types: list of op types of the nodes
+        inbounds, outbounds: list of lists of node ids
+        attrs: list of the `attr` dicts of the nodes
+        input_shapes, output_shapes: list of the input and output shapes of the nodes
+        attr_extras: dict of node id to the other items of its nn-Meter IR attr, if any
+        """
+        self.names = list(names)
+        self.ids = {name: index for index, name in enumerate(self.names)}
+        self.type_names = list(dict.fromkeys(types))
+        self._type_codes = {type: code for code, type in enumerate(self.type_names)}
+        self.attrs = list(attrs)
+        self._attr_extras = attr_extras or {}
+
+        size = len(self.names)
+        self.op_types = np.array([self._type_codes[type] for type in types], dtype=np.int32)
+        self._shape_index = np.arange(size, dtype=np.int64)  # fused nodes share the packed shapes of their root node
+        self._alive = np.ones(size, dtype=bool)
+        self._size = size
+        self.in_indptr, self.in_indices = _to_csr(inbounds)
+        self.out_indptr, self.out_indices = _to_csr(outbounds)
+        self.input_shapes = _pack_shapes(input_shapes)
+        self.output_shapes = _pack_shapes(output_shapes)
+
+        self._inbounds = {}  # node id to the list of inbounds overriding the CSR array
+        self._outbounds = {}
+        self.by_type = None  # op type to an ordered set (dict) of node ids, built by `get_adjacency`
+
+    @classmethod
+    def from_dict(cls, graph):
+        """ convert a nn-Meter IR graph dict. The inbounds and outbounds should refer to nodes in the graph, e.g., the
+        graph of a refreshed `ModelGraph`.
+        """
+        ids = {name: index for index, name in enumerate(graph)}
+        types, inbounds, outbounds, attrs, input_shapes, output_shapes, extras = [], [], [], [], [], [], {}
+        for index, node in enumerate(graph.values()):
+            attr = node["attr"]
+            types.append(attr["type"])
+            attrs.append(attr.get("attr", {}))
+            input_shapes.append(attr.get("input_shape"))
+            output_shapes.append(attr.get("output_shape"))
+            inbounds.append([ids[inbound] for inbound in node.get("inbounds", [])])
+            outbounds.append([ids[outbound] for outbound in node.get("outbounds", [])])
+            extra = {key: value for key, value in attr.items() if key not in _ATTR_KEYS}
+            if extra:
+                extras[index] = extra
+        return cls(graph.keys(), types, inbounds, outbounds, attrs, input_shapes, output_shapes, extras)
+
+    def to_dict(self):
+        """ convert the live nodes to a nn-Meter IR graph dict. Missing shapes are given as empty lists.
+        """
+        graph = {}
+        for node in self.get_nodes():
+            attr = self.get_node_attr(node)
+            graph[self.names[node]] = {
+                "attr": attr,
+                "inbounds": [self.names[inbound] for inbound in self.get_node_inbounds(node)],
+                "outbounds": [self.names[outbound] for outbound in self.get_node_outbounds(node)],
+            }
+        return graph
+
+    def __len__(self):
+        return int(np.count_nonzero(self._alive[:self._size]))
+
+    def __contains__(self, node):
+        return 0 <= node < self._size and bool(self._alive[node])
+
+    def get_nodes(self):
+        """ return the ids of the live nodes, in the order of the graph dict followed by the fused nodes
+        """
+        return np.flatnonzero(self._alive[:self._size]).tolist()
+
+    def get_node_type(self, node):
+        return self.type_names[self.op_types[node]]
+
+    def get_node_inbounds(self, node):
+        inbounds = self._inbounds.get(node)
+        if inbounds is None:
+            return self.in_indices[self.in_indptr[node]:self.in_indptr[node + 1]].tolist()
+        return inbounds
+
+    def get_node_outbounds(self, node):
+        outbounds = self._outbounds.get(node)
+        if outbounds is None:
+            return self.out_indices[self.out_indptr[node]:self.out_indptr[node + 1]].tolist()
+        return outbounds
+
+    def _get_mutable_inbounds(self, node):
+        if node not in self._inbounds:
+            self._inbounds[node] = self.get_node_inbounds(node)
+        return self._inbounds[node]
+
+    def _get_mutable_outbounds(self, node):
+        if node not in self._outbounds:
+            self._outbounds[node] = self.get_node_outbounds(node)
+        return self._outbounds[node]
+
+    def get_node_origin(self, node):
+        """ return the id of the node in the converted graph dict giving the attrs and shapes of the node, i.e., the
+        node itself or the root node of a fused node
+        """
+        return int(self._shape_index[node])
+
+    def get_node_shapes(self, node):
+        """ return the input and output shapes of the node, unpacked as lists
+        """
+        index = self._shape_index[node]
+        return _unpack_shape(self.input_shapes, index), _unpack_shape(self.output_shapes, index)
+
+    def get_node_attr(self, node):
+        """ return the nn-Meter IR attr of the node, with the shapes unpacked
+        """
+        index = int(self._shape_index[node])
+        input_shape, output_shape = self.get_node_shapes(node)
+        attr = {
+            "name": self.names[index],
+            "type": self.get_node_type(node),
+            "attr": self.attrs[node],
+            "input_shape": input_shape,
+            "output_shape": output_shape,
+        }
+        attr.update(self._attr_extras.get(index, {}))
+        return attr
+
+    def _get_type_code(self, type):
+        if type not in self._type_codes:
+            self._type_codes[type] = len(self.type_names)
+            self.type_names.append(type)
+        return self._type_codes[type]
+
+    def _add_node(self, name, type, attr, shape_index):
+        node = self._size
+        if node == len(self._alive):
+            capacity = max(16, 2 * node)
+            self.op_types = np.resize(self.op_types, capacity)
+            self._shape_index = np.resize(self._shape_index, capacity)
+            self._alive = np.resize(self._alive, capacity)
+        self._size += 1
+        self.names.append(name)
+        self.ids[name] = node
+        self.attrs.append(attr)
+        self.op_types[node] = self._get_type_code(type)
+        self._shape_index[node] = shape_index
+        self._alive[node] = True
+        self._inbounds[node] = []
+        self._outbounds[node] = []
+        if self.by_type is not None:
+            self.by_type.setdefault(type, {})[node] = None
+        return node
+
+    def _remove_node(self, node):
+        self._alive[node] = False
+        self._inbounds.pop(node, None)
+        self._outbounds.pop(node, None)
+        if self.by_type is not None:
+            del self.by_type[self.get_node_type(node)][node]
+
+    def get_root_node(self, subgraph):
+        root = next(iter(subgraph))
+
+        flag = True
+        while flag:
+            flag = False
+            for inbound in self.get_node_inbounds(root):
+                if inbound in subgraph:
+                    flag = True
+                    root = inbound
+                    break
+
+        return root
+
+    def fuse(self, subgraph, type, name=None, is_block=True):
+        """
+        fuse the nodes into a new node, in the same way as `ModelGraph.fuse`. Return the id of the new node, or None if
+        any node of the subgraph doesn't exist.
+        @params:
+        subgraph: list of node ids
+        """
+        for node in subgraph:
+            if node not in self:
+                return None
+
+        if name is None:
+            name = ";".join(self.names[node] for node in subgraph)
+        root_node = self.get_root_node(subgraph)
+        attr = dict(self.attrs[root_node])
+        if is_block:
+            attr["primitive_nodes"] = [self.names[node] for node in subgraph]
+        new_node = self._add_node(name, type, attr, self._shape_index[root_node])
+        new_inbounds, new_outbounds = self._inbounds[new_node], self._outbounds[new_node]
+
+        members = set(subgraph)
+        for node in subgraph:
+            for inbound in self.get_node_inbounds(node):
+                if inbound not in members:
+                    if inbound not in new_inbounds:
+                        new_inbounds.append(inbound)
+                    outbounds = self._get_mutable_outbounds(inbound)
+                    if node in outbounds:
+                        outbounds.remove(node)
+                    if new_node not in outbounds:
+                        outbounds.append(new_node)
+            for outbound in self.get_node_outbounds(node):
+                if outbound not in members:
+                    if outbound not in new_outbounds:
+                        new_outbounds.append(outbound)
+                    inbounds = self._get_mutable_inbounds(outbound)
+                    if node in inbounds:
+                        inbounds.remove(node)
+                    if new_node not in inbounds:
+                        inbounds.append(new_node)
+
+        for node in subgraph:
+            self._remove_node(node)
+
+        return new_node
+
+    def get_topological_order(self):
+        """ return the node ids in the same topological order as `ModelGraph.get_topological_order`, i.e., the order of
+        `networkx.topological_sort` on the networkx view of the graph
+        """
+        nodes = self.get_nodes()
+        # the node order of the networkx view: each node, followed by its inbounds not seen before
+        order, seen = [], set()
+        inbounds_of = {}
+        for node in nodes:
+            if node not in seen:
+                seen.add(node)
+                order.append(node)
+            inbounds_of[node] = inbounds = self.get_node_inbounds(node)
+            for inbound in inbounds:
+                if inbound not in seen:
+                    seen.add(inbound)
+                    order.append(inbound)
+
+        # the successors of a node are in the order of their first edge, i.e., the order of the graph dict
+        succs = {node: {} for node in order}
+        indegree = dict.fromkeys(order, 0)
+        for node in nodes:
+            for inbound in inbounds_of[node]:
+                edges = succs[inbound]
+                edges[node] = edges.get(node, 0) + 1
+            indegree[node] = len(inbounds_of[node])
+
+        result = []
+        generation = [node for node in order if indegree[node] == 0]
+        while generation:
+            result.extend(generation)
+            next_generation = []
+            for node in generation:
+                for succ, count in succs[node].items():
+                    indegree[succ] -= count
+                    if indegree[succ] == 0:
+                        next_generation.append(succ)
+            generation = next_generation
+        if len(result) != len(order):
+            raise ValueError("Graph contains a cycle")
+        return result
+
+    # the adjacency view interface used by `PatternMatcher`, refer to `nn_meter.utils.graph_tool._AdjacencyView`
+    def get_adjacency(self):
+        if self.by_type is None:
+            self.by_type = {}
+            for node in self.get_nodes():
+                self.by_type.setdefault(self.get_node_type(node), {})[node] = None
+        return self
+
+    def get_type(self, node):
+        return self.get_node_type(node)
+
+    def is_tagged(self, node):
+        return "_tagged" in self.attrs[node]
+
+    def count_edges(self, src, dst):
+        return self.get_node_inbounds(dst).count(src)
+
+    def get_preds(self, node):
+        return [inbound for inbound in dict.fromkeys(self.get_node_inbounds(node)) if inbound in self]
+
+    def get_succs(self, node):
+        """ return the outbound ids in the order of the graph dict
+        """
+        return sorted(outbound for outbound in set(self.get_node_outbounds(node)) if outbound in self)
@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import hashlib
+from .utils import NumpyEncoder
+
+
+class _CanonicalEncoder(NumpyEncoder):
+    def default(self, obj):
+        if isinstance(obj, slice):
+            return ["slice", obj.start, obj.stop, obj.step]
+        if obj is Ellipsis:
+            return ["ellipsis"]
+        if isinstance(obj, (set, frozenset)):
+            return sorted(obj, key=_dumps)
+        # other objects, e.g., functions, have no stable representation across processes
+        return super().default(obj)
+
+
+def _dumps(obj):
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), cls=_CanonicalEncoder)
+
+
+def _sha256(*items):
+    return hashlib.sha256(_dumps(items).encode("utf-8")).hexdigest()
+
+
+def _topological_order(graph):
+    """ return the node names in topological order by Kahn's algorithm, followed by the nodes on cycles, if any, in the
+    order of the graph dict
+    """
+    indegree = {name: 0 for name in graph}
+    consumers = {name: [] for name in graph}
+    for name, node in graph.items():
+        for inbound in node.get("inbounds", []):
+            if inbound in graph:
+                indegree[name] += 1
+                consumers[inbound].append(name)
+    order = [name for name, degree in indegree.items() if degree == 0]
+    for name in order:
+        for consumer in consumers[name]:
+            indegree[consumer] -= 1
+            if indegree[consumer] == 0:
+                order.append(consumer)
+    if len(order) < len(graph):
+        visited = set(order)
+        order.extend(name for name in graph if name not in visited)
+    return order, consumers
+
+
+def hash_graph(graph):
+    """
+    return a canonical structural hash (sha256 hex digest) of a nn-Meter IR graph. The hash covers node types, attrs,
+    input/output shapes and edges, and is independent of the node names and of the order of nodes in the graph dict, so
+    that structurally identical graphs share a hash. Each node is labelled by the hash of its attrs and the labels of
+    its inbounds (in order) in topological order, and then by the sorted labels of its consumers in reverse topological
+    order, i.e., a Merkle-style relabelling of the ancestors and the descendants of each node. The graph hash is the
+    hash of the sorted node labels. The derived `outbounds` lists are ignored, and the inbounds outside the graph are
+    identified by their names.
+    @params:
+
+    graph: dictionary object following nn-Meter IR format
+    """
+    order, consumers = _topological_order(graph)
+    up = {}
+    for name in order:
+        attr = {k: v for k, v in graph[name].get("attr", {}).items() if k != "name"}
+        inbounds = [up.get(inbound, "cycle") if inbound in graph else ["external", inbound]
+                    for inbound in graph[name].get("inbounds", [])]
+        up[name] = _sha256(attr, inbounds)
+    down = {}
+    for name in reversed(order):
+        down[name] = _sha256(up[name], sorted(down.get(consumer, "cycle") for consumer in consumers[name]))
+    return _sha256(sorted(down.values()))
+
+
+def hash_object(obj):
+    """
+    return the sha256 hex digest of the canonical json dump of a json-like object. Dict keys are sorted, and slices and
+    sets are dumped in a canonical form. A TypeError is raised for other objects not serializable by json.
+    """
+    return hashlib.sha256(_dumps(obj).encode("utf-8")).hexdigest()
+
+
+def hash_file(filename, *extra, block_size=1 << 20):
+    """
+    return the sha256 hex digest of a file content. Any extra items (e.g., model type and input shape) are mixed into
+    the hash as well.
+    """
+    sha = hashlib.sha256()
+    with open(filename, "rb") as fp:
+        for block in iter(lambda: fp.read(block_size), b""):
+            sha.update(block)
+    if extra:
+        sha.update(_dumps(extra).encode("utf-8"))
+    return sha.hexdigest()
@@ -3,20 +3,154 @@
 import copy
 import json
 import logging
+from collections import Counter
 from .utils import NumpyEncoder
 logging = logging.getLogger("nn-Meter")
 
 
+class _AdjacencyView:
+    """
+    The adjacency of a graph dict given by the inbounds of each node, i.e., the same edges as the networkx view of
+    `ModelGraph`, with the nodes indexed by op type. It is maintained incrementally by the mutators of `ModelGraph`.
+    Inbounds referring to nodes not in the graph are ignored.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        self.order = {}  # node name to insertion index, which follows the order of the graph dict
+        self.types = {}
+        self.by_type = {}  # op type to an ordered set (dict) of node names
+        self.preds = {}  # node name to a Counter of inbound names
+        self.succs = {}  # node name to an ordered set (dict) of outbound names
+        self.phantoms = {}  # name of missing inbound node to the set of nodes referring to it
+        self._counter = 0
+        for name in graph:
+            self.add_node(name)
+        for name in graph:
+            self.update_inbounds(name)
+
+    def get_type(self, name):
+        return self.graph[name].get("attr", {}).get("type")
+
+    def add_node(self, name):
+        self.order[name] = self._counter
+        self._counter += 1
+        self.types[name] = self.get_type(name)
+        self.by_type.setdefault(self.types[name], {})[name] = None
+        self.preds[name] = Counter()
+        self.succs[name] = {}
+        for referrer in self.phantoms.pop(name, ()):
+            if referrer in self.preds:
+                self.update_inbounds(referrer)
+
+    def remove_node(self, name):
+        del self.order[name]
+        del self.by_type[self.types.pop(name)][name]
+        for inbound in self.preds.pop(name):
+            self.succs[inbound].pop(name, None)
+        for outbound in self.succs.pop(name):
+            if outbound in self.graph:
+                self.update_inbounds(outbound)
+
+    def update_type(self, name):
+        del self.by_type[self.types[name]][name]
+        self.types[name] = self.get_type(name)
+        self.by_type.setdefault(self.types[name], {})[name] = None
+
+    def update_inbounds(self, name):
+        inbounds = self.graph[name].get("inbounds", [])
+        preds = Counter()
+        for inbound in inbounds:
+            if inbound in self.preds:
+                preds[inbound] += 1
+            else:
+                self.phantoms.setdefault(inbound, set()).add(name)
+        for inbound in self.preds[name]:
+            if inbound not in preds and inbound in self.succs:
+                self.succs[inbound].pop(name, None)
+        for inbound in preds:
+            self.succs[inbound][name] = None
+        self.preds[name] = preds
+
+    def get_nodes(self):
+        return list(self.order)
+
+    def is_tagged(self, name):
+        return "_tagged" in self.graph[name]["attr"]["attr"]
+
+    def count_edges(self, src, dst):
+        return self.preds[dst].get(src, 0)
+
+    def get_preds(self, name):
+        return list(self.preds[name])
+
+    def get_succs(self, name):
+        """ return the outbound names in the order of the graph dict
+        """
+        return sorted(self.succs[name], key=self.order.__getitem__)
+
+
+def _remove_missing_inbounds(inbounds, graph):
+    """ remove the nodes not in the graph from the inbounds list in place, as a pass of removing all occurrences of each
+    missing node while iterating the list, which skips as many nodes after the removed one as the occurrences removed up
+    to it. Return the nodes visited in the graph.
+    """
+    kept, visits, removed, skipped, skip = [], [], set(), Counter(), 0
+    for inbound in inbounds:
+        if inbound in removed:
+            continue
+        if skip:
+            skip -= 1
+            kept.append(inbound)
+            skipped[inbound] += 1
+        elif inbound in graph:
+            kept.append(inbound)
+            visits.append(inbound)
+        else:
+            removed.add(inbound)
+            skip = skipped[inbound] + 1
+    inbounds[:] = [inbound for inbound in kept if inbound not in removed]
+    return visits
+
+
 class ModelGraph:
-    def __init__(self, filename=None, graph=None):
+    def __init__(self, filename=None, graph=None, deepcopy=True):
+        """
+        @params:
+        filename: the json file of the graph to load
+        graph: the graph dict. It is deep-copied if `deepcopy` is True, otherwise the graph dict is owned and modified
+            by this ModelGraph, e.g., a private copy given by `convert_nodes`.
+        """
         if filename is not None:
             self.graph = json.load(open(filename, "r"))
         elif graph is not None:
-            self.graph = copy.deepcopy(graph)
+            self.graph = copy.deepcopy(graph) if deepcopy else graph
         else:
             self.graph = {}
+        self._adjacency = None
+        self._networkx_graph = None
+
+    def invalidate(self):
+        """ drop the cached adjacency and networkx views. Call it after modifying the dict given by `get_graph` directly
+        without `refresh`.
+        """
+        self._adjacency = None
+        self._networkx_graph = None
+
+    def get_adjacency(self):
+        """ return the cached `_AdjacencyView` of the graph, which is built on the first call and then kept up to date
+        by the mutators of `ModelGraph`
+        """
+        if self._adjacency is None:
+            self._adjacency = _AdjacencyView(self.graph)
+        return self._adjacency
+
+    def _on_inbounds_changed(self, name):
+        self._networkx_graph = None
+        if self._adjacency is not None:
+            self._adjacency.update_inbounds(name)
 
     def node(self, name, inbound_nodes=None):
+        self.invalidate()
         self.graph[name] = {}
         if inbound_nodes is not None:
             self.graph[name]["inbounds"] = inbound_nodes
@@ -28,40 +162,65 @@ class ModelGraph:
                 self.graph[node]["outbounds"].append(name)
 
     def refresh(self):
+        """
+        rebuild the outbounds from the inbounds, remove the inbounds referring to nodes not in the graph, and remove the
+        isolated nodes, in time linear to the size of the graph.
+
+        The results are the same as repeating passes over all nodes until no isolated node is left, where each pass
+        removes the missing inbounds while iterating the inbounds list, i.e., the node next to each removed one is
+        skipped and not counted as an outbound in that pass. Only the inbounds lists with missing nodes need to be
+        passed again, the other lists give the same outbounds in every pass.
+        """
+        self.invalidate()
         if len(self.graph) <= 1:
             return
+        graph = self.graph
+
+        # the nodes referred by the inbounds lists without missing nodes, which are visited in every pass
+        referred = set()
+        dirty = {}  # node name to the inbounds visited in the last pass, for the inbounds lists with missing nodes
+        in_graph = graph.__contains__
+        for name, node in graph.items():
+            if "inbounds" not in node:
+                continue
+            if all(map(in_graph, node["inbounds"])):
+                referred.update(node["inbounds"])
+            else:
+                dirty[name] = None
+        sources = {name: None for name, node in graph.items() if not node.get("inbounds")}
 
         last_remove_nodes_cnt = -1
         while True:
-            for name in self.graph.keys():
-                self.graph[name]["outbounds"] = []
-
-            for name in self.graph.keys():
-                if "inbounds" in self.graph[name].keys():
-                    for node in self.graph[name]["inbounds"]:
-                        if node not in self.graph.keys():
-                            while node in self.graph[name]["inbounds"]:
-                                self.graph[name]["inbounds"].remove(node)
-                        else:
-                            if "outbounds" not in self.graph[node].keys():
-                                self.graph[node]["outbounds"] = []
-
-                            self.graph[node]["outbounds"].append(name)
-
-            spare_nodes = []
-            for name in self.graph.keys():
-                if (
-                    len(self.graph[name]["outbounds"]) == 0
-                    and len(self.graph[name]["inbounds"]) == 0
-                ):
-                    spare_nodes.append(name)
-
+            visited = set()
+            for name in dirty:
+                inbounds = graph[name]["inbounds"]
+                dirty[name] = _remove_missing_inbounds(inbounds, graph)
+                visited.update(dirty[name])
+                if not inbounds:
+                    sources[name] = None
+
+            spare_nodes = [
+                name for name in sources
+                if name not in referred and name not in visited and len(graph[name]["inbounds"]) == 0
+            ]
             if last_remove_nodes_cnt == 0 and len(spare_nodes) == 0:
                 break
 
             last_remove_nodes_cnt = len(spare_nodes)
             for removing_node_name in spare_nodes:
-                del self.graph[removing_node_name]
+                del graph[removing_node_name]
+                del sources[removing_node_name]
+                dirty.pop(removing_node_name, None)
+            for name in [name for name in dirty if all(map(in_graph, graph[name]["inbounds"]))]:
+                referred.update(graph[name]["inbounds"])
+                del dirty[name]
+
+        for node in graph.values():
+            node["outbounds"] = []
+        for name, node in graph.items():
+            if "inbounds" in node:
+                for inbound in dirty[name] if name in dirty else node["inbounds"]:
+                    graph[inbound]["outbounds"].append(name)
 
     def get_graph(self):
         return self.graph
@@ -80,6 +239,7 @@ class ModelGraph:
 
     def set_node_inbounds(self, name, inbounds):
         self.graph[name]["inbounds"] = inbounds
+        self._on_inbounds_changed(name)
 
     def set_node_outbounds(self, name, outbounds):
         self.graph[name]["outbounds"] = outbounds
@@ -87,6 +247,7 @@ class ModelGraph:
     def remove_node_inbounds(self, name, inbound):
         if inbound in self.graph[name]["inbounds"]:
             self.graph[name]["inbounds"].remove(inbound)
+            self._on_inbounds_changed(name)
 
     def remove_node_outbounds(self, name, outbound):
         if outbound in self.graph[name]["outbounds"]:
@@ -94,6 +255,7 @@ class ModelGraph:
 
     def add_node_inbounds(self, name, inbound):
         self.graph[name]["inbounds"].append(inbound)
+        self._on_inbounds_changed(name)
 
     def add_node_outbounds(self, name, outbound):
         self.graph[name]["outbounds"].append(outbound)
@@ -114,13 +276,19 @@ class ModelGraph:
 
     def add_node_attr(self, name, attr_key, attr_value):
         if name not in self.graph.keys():
+            self.invalidate()
             self.graph[name] = {}
+        self._networkx_graph = None
         self.graph[name]["attr"]["attr"][attr_key] = attr_value
 
     def set_node_attr(self, name, attr):
         if name not in self.graph.keys():
+            self.invalidate()
             self.graph[name] = {}
+        self._networkx_graph = None
         self.graph[name]["attr"] = attr
+        if self._adjacency is not None:
+            self._adjacency.update_type(name)
 
     def get_node_attr(self, name):
         if name in self.graph.keys():
@@ -173,6 +341,9 @@ class ModelGraph:
             "inbounds": [],
             "outbounds": [],
         }
+        self._networkx_graph = None
+        if self._adjacency is not None:
+            self._adjacency.add_node(name)
 
         for node in subgraph:
             for inbound in self.get_node_inbounds(node):
@@ -192,6 +363,8 @@ class ModelGraph:
 
         for node in subgraph:
             del self.graph[node]
+            if self._adjacency is not None:
+                self._adjacency.remove_node(node)
 
         return True
 
@@ -218,9 +391,19 @@ class ModelGraph:
         nx.draw(self.get_networkx_graph(), with_labels=True, font_weight="bold")
         plt.show()
 
+    def get_topological_order(self):
+        import networkx as nx
+
+        return list(nx.topological_sort(self.get_networkx_graph()))
+
     def get_networkx_graph(self):
+        """ return the networkx view of the graph. The view is cached until the graph is changed by the mutators of
+        `ModelGraph`, and should not be modified.
+        """
         import networkx as nx
 
+        if self._networkx_graph is not None:
+            return self._networkx_graph
         G = nx.MultiDiGraph()
         for (key, value) in self.graph.items():
             G.add_node(key, type=value["attr"]["type"], **value["attr"]["attr"])
@@ -228,6 +411,7 @@ class ModelGraph:
                 for node in value["inbounds"]:
                     G.add_edge(node, key)
         self.graphx = G
+        self._networkx_graph = G
         return G
 
     def match_isomorph_vf2(self):
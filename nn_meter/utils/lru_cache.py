@@ -0,0 +1,73 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe LRU cache, which counts the hits and misses of the lookups. The least recently used item is
+    evicted first when the number of items exceeds the capacity. Subclasses could look up a missed key elsewhere (e.g.,
+    on disk) by overriding `_load_missing`.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        # reentrant, so that subclasses could call the methods of the base class with the lock held
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _load_missing(self, key):
+        """ return the value of a key not in memory, which is then put in memory, or None if it is missed. Called with
+        the lock held.
+        """
+        return None
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            value = self._load_missing(key)
+            if value is not None:
+                self._put_in_memory(key, value)
+                return value
+            self.misses += 1
+            return default
+
+    def _put_in_memory(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+    def put(self, key, value):
+        with self._lock:
+            self._put_in_memory(key, value)
+
+    def items(self):
+        """ return a list of the cached (key, value) pairs, from the least recently used one
+        """
+        with self._lock:
+            return list(self._items.items())
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -4,7 +4,8 @@ import sys
 import logging
 import argparse
 from .registry import register_module_cli, unregister_module_cli
-from .predictor import list_latency_predictors_cli, apply_latency_predictor_cli, get_nnmeter_ir_cli
+from .predictor import list_latency_predictors_cli, apply_latency_predictor_cli, get_nnmeter_ir_cli, \
+    bundle_latency_predictor_cli, serve_latency_predictor_cli
 from .builder import list_backends_cli, list_kernels_cli, list_operators_cli, list_special_testcases_cli, \
     test_backend_connection_cli, create_workspace_cli
 
@@ -104,6 +105,21 @@ def nn_meter_cli():
         nargs='+',
         help="name of the input torch model from the torchvision model zoo"
     )
+    lat_pred.add_argument(
+        "-j", "--jobs",
+        type=int,
+        help="number of worker processes to convert and predict models in parallel, each worker loads the predictor "
+             "once",
+        default=1
+    )
+    lat_pred.add_argument(
+        "-o", "--output",
+        type=str,
+        help="path to stream the prediction results as they finish, in CSV format if the file name ends with .csv, "
+             "otherwise in JSONL format. With --jobs, the results are written in completion order, and the index "
+             "column gives the order of the input models",
+        default=None
+    )
     lat_pred.set_defaults(func=apply_latency_predictor_cli)
 
     # Usage 2: get nn-meter-ir model from tensorflow pbfile or onnx file
@@ -253,7 +269,97 @@ def nn_meter_cli():
     )
     unregister.set_defaults(func=unregister_module_cli)
 
-    # Usage 7: change data folder
+    # Usage 7: convert kernel predictors to a compact memory-mappable bundle
+    # Usage: nn-meter bundle --predictor <hardware>
+    bundle = subparsers.add_parser(
+        'bundle',
+        help='convert kernel predictors (*.pkl) to a compact memory-mappable bundle for fast predictor loading'
+    )
+    predictor_source = bundle.add_mutually_exclusive_group()
+    predictor_source.add_argument(
+        "--predictor",
+        type=str,
+        help="name of target predictor (hardware)"
+    )
+    predictor_source.add_argument(
+        "--predictor-dir",
+        type=str,
+        help="path to the predictor folder containing the kernel predictors (*.pkl)"
+    )
+    bundle.add_argument(
+        "--predictor-version",
+        type=float,
+        help="the version of the latency predictor (if not specified, use the lateast version)",
+        default=None
+    )
+    bundle.add_argument(
+        "-o", "--output",
+        type=str,
+        help="path to save the bundle, default to be <predictor-folder>/bundle, where the bundle is detected by the "
+             "native and bundle engines. A bundle saved elsewhere is loaded by "
+             "load_latency_predictor(..., bundle=<bundle-folder>)"
+    )
+    bundle.set_defaults(func=bundle_latency_predictor_cli)
+
+    # Usage 8: serve latency predictors in a long-running daemon
+    # Usage: nn-meter serve --predictor <hardware> [<hardware> ...] --port <port>
+    serve = subparsers.add_parser(
+        'serve',
+        help='preload latency predictors once and serve predictions over a local HTTP endpoint'
+    )
+    serve.add_argument(
+        "--predictor",
+        type=str,
+        nargs='+',
+        help="name(s) of target predictor (hardware), the first one is used if a request doesn't specify the predictor"
+    )
+    serve.add_argument(
+        "--predictor-version",
+        type=float,
+        help="the version of the latency predictor (if not specified, use the lateast version)",
+        default=None
+    )
+    serve.add_argument(
+        "--engine",
+        type=str,
+        choices=["sklearn", "native", "bundle"],
+        help="the inference engine of kernel predictors, the native and bundle engines use the predictor bundle in "
+             "<predictor-folder>/bundle",
+        default="sklearn"
+    )
+    serve.add_argument(
+        "--host",
+        type=str,
+        help="the host address to listen to",
+        default="127.0.0.1"
+    )
+    serve.add_argument(
+        "--port",
+        type=int,
+        help="the port to listen to",
+        default=8765
+    )
+    serve.add_argument(
+        "--batch-window",
+        type=float,
+        help="requests arriving within this window (in ms) are coalesced into one batched prediction",
+        default=5
+    )
+    serve.add_argument(
+        "--max-batch-size",
+        type=int,
+        help="the maximum number of requests in one batched prediction",
+        default=64
+    )
+    serve.add_argument(
+        "--max-queue-size",
+        type=int,
+        help="the maximum number of pending requests, further requests are rejected with HTTP 503",
+        default=1024
+    )
+    serve.set_defaults(func=serve_latency_predictor_cli)
+
+    # Usage 9: change data folder
     # Usage: nn-meter set_data --data <path/to/new-folder>
     # TODO
 
@@ -1,9 +1,13 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import os
+import sys
+import csv
+import json
 import logging
 from glob import glob
-from nn_meter import list_latency_predictors, load_latency_predictor, model_file_to_graph
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from nn_meter import list_latency_predictors, load_latency_predictor, bundle_latency_predictor, model_file_to_graph
 
 
 def list_latency_predictors_cli():
@@ -32,12 +36,10 @@ def apply_latency_predictor_cli(args):
         return
     
     if not args.predictor:
-        logging.keyinfo('You must specify a predictor. Use "nn-meter --list-predictors" to see all supporting predictors.')
+        logging.keyinfo('You must specify a predictor. Use "nn-meter --list-predictors" to see all supporting '
+                        'predictors.')
         return
 
-    # load predictor
-    predictor = load_latency_predictor(args.predictor, args.predictor_version)
-
     # specify model for prediction
     if not args.torchvision: # input of tensorflow, onnx, nnmeter-ir and nni-ir is file name, while input of torchvision is string list
         input_model_list = []
@@ -50,14 +52,146 @@ def apply_latency_predictor_cli(args):
         else:
             logging.error(f'Cannot find any model satisfying the arguments.')
 
-    # predict latency
-    result = {}
-    for model in input_model_list:
-        latency = predictor.predict(model, model_type) # in unit of ms
-        result[os.path.basename(model)] = latency
+    # predict latency, the results are streamed out as they finish. A model failing in conversion or prediction is
+    # logged and skipped in both the sequential and the parallel way, and the command exits with a non-zero status
+    # after all the other models are predicted.
+    latencies, failures = {}, []
+    writer = _ResultWriter(args.output, model_type, args.predictor, args.predictor_version)
+    try:
+        if args.jobs <= 1:
+            predictor = load_latency_predictor(args.predictor, args.predictor_version)
+            for index, model in enumerate(input_model_list):
+                try:
+                    latency = predictor.predict(model, model_type)  # in unit of ms
+                except Exception as e:
+                    logging.error(f'Failed to predict latency for {os.path.basename(model)}: {e}')
+                    failures.append(model)
+                    continue
+                latencies[index] = latency
+                writer.write(index, model, latency)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=args.jobs,
+                initializer=_init_predictor_worker,
+                initargs=(args.predictor, args.predictor_version)
+            ) as executor:
+                futures = {
+                    executor.submit(_predict_in_worker, model, model_type): index
+                    for index, model in enumerate(input_model_list)
+                }
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        latency = future.result()
+                    except Exception as e:
+                        logging.error(f'Failed to predict latency for {os.path.basename(input_model_list[index])}: {e}')
+                        failures.append(input_model_list[index])
+                        continue
+                    latencies[index] = latency
+                    writer.write(index, input_model_list[index], latency)
+    finally:
+        writer.close()
+
+    if failures:
+        logging.error(f'Failed to predict latency for {len(failures)} of {len(input_model_list)} models: '
+                      f'{", ".join(os.path.basename(model) for model in failures)}')
+        sys.exit(1)
+
+    # the results in the order of the input models
+    return {os.path.basename(input_model_list[index]): latencies[index] for index in sorted(latencies)}
+
+
+class _ResultWriter:
+    """log each prediction result, and append it to the output file in CSV (if the file name ends with .csv) or JSONL
+    format. The results are written in the order they finish, and the `index` of each result is the index of the model
+    in the input.
+    """
+    fields = ["index", "model", "model_type", "predictor", "predictor_version", "latency"]
+
+    def __init__(self, filename, model_type, predictor_name, predictor_version):
+        self.model_type = model_type
+        self.predictor_name = predictor_name
+        self.predictor_version = predictor_version
+        self.fp, self.csv_writer = None, None
+        if filename:
+            self.fp = open(filename, "w", newline="")
+            if filename.endswith(".csv"):
+                self.csv_writer = csv.writer(self.fp)
+                self.csv_writer.writerow(self.fields)
+
+    def write(self, index, model, latency):
         logging.result(f'[RESULT] predict latency for {os.path.basename(model)}: {latency} ms')
-    
-    return result
+        if self.fp is None:
+            return
+        item = [
+            index, os.path.basename(model), self.model_type, self.predictor_name, self.predictor_version, float(latency)
+        ]
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(item)
+        else:
+            self.fp.write(json.dumps(dict(zip(self.fields, item))) + "\n")
+        self.fp.flush()
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.close()
+
+
+_worker_predictor = None
+
+
+def _init_predictor_worker(predictor_name, predictor_version):
+    """load the predictor once in each worker process
+    """
+    global _worker_predictor
+    _worker_predictor = load_latency_predictor(predictor_name, predictor_version)
+
+
+def _predict_in_worker(model, model_type):
+    return _worker_predictor.predict(model, model_type)  # in unit of ms
+
+
+def bundle_latency_predictor_cli(args):
+    """convert the kernel predictors to a compact memory-mappable bundle according to the command line interface
+    arguments
+    """
+    from nn_meter.predictor.predictor_bundle import convert_predictor_to_bundle
+    if args.predictor_dir:
+        convert_predictor_to_bundle(args.predictor_dir, args.output)
+    elif args.predictor:
+        bundle_latency_predictor(args.predictor, args.predictor_version, args.output)
+    else:
+        logging.keyinfo('please run "nn-meter bundle --help" to see guidance.')
+
+
+def serve_latency_predictor_cli(args):
+    """start a long-running prediction server according to the command line interface arguments
+    """
+    from nn_meter.predictor.prediction_server import PredictionServer
+    if not args.predictor:
+        logging.keyinfo('You must specify a predictor. Use "nn-meter --list-predictors" to see all supporting '
+                        'predictors.')
+        return
+
+    predictors = {
+        name: load_latency_predictor(name, args.predictor_version, engine=args.engine)
+        for name in args.predictor
+    }
+    server = PredictionServer(
+        predictors, (args.host, args.port),
+        batch_window=args.batch_window / 1000,
+        max_batch_size=args.max_batch_size,
+        max_queue_size=args.max_queue_size
+    )
+    host, port = server.server_address[:2]
+    logging.keyinfo(f'Serving predictors {", ".join(predictors)} at http://{host}:{port} (POST /predict, GET /stats). '
+                    f'Press Ctrl+C to stop.')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 
 def get_nnmeter_ir_cli(args):
@@ -0,0 +1,42 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Compare `nnMeterPredictor.predict` in a loop against `nnMeterPredictor.predict_batch`.
+# Usage: python tests/benchmark/benchmark_batch_prediction.py --predictor cortexA76cpu_tflite21 --num 200
+import json
+import time
+import argparse
+import logging
+from nn_meter import load_latency_predictor
+
+
+def benchmark(predictor, graphs):
+    since = time.time()
+    loop_result = [predictor.predict(graph, "nnmeter-ir") for graph in graphs]
+    loop_time = time.time() - since
+
+    since = time.time()
+    batch_result = predictor.predict_batch(graphs, "nnmeter-ir")
+    batch_time = time.time() - since
+
+    assert loop_result == batch_result, "batch prediction differs from single-model prediction"
+    return loop_time, batch_time
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--predictor", type=str, default="cortexA76cpu_tflite21")
+    parser.add_argument("--predictor-version", type=float, default=None)
+    parser.add_argument("--model", type=str, default="material/testmodels/mobilenetv3small_0.json")
+    parser.add_argument("--num", type=int, default=200)
+    args = parser.parse_args()
+    logging.getLogger("nn-Meter").setLevel(logging.WARNING)
+
+    predictor = load_latency_predictor(args.predictor, args.predictor_version)
+    with open(args.model, "r") as fp:
+        graph = json.load(fp)
+
+    for num in [1, 10, args.num]:
+        loop_time, batch_time = benchmark(predictor, [graph] * num)
+        print(f"{num} models: predict loop {loop_time:.3f} s, predict_batch {batch_time:.3f} s, "
+              f"speedup {loop_time / batch_time:.2f}x")
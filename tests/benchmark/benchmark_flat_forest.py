@@ -0,0 +1,42 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Compare the per-model latency of sklearn `predict` against the native `FlatForest` engine on kernel predictors.
+# Usage: python tests/benchmark/benchmark_flat_forest.py --predictor cortexA76cpu_tflite21
+import time
+import argparse
+import logging
+import numpy as np
+from nn_meter import load_latency_predictor
+from nn_meter.predictor.prediction.tree_ensemble import FlatForest
+
+
+def timeit(func, X, repeat):
+    since = time.time()
+    for _ in range(repeat):
+        func(X)
+    return (time.time() - since) / repeat
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--predictor", type=str, default="cortexA76cpu_tflite21")
+    parser.add_argument("--predictor-version", type=float, default=None)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    logging.getLogger("nn-Meter").setLevel(logging.WARNING)
+
+    predictor = load_latency_predictor(args.predictor, args.predictor_version)
+    rng = np.random.RandomState(0)
+    for kernel, model in sorted(predictor.kernel_predictors.items()):
+        since = time.time()
+        flat = FlatForest.from_sklearn(model)
+        compile_time = time.time() - since
+        for batch_size in [1, 16, 1024]:
+            X = rng.randint(1, 512, size=(batch_size, flat.n_features)).astype(np.float64)
+            assert np.array_equal(model.predict(X), flat.predict(X)), f"FlatForest differs from sklearn on {kernel}"
+            sklearn_time = timeit(model.predict, X, args.repeat)
+            flat_time = timeit(flat.predict, X, args.repeat)
+            print(f"[{kernel}] trees={flat.n_trees} depth={flat.max_depth} compile={compile_time * 1e3:.1f} ms "
+                  f"batch={batch_size}: sklearn {sklearn_time * 1e3:.3f} ms, native {flat_time * 1e3:.3f} ms, "
+                  f"speedup {sklearn_time / flat_time:.2f}x")
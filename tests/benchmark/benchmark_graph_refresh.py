@@ -0,0 +1,66 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Stress benchmark of `ModelGraph.refresh` on synthetic graphs of 10k-100k nodes, compared with the previous multi-pass
+# implementation. The graphs are chains with residual connections, wide nodes with many inbounds, inbounds referring to
+# removed nodes (e.g., stripped weights), and isolated nodes.
+# Usage: python tests/benchmark/benchmark_graph_refresh.py [--legacy-max-nodes 100000]
+import os
+import sys
+import copy
+import time
+import random
+import argparse
+from nn_meter.utils.graph_tool import ModelGraph
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "unit_test"))
+from test_graph_refresh import legacy_refresh  # noqa: E402
+
+
+def build_graph(num_nodes, width=2000, seed=0):
+    rng = random.Random(seed)
+    graph = {}
+    for i in range(num_nodes):
+        name = f"n{i}"
+        if i % 5000 == 4999:
+            # a wide node, e.g., a concat of many branches
+            inbounds = [f"n{j}" for j in range(i - width, i)]
+            inbounds += [f"missing{i}_{j}" for j in range(width)]
+        elif i % 50 == 0:
+            inbounds = []  # isolated node
+        else:
+            inbounds = [f"n{i - 1}"] if i > 0 else []
+            if i > 4 and rng.random() < 0.2:
+                inbounds.append(f"n{rng.randrange(i - 4, i - 1)}")
+            if rng.random() < 0.1:
+                inbounds.append(f"weight{i}")  # stripped weight
+        graph[name] = {"attr": {"name": name, "type": "conv", "attr": {}}, "inbounds": inbounds}
+    return graph
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--legacy-max-nodes", type=int, default=100000,
+                        help="skip the previous implementation on larger graphs")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    def timeit(refresh, graph):
+        # the best of several runs, each on a fresh copy of the graph
+        best = float("inf")
+        for _ in range(args.repeat):
+            copied = copy.deepcopy(graph)
+            since = time.time()
+            refresh(copied)
+            best = min(best, time.time() - since)
+        return best, copied
+
+    for num_nodes in [10000, 30000, 100000]:
+        graph = build_graph(num_nodes)
+        refresh_time, refreshed = timeit(lambda graph: ModelGraph(graph=graph, deepcopy=False).refresh(), graph)
+        message = f"nodes={num_nodes}: refresh {refresh_time:.3f} s"
+
+        if num_nodes <= args.legacy_max_nodes:
+            legacy_time, expected = timeit(legacy_refresh, graph)
+            assert list(refreshed.items()) == list(expected.items())
+            message += f", previous implementation {legacy_time:.3f} s"
+        print(message)
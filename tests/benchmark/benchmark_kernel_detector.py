@@ -0,0 +1,79 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Benchmark `KernelDetector.load_graph` on large graphs built from copies of the test model, with the adjacency
+# view of `ModelGraph` kept across fusions (default) or rebuilt for every fusion unit as before, and on `CompactGraph`.
+# The memory of the graph kept by the detector after detection is measured by tracemalloc.
+# Usage: python tests/benchmark/benchmark_kernel_detector.py --fusion-rule <path to fusion_rules.json>
+import json
+import time
+import argparse
+import tracemalloc
+from nn_meter.kernel_detector import KernelDetector
+from nn_meter.kernel_detector.utils.pattern_matcher import PatternMatcher
+
+
+def build_large_graph(graph, copies):
+    """ return a graph of `copies` disjoint copies of the given graph
+    """
+    large = {}
+    for c in range(copies):
+        for name, node in graph.items():
+            node = json.loads(json.dumps(node))
+            node["inbounds"] = [f"{c}/{inbound}" for inbound in node["inbounds"]]
+            node["outbounds"] = [f"{c}/{outbound}" for outbound in node["outbounds"]]
+            node["attr"]["name"] = f"{c}/{name}"
+            large[f"{c}/{name}"] = node
+    return large
+
+
+def timeit(kd, graph, repeat):
+    since = time.time()
+    for _ in range(repeat):
+        kd.load_graph(graph)
+    return (time.time() - since) / repeat
+
+
+def retained_memory(kd, graph):
+    kd.model_graph = None
+    tracemalloc.start()
+    kd.load_graph(graph)
+    kd.splitter._fusion_graph = None
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return memory / 2 ** 20
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fusion-rule", type=str, required=True)
+    parser.add_argument("--model", type=str, default="material/testmodels/mobilenetv3small_0.json")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.model, "r") as fp:
+        graph = json.load(fp)
+    kd = KernelDetector(args.fusion_rule)
+    compact_kd = KernelDetector(args.fusion_rule, compact=True)
+    find = PatternMatcher.find
+
+    def find_with_rebuild(self, model_graph):
+        model_graph.invalidate()
+        return find(self, model_graph)
+
+    for copies in [1, 10, 30]:
+        large = build_large_graph(graph, copies)
+        cached_time = timeit(kd, large, args.repeat)
+        kernels = kd.get_kernels()
+        PatternMatcher.find = find_with_rebuild
+        rebuild_time = timeit(kd, large, args.repeat)
+        PatternMatcher.find = find
+        assert kernels == kd.get_kernels()
+        print(f"nodes={len(large)} kernels={len(kernels)}: load_graph {cached_time:.3f} s with cached adjacency, "
+              f"{rebuild_time:.3f} s when rebuilding per fusion unit")
+
+        compact_time = timeit(compact_kd, large, args.repeat)
+        assert kernels == compact_kd.get_kernels()
+        print(f"nodes={len(large)}: load_graph {compact_time:.3f} s on CompactGraph, retained graph "
+              f"{retained_memory(kd, large):.2f} MB on ModelGraph, "
+              f"{retained_memory(compact_kd, large):.2f} MB on CompactGraph")
@@ -0,0 +1,54 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Build the latency lookup table of a MobileNetV2-style search space, check it against per-block prediction, and measure
+# the scoring throughput of encoded architectures.
+# Usage: python tests/benchmark/benchmark_latency_lut.py --predictor cortexA76cpu_tflite21
+import time
+import argparse
+import logging
+import numpy as np
+from nn_meter import load_latency_predictor
+from nn_meter.predictor.latency_lut import build_inverted_residual_graph
+
+
+MOBILENETV2_SEARCH_SPACE = {
+    "resolutions": [160, 192, 224],
+    "stem": {"channels": 32, "kernel_size": 3, "stride": 2},
+    "layers": [{"stride": 1, "kernel_sizes": [3], "expand_ratios": [1], "channels": [16]}] + [
+        {"stride": stride, "kernel_sizes": [3, 5, 7], "expand_ratios": [3, 6], "channels": channels}
+        for stride, channels in [
+            (2, [24, 32]), (1, [24, 32]), (2, [32, 40]), (1, [32, 40]), (1, [32, 40]), (2, [64, 80]), (1, [64, 80]),
+            (1, [64, 80]), (1, [96, 112]), (1, [96, 112]), (2, [160, 192]), (1, [160, 192]), (1, [320])
+        ]
+    ],
+    "head": {"channels": 1280, "num_classes": 1000}
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--predictor", type=str, default="cortexA76cpu_tflite21")
+    parser.add_argument("--predictor-version", type=float, default=None)
+    parser.add_argument("--num-archs", type=int, default=1000000)
+    args = parser.parse_args()
+    logging.getLogger("nn-Meter").setLevel(logging.WARNING)
+
+    predictor = load_latency_predictor(args.predictor, args.predictor_version)
+    since = time.time()
+    lut = predictor.build_latency_lut(MOBILENETV2_SEARCH_SPACE)
+    print(f"build LUT with {lut.table.size} entries: {time.time() - since:.2f} s")
+
+    # the first layer of the first resolution is indexed directly by the LUT
+    layer = lut.spec["layers"][1]
+    graph = build_inverted_residual_graph(
+        80, 16, layer["channels"][0], layer["kernel_sizes"][0], layer["expand_ratios"][0], layer["stride"]
+    )
+    assert np.isclose(predictor.predict(graph, "nnmeter-ir"), lut.table[0, lut.offsets[1]])
+
+    archs = lut.sample(args.num_archs, seed=0)
+    since = time.time()
+    lats = lut.score(archs)
+    elapsed = time.time() - since
+    print(f"score {len(archs)} architectures: {elapsed:.3f} s, {len(archs) / elapsed / 1e6:.2f} M archs/s, "
+          f"latency range [{lats.min():.2f}, {lats.max():.2f}] ms")
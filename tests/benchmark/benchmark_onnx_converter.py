@@ -0,0 +1,40 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Benchmark of `OnnxConverter` on synthetic channel-split models with thousands of Slice and Split ops, compared with
+# the previous implementation. The timings include the shape inference of onnx, which is timed alone for reference.
+# Usage: python tests/benchmark/benchmark_onnx_converter.py [--repeat 3]
+import os
+import sys
+import time
+import logging
+import argparse
+from onnx import shape_inference
+from nn_meter.ir_converter.onnx_converter import OnnxConverter
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "unit_test"))
+from test_onnx_converter import LegacyOnnxConverter, build_slice_model  # noqa: E402
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger("nn-Meter").setLevel(logging.ERROR)
+
+    def timeit(convert, model):
+        # the best of several runs
+        best = float("inf")
+        for _ in range(args.repeat):
+            since = time.time()
+            graph = convert(model)
+            best = min(best, time.time() - since)
+        return best, graph
+
+    for num_blocks, num_groups in [(20, 64), (10, 512), (4, 2048), (2, 8192)]:
+        model = build_slice_model(num_blocks, num_groups)
+        inference_time, _ = timeit(shape_inference.infer_shapes, model)
+        convert_time, graph = timeit(lambda model: OnnxConverter(model).convert(), model)
+        legacy_time, expected = timeit(lambda model: LegacyOnnxConverter(model).convert(), model)
+        assert list(graph.items()) == list(expected.items())
+        print(f"blocks={num_blocks}, groups={num_groups}, nodes={len(model.graph.node)}: convert {convert_time:.3f} s, "
+              f"previous implementation {legacy_time:.3f} s, shape inference alone {inference_time:.3f} s")
@@ -0,0 +1,83 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Compare the time and peak RSS of converting a large synthetic onnx model file to nn-Meter IR, by `onnx.load` of the
+# whole model and by `model_file_to_graph`, which loads the model without weights. Each conversion runs in a fresh
+# subprocess, for the models with the weights embedded and in external data.
+# Usage: python tests/benchmark/benchmark_onnx_loading.py [--num-blocks 100] [--channels 256]
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "unit_test"))
+
+
+def get_peak_rss():
+    """ return the peak RSS of the process in MB, by VmHWM which is reset by exec unlike ru_maxrss
+    """
+    with open("/proc/self/status", "r") as fp:
+        for line in fp:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+
+def convert(filename, mode, output):
+    import logging
+    import onnx
+    from nn_meter.ir_converter import model_file_to_graph
+    from nn_meter.ir_converter.utils import onnx_model_to_graph
+    logging.getLogger("nn-Meter").setLevel(logging.ERROR)
+    start_rss = get_peak_rss()
+    since = time.time()
+    if mode == "full":
+        graph = onnx_model_to_graph(onnx.load(filename))
+    else:
+        graph = model_file_to_graph(filename, "onnx", load_weights=False)
+    elapsed = time.time() - since
+    peak_rss = get_peak_rss()
+    with open(output, "w") as fp:
+        json.dump(graph, fp)
+    print(json.dumps({"time": elapsed, "peak_rss": peak_rss, "start_rss": start_rss}))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-blocks", type=int, default=100)
+    parser.add_argument("--channels", type=int, default=256)
+    parser.add_argument("--convert", nargs=3, metavar=("FILENAME", "MODE", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.convert:
+        convert(*args.convert)
+        sys.exit(0)
+
+    from test_onnx_loading import build_onnx_model, save_onnx_model
+    model = build_onnx_model(args.num_blocks, args.channels)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for external_data in [False, True]:
+            filename = os.path.join(tmpdir, f"model_{external_data}.onnx")
+            save_onnx_model(model, filename, external_data)
+            size = sum(os.path.getsize(os.path.join(tmpdir, name)) for name in os.listdir(tmpdir)
+                       if name.startswith(os.path.basename(filename)))
+
+            results, graphs = {}, {}
+            for mode in ["full", "without-weights"]:
+                output = os.path.join(tmpdir, f"{mode}.json")
+                stdout = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--convert", filename, mode, output],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                results[mode] = json.loads(stdout.strip().splitlines()[-1])
+                with open(output, "r") as fp:
+                    graphs[mode] = json.load(fp)
+            assert graphs["full"] == graphs["without-weights"]
+
+            print(f"external_data={external_data}, {size / 2 ** 20:.0f} MB: " + ", ".join(
+                f"{mode} {result['time']:.2f} s, peak RSS {result['peak_rss']:.0f} MB "
+                f"(+{result['peak_rss'] - result['start_rss']:.0f} MB)" for mode, result in results.items()
+            ))
+            os.remove(filename)
+            if external_data:
+                os.remove(filename + ".data")
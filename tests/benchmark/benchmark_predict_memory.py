@@ -0,0 +1,68 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Measure the time and peak memory (by tracemalloc) of `nnMeterPredictor.predict` on the bundled test models, with the
+# copy-free kernel detection and with the former deep copies of the graph. `--payload-size` attaches a list of the given
+# length to the attrs of each conv node to emulate large attribute payloads of ONNX-derived graphs.
+# Usage: python tests/benchmark/benchmark_predict_memory.py --predictor cortexA76cpu_tflite21
+import copy
+import json
+import glob
+import time
+import argparse
+import logging
+import tracemalloc
+from nn_meter import load_latency_predictor
+from nn_meter.kernel_detector import KernelDetector
+from nn_meter.utils.graph_tool import ModelGraph
+
+
+def legacy_build_model_graph(self, new_graph):
+    """ the former graph building of `KernelDetector`, which deep-copies the graph twice
+    """
+    model_graph = ModelGraph(graph=copy.deepcopy(new_graph))
+    model_graph.refresh()
+    return model_graph
+
+
+def measure(predictor, graph, repeat):
+    tracemalloc.start()
+    since = time.time()
+    for _ in range(repeat):
+        latency = predictor.predict(graph, "nnmeter-ir")
+    elapsed = (time.time() - since) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latency, elapsed, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--predictor", type=str, default="cortexA76cpu_tflite21")
+    parser.add_argument("--predictor-version", type=float, default=None)
+    parser.add_argument("--payload-size", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.getLogger("nn-Meter").setLevel(logging.WARNING)
+
+    predictor = load_latency_predictor(args.predictor, args.predictor_version)
+    build_model_graph = KernelDetector._build_model_graph
+    for model_file in sorted(glob.glob("material/testmodels/*.json")):
+        with open(model_file, "r") as fp:
+            graph = json.load(fp)
+        if args.payload_size:
+            for node in graph.values():
+                if node["attr"]["type"] in ["Conv2D", "DepthwiseConv2dNative", "Conv"]:
+                    node["attr"]["attr"]["weight"] = [0.0] * args.payload_size
+        snapshot = json.dumps(graph, sort_keys=True)
+        predictor.predict(graph, "nnmeter-ir")  # warm up the lazily loaded kernel predictors
+
+        latency, elapsed, peak = measure(predictor, graph, args.repeat)
+        assert json.dumps(graph, sort_keys=True) == snapshot, "The input graph is modified by prediction"
+        KernelDetector._build_model_graph = legacy_build_model_graph
+        legacy_latency, legacy_elapsed, legacy_peak = measure(predictor, graph, args.repeat)
+        KernelDetector._build_model_graph = build_model_graph
+        assert latency == legacy_latency
+
+        print(f"{model_file}: copy-free {elapsed * 1e3:.1f} ms, peak {peak / 2 ** 20:.2f} MB; "
+              f"deep copies {legacy_elapsed * 1e3:.1f} ms, peak {legacy_peak / 2 ** 20:.2f} MB")
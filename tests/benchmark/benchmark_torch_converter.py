@@ -0,0 +1,78 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Compare the time and peak RSS of converting the torchvision models in `model_file_to_graph` to nn-Meter IR, by the
+# Onnx-based torch converter and by the fx-based torch converter, and the latencies predicted from both graphs. Each
+# conversion runs in a fresh subprocess, and includes the construction of the torchvision model.
+# Usage: python tests/benchmark/benchmark_torch_converter.py [<predictor-name>] [--models resnet18 mobilenet_v2]
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+TORCHVISION_MODELS = [
+    'resnet18', 'alexnet', 'vgg16', 'squeezenet', 'densenet161', 'inception_v3', 'googlenet', 'shufflenet_v2',
+    'mobilenet_v2', 'resnext50_32x4d', 'wide_resnet50_2', 'mnasnet',
+]
+
+
+def get_peak_rss():
+    """ return the peak RSS of the process in MB
+    """
+    with open("/proc/self/status", "r") as fp:
+        for line in fp:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+
+def convert(model_name, converter, output):
+    import logging
+    from nn_meter.ir_converter import model_file_to_graph
+    from nn_meter.utils.import_package import try_import_torchvision_models
+    logging.getLogger("nn-Meter").setLevel(logging.ERROR)
+    try_import_torchvision_models()
+    start_rss = get_peak_rss()
+    since = time.time()
+    graph = model_file_to_graph(model_name, "torch", converter=converter)
+    elapsed = time.time() - since
+    peak_rss = get_peak_rss()
+    with open(output, "w") as fp:
+        json.dump(graph, fp)
+    print(json.dumps({"time": elapsed, "peak_rss": peak_rss, "start_rss": start_rss}))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("predictor_name", nargs="?", default="cortexA76cpu_tflite21")
+    parser.add_argument("--models", nargs="+", default=TORCHVISION_MODELS)
+    parser.add_argument("--convert", nargs=3, metavar=("MODEL", "CONVERTER", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.convert:
+        convert(*args.convert)
+        sys.exit(0)
+
+    from nn_meter import load_latency_predictor
+    predictor = load_latency_predictor(args.predictor_name)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for model_name in args.models:
+            messages = []
+            for converter in ["onnx", "fx"]:
+                output = f"{tmpdir}/{model_name}_{converter}.json"
+                process = subprocess.run(
+                    [sys.executable, __file__, "--convert", model_name, converter, output],
+                    capture_output=True, text=True,
+                )
+                if process.returncode:
+                    messages.append(f"{converter} failed: {process.stderr.strip().splitlines()[-1]}")
+                    continue
+                result = json.loads(process.stdout.strip().splitlines()[-1])
+                with open(output, "r") as fp:
+                    graph = json.load(fp)
+                latency = predictor.predict(graph, "nnmeter-ir")
+                messages.append(
+                    f"{converter} {result['time']:.2f} s, peak RSS +{result['peak_rss'] - result['start_rss']:.0f} MB, "
+                    f"{len(graph)} nodes, latency {latency:.4f} ms"
+                )
+            print(f"{model_name}: " + ", ".join(messages))
@@ -0,0 +1,94 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Shared helpers of the unit tests on graphs and kernel detection: fusion rule files, random nn-Meter IR graphs, and the
+# kernel detection that tolerates the failures of random graphs. The test scripts import it from the folder of the
+# running script, which Python adds to `sys.path`, so that they could be run from any working directory.
+import os
+import json
+
+
+def make_fusion_rules(blocks):
+    """ return the fusion rules obeying the fusion of each block of op types
+    """
+    return {f"BF_{'_'.join(ops)}": {"obey": True} for ops in blocks}
+
+
+FUSION_RULES = make_fusion_rules([
+    ("conv", "bn"), ("conv", "relu"), ("bn", "relu"), ("dwconv", "bn"), ("add", "relu"), ("conv", "bn", "relu"),
+    ("relu", "add"), ("relu", "conv"), ("conv", "hswish")
+])
+OP_TYPES = ["conv", "dwconv", "bn", "relu", "relu6", "add", "mul", "gap", "avgpool", "hardsigmoid", "reshape", "concat",
+            "split"]
+
+
+def write_rule_files(folder, rules=FUSION_RULES, mons=(0, 1)):
+    """ write the fusion rules with each MON rule to `<folder>/fusion_rules_<mon>.json`, and return the file names. The
+    MON rule is not written if `mon` is None.
+    """
+    filenames = []
+    for mon in mons:
+        filenames.append(os.path.join(folder, f"fusion_rules_{mon}.json"))
+        with open(filenames[-1], "w") as fp:
+            json.dump(rules if mon is None else {**rules, "MON": {"obey": mon}}, fp)
+    return filenames
+
+
+def random_graph(num_nodes, rng, op_types=OP_TYPES, chain_prob=1.0, branch_prob=0.3, max_branches=1, window=6,
+                 multi_edge_prob=0.0, connected=True, with_shapes=True, shuffle=True):
+    """
+    return a random nn-Meter IR graph of nodes `n0`, `n1`, ..., which are mostly chains, with some branches and residual
+    connections to the recent nodes.
+    @params:
+
+    num_nodes: the number of nodes
+    rng: the `random.Random` object
+    op_types: the op types to choose from
+    chain_prob: the probability that a node takes the previous node as its first inbound
+    branch_prob: the probability of each extra inbound from the `window` recent nodes, at most `max_branches` ones
+    multi_edge_prob: the probability that the first inbound of a node is repeated as its last one. If 0, the inbounds
+        of each node are distinct.
+    connected: if True, a node without any inbound takes a random earlier node as its inbound, except the first node
+    with_shapes: if True, the nodes have random input/output shapes and conv attrs
+    shuffle: if True, the nodes are shuffled in the graph dict, so that some inbounds refer to later nodes
+    """
+    graph = {}
+    for i in range(num_nodes):
+        inbounds = [f"n{i - 1}"] if i > 0 and rng.random() < chain_prob else []
+        for _ in range(max_branches if i > 2 else 0):
+            if rng.random() < branch_prob:
+                inbounds.append(f"n{rng.randrange(max(0, i - window), i - 1)}")
+        if i > 0 and not inbounds and connected:
+            inbounds.append(f"n{rng.randrange(i)}")
+        if multi_edge_prob:
+            if inbounds and rng.random() < multi_edge_prob:
+                inbounds.append(inbounds[0])
+        else:
+            inbounds = list(dict.fromkeys(inbounds))
+        graph[f"n{i}"] = {"inbounds": inbounds, "attr": {"name": f"n{i}", "type": rng.choice(op_types), "attr": {}}}
+        if with_shapes:
+            shape = [1, rng.choice([7, 14, None]), 7, rng.choice([8, 16])]
+            graph[f"n{i}"]["attr"].update({
+                "attr": {"ks": [3, 3], "strides": [1, 1]} if rng.random() < 0.5 else {},
+                "input_shape": [shape] * max(1, len(inbounds)),
+                "output_shape": [shape] * rng.choice([1, 1, 2]),
+            })
+    if shuffle:
+        names = list(graph)
+        rng.shuffle(names)
+        graph = {name: graph[name] for name in names}
+    return graph
+
+
+def detect(kd, graph, stateful=False):
+    """ return the kernels detected by `KernelDetector.detect`, or by `load_graph` and `get_kernels` if `stateful`,
+    which keep the fused graph in `kd.model_graph`. Return None if the detection fails, e.g., for a fusion that makes a
+    cycle in a random graph, or a basic block of dummy types only which has no kernel to connect to.
+    """
+    try:
+        if stateful:
+            kd.load_graph(graph)
+            return kd.get_kernels()
+        return kd.detect(graph)
+    except Exception:
+        return None
@@ -0,0 +1,55 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Check that `CompactGraph` converts from and to the nn-Meter IR losslessly, and that `KernelDetector` gives the same
+# kernels on it as on `ModelGraph`, on the test models and on random graphs, with both MON rules.
+# Usage: python tests/unit_test/test_compact_graph.py
+import os
+import json
+import glob
+import random
+import tempfile
+from nn_meter.utils.graph_tool import ModelGraph
+from nn_meter.utils.compact_graph import CompactGraph
+from nn_meter.kernel_detector import KernelDetector
+from nn_meter.kernel_detector.utils.ir_tools import convert_nodes
+from graph_helper import random_graph, write_rule_files, detect
+
+
+def check_graph(graph, detectors):
+    model_graph = ModelGraph(graph=convert_nodes(graph))
+    model_graph.refresh()
+    compact_graph = CompactGraph.from_dict(model_graph.get_graph())
+    assert compact_graph.to_dict() == model_graph.get_graph()
+    assert [compact_graph.names[node] for node in compact_graph.get_topological_order()] == \
+        model_graph.get_topological_order()
+
+    num_kernels = 0
+    for kd, compact_kd in detectors:
+        kernels, compact_kernels = detect(kd, graph, stateful=True), detect(compact_kd, graph, stateful=True)
+        assert isinstance(compact_kd.model_graph, CompactGraph)
+        assert compact_kernels == kernels
+        if kernels is not None:
+            # the graphs after fusion should be the same as well
+            assert compact_kd.model_graph.to_dict() == kd.model_graph.get_graph()
+            num_kernels += len(kernels)
+    return num_kernels
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmpdir:
+        detectors = [
+            (KernelDetector(rule_file), KernelDetector(rule_file, compact=True))
+            for rule_file in write_rule_files(tmpdir)
+        ]
+
+    for model_file in glob.glob("material/testmodels/*.json"):
+        with open(model_file, "r") as fp:
+            num_kernels = check_graph(json.load(fp), detectors)
+        print(f"{os.path.basename(model_file)}: {num_kernels} kernels are the same on CompactGraph")
+
+    rng = random.Random(0)
+    num_kernels = 0
+    for _ in range(300):
+        num_kernels += check_graph(random_graph(rng.randint(5, 80), rng), detectors)
+    print(f"random graphs: {num_kernels} kernels are the same on CompactGraph")
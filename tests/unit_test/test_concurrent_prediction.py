@@ -0,0 +1,67 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Test that one loaded predictor could be shared by concurrent threads, i.e., the predictions made from a thread pool
+# are the same as the sequential ones, and that the detected kernels share no containers with the caller's graph.
+# Usage: python tests/unit_test/test_concurrent_prediction.py [<predictor-name>]
+import sys
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from nn_meter import load_latency_predictor
+
+
+def get_container_ids(obj):
+    """ return the ids of all lists and dicts nested in the object
+    """
+    if isinstance(obj, dict):
+        return {id(obj)}.union(*[get_container_ids(value) for value in obj.values()])
+    if isinstance(obj, list):
+        return {id(obj)}.union(*[get_container_ids(value) for value in obj])
+    return set()
+
+
+if __name__ == '__main__':
+    predictor_name = sys.argv[1] if len(sys.argv) > 1 else "cortexA76cpu_tflite21"
+    predictor = load_latency_predictor(predictor_name)
+    with open("material/testmodels/mobilenetv3small_0.json", "r") as fp:
+        graph = json.load(fp)
+
+    # build some variants of the test model with different input resolution of the first conv
+    graphs = []
+    for hw in [224, 192, 160, 128, 96, 64]:
+        variant = json.loads(json.dumps(graph))
+        variant["conv1.conv/Conv2D"]["attr"]["input_shape"] = [[1, hw, hw, 3]]
+        graphs.append(variant)
+    expected_kernels = []
+    for variant in graphs:
+        predictor.kd.load_graph(variant)
+        expected_kernels.append(predictor.kd.get_kernels())
+    expected = [predictor.predict(variant, "nnmeter-ir") for variant in graphs]
+    assert len(set(expected)) > 1
+
+    rng = random.Random(0)
+    tasks = [rng.randrange(len(graphs)) for _ in range(200)]
+    with ThreadPoolExecutor(16) as pool:
+        kernels = list(pool.map(lambda i: predictor.kd.detect(graphs[i]), tasks))
+        results = list(pool.map(lambda i: predictor.predict(graphs[i], "nnmeter-ir"), tasks))
+    for i, kernel, result in zip(tasks, kernels, results):
+        assert kernel == expected_kernels[i]
+        assert result == expected[i], (result, expected[i])
+
+    # the kernels detected from scratch, rebound from a template and updated incrementally never share containers with
+    # the caller's graph, so that modifying them never modifies the graph
+    graph_ids = get_container_ids(graphs[0]) | get_container_ids(graphs[1])
+    predictor.enable_detection_cache()
+    state = predictor.kd.detect_state(graphs[0])
+    state, _ = predictor.kd.update_state(state, replaced={"conv1.conv/Conv2D": graphs[1]["conv1.conv/Conv2D"]})
+    for kernels in [predictor.kd.detect(graphs[0]), predictor.kd.detect(graphs[0]),
+                    [kernel for _, _, kernel in state.blocks.values() if kernel is not None]]:
+        assert not graph_ids & get_container_ids(kernels)
+    predictor.disable_detection_cache()
+
+    predictor.enable_kernel_cache()
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(lambda i: predictor.predict(graphs[i], "nnmeter-ir"), tasks))
+    assert results == [expected[i] for i in tasks]
+    print("test concurrent prediction: pass")
@@ -0,0 +1,139 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Check that the structural fingerprint of torch models ignores the weights while it distinguishes the architectures,
+# hyperparameters, connectivity, input shapes, converters and package versions, that the torch conversion cache returns
+# the same graphs from memory and from disk, that the files on disk are bounded, and that the models not traceable by
+# `torch.fx` are converted without the cache.
+# Usage: python tests/unit_test/test_conversion_cache.py
+import os
+import time
+import tempfile
+from unittest import mock
+import torch
+import torch.nn as nn
+import torchvision.models as models
+from nn_meter.ir_converter.utils import torch_model_to_graph
+from nn_meter.ir_converter.torch_converter import TorchConversionCache, fingerprint_torch_model
+from nn_meter.ir_converter.torch_converter import conversion_cache
+
+
+class Block(nn.Module):
+    def __init__(self, skip, stride=1):
+        super().__init__()
+        self.conv1 = nn.Conv2d(16, 16, 3, stride, 1)
+        self.conv2 = nn.Conv2d(16, 16, 3, 1, 1)
+        self.relu = nn.ReLU()
+        self._skip = skip  # not a hyperparameter, while it changes the connectivity
+
+    def forward(self, x):
+        y = self.conv2(self.relu(self.conv1(x)))
+        return self.relu(y + x) if self._skip else self.relu(y)
+
+
+class CastBlock(Block):
+    def __init__(self, dtype):
+        super().__init__(False)
+        self.dtype = dtype
+
+    def forward(self, x):
+        return super().forward(x).to(self.dtype)
+
+
+class DynamicBlock(Block):
+    def forward(self, x):
+        # the control flow on the values of the input could not be traced by `torch.fx`
+        return super().forward(x) if x.sum() > 0 else x
+
+
+if __name__ == '__main__':
+    input_shape = (1, 16, 32, 32)
+    fingerprint = fingerprint_torch_model(Block(True), input_shape, "fx")
+    assert fingerprint_torch_model(Block(True), input_shape, "fx") == fingerprint
+    model = Block(True)
+    with torch.no_grad():
+        for param in model.parameters():
+            param.mul_(2)
+    assert fingerprint_torch_model(model, input_shape, "fx") == fingerprint
+    for other in [
+        fingerprint_torch_model(Block(False), input_shape, "fx"),
+        fingerprint_torch_model(Block(True, stride=2), input_shape, "fx"),
+        fingerprint_torch_model(Block(True), (1, 16, 64, 64), "fx"),
+        fingerprint_torch_model(Block(True), input_shape, "onnx"),
+    ]:
+        assert other != fingerprint
+    assert fingerprint_torch_model(models.resnet18(), (1, 3, 224, 224), "fx") == \
+        fingerprint_torch_model(models.resnet18(), (1, 3, 224, 224), "fx")
+    assert fingerprint_torch_model(models.resnet18(), (1, 3, 224, 224), "fx") != \
+        fingerprint_torch_model(models.resnet34(), (1, 3, 224, 224), "fx")
+
+    # the versions of the packages of the converter are fingerprinted
+    assert set(conversion_cache._get_package_versions("onnx")) == {"nn_meter", "torch", "onnx", "onnxsim"}
+    assert set(conversion_cache._get_package_versions("fx")) == {"nn_meter", "torch"}
+    get_package_versions = conversion_cache._get_package_versions
+    conversion_cache._get_package_versions = lambda converter: {**get_package_versions(converter), "onnx": "0.0.0"}
+    assert fingerprint_torch_model(Block(True), input_shape, "fx") != fingerprint
+    conversion_cache._get_package_versions = get_package_versions
+
+    # the dtypes in the traced arguments are fingerprinted by their names
+    assert fingerprint_torch_model(CastBlock(torch.float16), input_shape, "fx") != \
+        fingerprint_torch_model(CastBlock(torch.float32), input_shape, "fx")
+    try:
+        fingerprint_torch_model(DynamicBlock(True), input_shape, "fx")
+        assert False, "the model not traceable by torch.fx should not be fingerprinted"
+    except Exception:
+        pass
+    print("test fingerprint of torch models: pass")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for model_name in ["resnet18", "mobilenet_v2", "shufflenet_v2_x1_0"]:
+            model = getattr(models, model_name)()
+            since = time.time()
+            expected = torch_model_to_graph(model, converter="fx")
+            uncached_time = time.time() - since
+
+            cache = TorchConversionCache(folder=tmpdir)
+            assert torch_model_to_graph(model, converter="fx", cache=cache) == expected
+            model = getattr(models, model_name)()  # new weights of the same architecture
+            since = time.time()
+            graph = torch_model_to_graph(model, converter="fx", cache=cache)
+            cached_time = time.time() - since
+            assert graph == expected
+            graph.clear()  # the cached graph is not modified by the caller
+            assert torch_model_to_graph(model, converter="fx", cache=cache) == expected
+
+            cache = TorchConversionCache(folder=tmpdir)
+            assert torch_model_to_graph(model, converter="fx", cache=cache) == expected
+            assert cache.stats()["disk_hits"] == 1
+            print(f"test conversion cache of {model_name}: pass, uncached {uncached_time:.3f} s, "
+                  f"cached {cached_time:.3f} s")
+
+    # the model not traceable by torch.fx is converted without the cache. The conversion itself is mocked, since the
+    # exporters of some torch versions could not export the data-dependent control flow either
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = TorchConversionCache(folder=tmpdir)
+        expected = {"n0": {"inbounds": [], "attr": {"name": "n0", "type": "conv"}}}
+        with mock.patch("nn_meter.ir_converter.utils._convert_torch_model", return_value=expected) as convert:
+            model = DynamicBlock(True)
+            assert torch_model_to_graph(model, input_shape, converter="onnx", cache=cache) == expected
+            convert.assert_called_once_with(model, input_shape, "onnx")
+        assert len(cache) == 0 and not os.listdir(tmpdir)
+        print("test conversion cache of an untraceable model: pass")
+
+    # the files least recently stored or loaded are removed beyond the disk capacity
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = TorchConversionCache(folder=tmpdir, disk_capacity=2)
+        graphs = [{"n0": {"inbounds": [], "attr": {"name": "n0", "type": op_type}}}
+                  for op_type in ["conv", "relu", "add"]]
+        cache.put("a", graphs[0])
+        time.sleep(0.01)
+        cache.put("b", graphs[1])
+        time.sleep(0.01)
+        cache.clear()
+        assert cache.get("a") == graphs[0]  # a is loaded from disk, so that b is the least recently used
+        time.sleep(0.01)
+        cache.put("c", graphs[2])
+        assert sorted(os.listdir(tmpdir)) == ["a.json", "c.json"]
+        cache.clear(disk=True)
+        assert not os.listdir(tmpdir) and cache.get("a") is None
+        print("test disk capacity of conversion cache: pass")
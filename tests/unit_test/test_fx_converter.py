@@ -0,0 +1,140 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Test the op mapping of the fx-based torch converter on a small module and on mobilenet_v3_small, and that the kernels
+# detected from the torchvision models converted by the fx-based torch converter, and the latencies predicted from them,
+# are the same as the ones by the Onnx-based torch converter. mobilenet_v3_small is not compared with the Onnx-based
+# torch converter, which does not map the HardSwish op exported by onnx opset 14 and later. The comparison is skipped if
+# the model could not be converted by the Onnx-based torch converter with the installed torch and onnx.
+# Usage: python tests/unit_test/test_fx_converter.py [<predictor-name>]
+import sys
+import json
+import logging
+from collections import Counter
+import torch
+import torch.nn as nn
+import torchvision
+from nn_meter import load_latency_predictor
+from nn_meter.ir_converter.utils import torch_model_to_graph
+from nn_meter.predictor.prediction.utils import get_kernel_name
+
+TORCHVISION_MODELS = {
+    # channel shuffle, and the chunk of the tensor into two branches
+    "shufflenet_v2_x0_5": torchvision.models.shufflenet_v2_x0_5,
+    "resnet18": torchvision.models.resnet18,
+    # adaptive average pooling to 6x6
+    "alexnet": torchvision.models.alexnet,
+    "squeezenet1_0": torchvision.models.squeezenet1_0,
+}
+
+
+class Block(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.conv = nn.Conv2d(3, 16, 3, 2, 1)
+        self.bn = nn.BatchNorm2d(16)
+        self.relu6 = nn.ReLU6()
+        self.dwconv = nn.Conv2d(8, 8, 3, 1, 1, groups=8)
+        self.hswish = nn.Hardswish()
+        self.pool = nn.AdaptiveAvgPool2d((2, 2))
+        self.dropout = nn.Dropout()
+        self.fc = nn.Linear(72 * 4, 10)
+
+    def forward(self, x):
+        x = self.relu6(self.bn(self.conv(x)))
+        a, b = x.chunk(2, dim=1)
+        x = torch.cat([a, self.hswish(self.dwconv(b))], dim=1)
+        n, c, h, w = x.shape
+        x = x.view(n, 2, c // 2, h, w).transpose(1, 2).contiguous().view(n, c, h, w)
+        y = x[:, :8]
+        x = torch.cat([torch.cat([x, y], 1), torch.cat([y, x, y, x], 1)], 1)
+        x = self.dropout(self.pool(x))
+        return self.fc(torch.flatten(x, 1))
+
+
+def get_kernel_items(kernels):
+    """ return the sorted kernels as the predictor sees them, i.e., with the kernel names merged by `get_kernel_name`
+    and the first input tensor only, and without the names, the connections and the split dims, which differ between
+    the converters. The onnx graph keeps the weights and the slicing parameters as extra input tensors.
+    """
+    items = []
+    for kernel in kernels:
+        item = {key: value for key, value in kernel.items()
+                if key not in ["name", "inbounds", "outbounds", "split_dim"]}
+        item.update(op=get_kernel_name(kernel["op"]), input_tensors=kernel["input_tensors"][:1])
+        items.append(json.dumps(item, sort_keys=True))
+    return sorted(items)
+
+
+def test_op_mapping():
+    graph = torch_model_to_graph(Block(), (1, 3, 32, 32), converter="fx")
+    types = {name: node["attr"]["type"] for name, node in graph.items()}
+
+    # relu6 is predicted as relu, and hardswish as hswish
+    assert types["relu6"] == "relu" and types["hswish"] == "hswish"
+
+    # the getitem of the chunk outputs is passed through, so that the consumers take the split as their inbound, while
+    # the slicing of a tensor is a split
+    assert types["chunk"] == "split"
+    assert graph["chunk"]["attr"]["output_shape"] == [[1, 16, 16, 8], [1, 16, 16, 8]]
+    assert graph["dwconv"]["inbounds"] == ["chunk"] and graph["cat"]["inbounds"] == ["chunk", "hswish"]
+    slices = [name for name in graph if name.startswith("getitem")]
+    assert len(slices) == 1 and types[slices[0]] == "split"
+    assert graph[slices[0]]["attr"]["output_shape"] == [[1, 16, 16, 8]]
+
+    # the channel shuffle is kept as reshape and transpose
+    assert [types[name] for name in ["view", "transpose", "view_1"]] == ["reshape", "transpose", "reshape"]
+
+    # the nested concats on the same axis are merged into one concat
+    concats = [name for name, op_type in types.items() if op_type == "concat" and name != "cat"]
+    assert len(concats) == 1
+    assert [graph[name]["attr"]["output_shape"][0][-1] for name in graph[concats[0]]["inbounds"]] == \
+        [16, 8, 8, 16, 8, 16]
+    assert graph[concats[0]]["attr"]["output_shape"] == [[1, 16, 16, 72]]
+
+    # the adaptive average pooling to a non-1x1 output is an avgpool, and the dropout is passed through
+    assert types["pool"] == "avgpool"
+    assert graph["pool"]["attr"]["attr"] == {"ks": [8, 8], "strides": [8, 8]}
+    assert "dropout" not in graph and graph["flatten"]["inbounds"] == ["pool"]
+    assert types["flatten"] == "reshape" and types["fc"] == "fc"
+    print("test fx converter op mapping: pass")
+
+
+def test_mobilenet_v3(predictor):
+    graph = torch_model_to_graph(torchvision.models.mobilenet_v3_small(), converter="fx")
+    types = Counter(node["attr"]["type"] for node in graph.values())
+    assert types["hswish"] == 19 and types["hardsigmoid"] == 9 and types["relu"] == 14
+    assert "dropout" not in types and "linear" not in types and types["fc"] == 2
+
+    # each hswish is predicted either in a fused kernel or alone, and each squeeze-and-excitation block is one kernel
+    kernels = predictor.kd.detect(graph)
+    assert sum(kernel["op"].split("-").count("hswish") for kernel in kernels) == 19
+    assert sum(kernel["op"] == "se" for kernel in kernels) == 9
+    assert predictor.predict(graph, "nnmeter-ir") > 0
+    print("test fx converter on mobilenet_v3_small: pass")
+
+
+def test_torchvision_models(predictor):
+    for model_name, model_fn in TORCHVISION_MODELS.items():
+        model = model_fn()
+        graphs = {"fx": torch_model_to_graph(model, converter="fx")}
+        try:
+            graphs["onnx"] = torch_model_to_graph(model, converter="onnx")
+        except Exception as e:
+            # only the comparison is skipped, while the fx-based conversion above has succeeded
+            print(f"test fx converter on {model_name}: skip the comparison, the onnx conversion failed ({e})")
+            continue
+        kernels = {converter: predictor.kd.detect(graph) for converter, graph in graphs.items()}
+        assert get_kernel_items(kernels["fx"]) == get_kernel_items(kernels["onnx"]), model_name
+        latency = {converter: predictor.predict(graph, "nnmeter-ir") for converter, graph in graphs.items()}
+        assert abs(latency["fx"] - latency["onnx"]) < 1e-6 * latency["onnx"], (model_name, latency)
+        print(f"test fx converter on {model_name}: pass")
+
+
+if __name__ == '__main__':
+    logging.getLogger("nn-Meter").setLevel(logging.ERROR)
+    test_op_mapping()
+    predictor_name = sys.argv[1] if len(sys.argv) > 1 else "cortexA76cpu_tflite21"
+    predictor = load_latency_predictor(predictor_name)
+    test_mobilenet_v3(predictor)
+    test_torchvision_models(predictor)
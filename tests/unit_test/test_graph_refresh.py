@@ -0,0 +1,80 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Check that `ModelGraph.refresh` gives the same graphs as the previous multi-pass implementation, on the test models
+# and on random graphs with missing inbounds, duplicated inbounds and isolated nodes.
+# Usage: python tests/unit_test/test_graph_refresh.py
+import copy
+import glob
+import json
+import random
+from nn_meter.utils.graph_tool import ModelGraph
+from graph_helper import random_graph
+
+
+def legacy_refresh(graph):
+    """ the previous implementation of `ModelGraph.refresh`
+    """
+    if len(graph) <= 1:
+        return
+
+    last_remove_nodes_cnt = -1
+    while True:
+        for name in graph.keys():
+            graph[name]["outbounds"] = []
+
+        for name in graph.keys():
+            if "inbounds" in graph[name].keys():
+                for node in graph[name]["inbounds"]:
+                    if node not in graph.keys():
+                        while node in graph[name]["inbounds"]:
+                            graph[name]["inbounds"].remove(node)
+                    else:
+                        if "outbounds" not in graph[node].keys():
+                            graph[node]["outbounds"] = []
+
+                        graph[node]["outbounds"].append(name)
+
+        spare_nodes = []
+        for name in graph.keys():
+            if len(graph[name]["outbounds"]) == 0 and len(graph[name]["inbounds"]) == 0:
+                spare_nodes.append(name)
+
+        if last_remove_nodes_cnt == 0 and len(spare_nodes) == 0:
+            break
+
+        last_remove_nodes_cnt = len(spare_nodes)
+        for removing_node_name in spare_nodes:
+            del graph[removing_node_name]
+
+
+def random_graph_with_missing_inbounds(num_nodes, rng):
+    """ return a random graph, in which some inbounds refer to missing nodes and some outbounds are stale
+    """
+    graph = random_graph(num_nodes, rng, ["conv"], chain_prob=0.6, branch_prob=0.4, max_branches=3, window=8,
+                         multi_edge_prob=0.1, connected=False, with_shapes=False)
+    missing = [f"m{i}" for i in range(rng.randint(1, 5))]
+    for node in graph.values():
+        node["inbounds"] = [rng.choice(missing) if rng.random() < 0.3 else inbound for inbound in node["inbounds"]]
+        if rng.random() < 0.1:
+            node["outbounds"] = ["stale"]
+    return graph
+
+
+def check_graph(graph):
+    expected = copy.deepcopy(graph)
+    legacy_refresh(expected)
+    model_graph = ModelGraph(graph=graph)
+    model_graph.refresh()
+    assert list(model_graph.get_graph().items()) == list(expected.items())
+
+
+if __name__ == '__main__':
+    for model_file in glob.glob("material/testmodels/*.json"):
+        with open(model_file, "r") as fp:
+            check_graph(json.load(fp))
+
+    rng = random.Random(0)
+    for _ in range(3000):
+        check_graph(random_graph_with_missing_inbounds(rng.randint(1, 40), rng))
+    print("refreshed graphs are the same as the previous implementation")
@@ -0,0 +1,122 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Check that the incremental prediction of edited graphs gives the same kernels and latency as the full prediction, on
+# random mutations of the test model and of random graphs, with both MON rules.
+# Usage: python tests/unit_test/test_incremental_prediction.py [<predictor-name>]
+import sys
+import json
+import time
+import random
+import tempfile
+from nn_meter import load_latency_predictor
+from nn_meter.kernel_detector import KernelDetector
+from graph_helper import OP_TYPES, random_graph, write_rule_files, detect
+
+
+def mutate(graph, rng, groups, inserted_types):
+    """ return a random node-level diff of (replaced, added, removed) of the graph, and the edited graph with the added
+    nodes appended. The type of a node is changed to another one in its group of types.
+    """
+    types = {type: group for group in groups for type in group}
+    names = [name for name, node in graph.items() if node["attr"]["type"] in types]
+    consumers = {}
+    for name, node in graph.items():
+        for inbound in node.get("inbounds", []):
+            consumers.setdefault(inbound, []).append(name)
+    name = rng.choice(names)
+    node = json.loads(json.dumps(graph[name]))
+    replaced, added, removed = {}, {}, []
+    action = rng.choice(["type", "shape", "insert", "remove"])
+    if action == "type":
+        node["attr"]["type"] = rng.choice(types[node["attr"]["type"]])
+        replaced[name] = node
+    elif action == "shape":
+        for key in ["input_shape", "output_shape"]:
+            node["attr"][key] = [shape[:-1] + [shape[-1] * 2] if shape else shape for shape in node["attr"][key]]
+        replaced[name] = node
+    elif action == "insert" or not node["inbounds"] or node["inbounds"][0] not in graph:
+        # insert a node between the node and its consumers
+        new_name = f"{name}/inserted{rng.randrange(10 ** 9)}"
+        shape = node["attr"]["output_shape"]
+        added[new_name] = {
+            "inbounds": [name],
+            "attr": {"name": new_name, "type": rng.choice(inserted_types), "attr": {},
+                     "input_shape": shape, "output_shape": shape},
+        }
+        for consumer in consumers.get(name, []):
+            replaced[consumer] = json.loads(json.dumps(graph[consumer]))
+            replaced[consumer]["inbounds"] = [
+                new_name if inbound == name else inbound for inbound in graph[consumer]["inbounds"]
+            ]
+    else:
+        # remove the node, and connect its consumers to its first inbound
+        removed.append(name)
+        for consumer in consumers.get(name, []):
+            replaced[consumer] = json.loads(json.dumps(graph[consumer]))
+            replaced[consumer]["inbounds"] = [
+                node["inbounds"][0] if inbound == name else inbound for inbound in graph[consumer]["inbounds"]
+            ]
+    child = {name: replaced.get(name, node) for name, node in graph.items() if name not in removed}
+    child.update(added)
+    return (replaced, added, removed), child
+
+
+def get_kernel_items(kernels):
+    return sorted(
+        json.dumps({key: value for key, value in kernel.items() if key not in ["name", "inbounds", "outbounds"]},
+                   sort_keys=True)
+        for kernel in kernels
+    )
+
+
+if __name__ == '__main__':
+    predictor_name = sys.argv[1] if len(sys.argv) > 1 else "cortexA76cpu_tflite21"
+    predictor = load_latency_predictor(predictor_name)
+    with open("material/testmodels/mobilenetv3small_0.json", "r") as fp:
+        graph = json.load(fp)
+    rng = random.Random(0)
+
+    handle = predictor.predict_handle(graph, "nnmeter-ir")
+    assert handle.latency == predictor.predict(graph, "nnmeter-ir")
+    assert get_kernel_items(handle.get_kernels()) == get_kernel_items(predictor.kd.detect(graph))
+
+    groups = [["Conv2D", "DepthwiseConv2dNative"], ["FusedBatchNorm", "Relu", "Relu6"]]
+    inserted_types = ["FusedBatchNorm", "Relu", "Relu6"]
+    incremental_time = full_time = 0
+    for _ in range(100):
+        # a chain of mutations from the handle, each child predicted from its parent
+        child_handle, child = handle, graph
+        for _ in range(rng.randint(1, 3)):
+            diff, child = mutate(child, rng, groups, inserted_types)
+            since = time.time()
+            child_handle = predictor.predict_incremental(child_handle, *diff)
+            incremental_time += time.time() - since
+            since = time.time()
+            expected = predictor.predict(child, "nnmeter-ir")
+            full_time += time.time() - since
+            assert abs(child_handle.latency - expected) <= 1e-9 * abs(expected), (child_handle.latency, expected)
+            assert get_kernel_items(child_handle.get_kernels()) == get_kernel_items(predictor.kd.detect(child))
+        assert child_handle.graph == child
+    print(f"test incremental prediction on the test model: pass, incremental {incremental_time:.3f} s, "
+          f"full {full_time:.3f} s")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for mon, rule_file in enumerate(write_rule_files(tmpdir)):
+            kd = KernelDetector(rule_file)
+            num_checked = 0
+            for _ in range(300):
+                graph = random_graph(rng.randint(2, 100), rng)
+                if detect(kd, graph) is None:
+                    continue
+                state = kd.detect_state(graph)
+                for _ in range(rng.randint(1, 5)):
+                    diff, graph = mutate(graph, rng, [OP_TYPES], OP_TYPES)
+                    kernels = detect(kd, graph)
+                    if kernels is None:
+                        break
+                    expected = get_kernel_items(kernels)
+                    state, _ = kd.update_state(state, *diff)
+                    assert get_kernel_items(state.get_kernels()) == expected
+                    num_checked += 1
+            print(f"MON={mon} random graphs: {num_checked} edited graphs give the same kernels")
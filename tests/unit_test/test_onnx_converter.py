@@ -0,0 +1,157 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Check that `OnnxConverter` gives the same nn-Meter IR graphs as the previous implementation, on synthetic models of
+# channel-split blocks with Slice and Split ops, and on the conv models of test_onnx_loading.
+# Usage: python tests/unit_test/test_onnx_converter.py
+import random
+import numpy as np
+from onnx import helper, numpy_helper, TensorProto
+from nn_meter.ir_converter.onnx_converter import OnnxConverter
+from nn_meter.ir_converter.onnx_converter.constants import SLICE_TYPE
+from test_onnx_loading import build_onnx_model
+
+
+class LegacyOnnxConverter(OnnxConverter):
+    """ the previous implementation of `OnnxConverter.fetch_attrs` and `OnnxConverter.convert`
+    """
+    def fetch_attrs(self, node):
+        from onnx import AttributeProto
+        attrs = {}
+        input_tensors = []
+        for input_name in node.input:
+            if input_name in self.tensors:
+                input_tensors.append(self.tensors[input_name]["shape"])
+        output_tensors = []
+        for output_name in node.output:
+            if output_name in self.tensors:
+                output_tensors.append(self.tensors[output_name]["shape"])
+        if node.op_type == SLICE_TYPE:
+            for tensor_name in self._get_sibling_slice_output_tensors(node):
+                output_tensors.append(self.tensors[tensor_name]["shape"])
+        if (
+            len(input_tensors) == 0
+            or len(input_tensors[0]) <= 1
+            or len(output_tensors) == 0
+            or len(output_tensors[0]) <= 1
+        ):
+            return attrs
+
+        attrs["attr"] = {}
+        attrs["type"] = node.op_type
+        attrs["input_shape"] = input_tensors
+        attrs["output_shape"] = output_tensors
+        for attr in node.attribute:
+            if attr.type == AttributeProto.FLOAT:
+                attrs["attr"][attr.name] = attr.f
+            elif attr.type == AttributeProto.INT:
+                attrs["attr"][attr.name] = attr.i
+            elif attr.type == AttributeProto.INTS:
+                attrs["attr"][attr.name] = list(attr.ints)
+            elif attr.type == AttributeProto.STRING:
+                attrs["attr"][attr.name] = str(attr.s)
+
+        return attrs
+
+    def convert(self):
+        result = {}
+
+        sliced_tensors = set()
+        selected_slice = set()
+        for node in self.graph.node:
+            if node.op_type == SLICE_TYPE:
+                tensor = node.input[0]
+                if tensor in sliced_tensors:
+                    continue
+                else:
+                    sliced_tensors.add(tensor)
+                    selected_slice.add(node.name)
+
+        for node in self.graph.node:
+            outbounds = []
+            inbounds = []
+            if node.op_type == SLICE_TYPE and node.name not in selected_slice:
+                continue
+
+            for input_name in node.input:
+                if input_name in self.tensors:
+                    for pred_pred in self.tensors[input_name]['inputs']:
+                        inbounds.append(pred_pred.name)
+            for output_name in node.output:
+                if output_name in self.tensors:
+                    for succ_succ in self.tensors[output_name]['outputs']:
+                        outbounds.append(succ_succ.name)
+                if node.op_type == SLICE_TYPE:
+                    for tensor_name in self._get_sibling_slice_output_tensors(node):
+                        outbounds.append(tensor_name)
+                result[node.name] = {
+                    "attr": self.fetch_attrs(node),
+                    "outbounds": outbounds,
+                    "inbounds": inbounds,
+                }
+
+        return result
+
+    def _get_sibling_slice_output_tensors(self, node):
+        output_tensors = []
+        for slice in self.tensors[node.input[0]]["outputs"]:
+            if slice.name != node.name and slice.op_type == SLICE_TYPE:
+                for output_name in slice.output:
+                    if output_name in self.tensors:
+                        output_tensors.append(output_name)
+
+        return output_tensors
+
+
+def build_slice_model(num_blocks, num_groups, channels=None, hw=4, seed=0):
+    """ return a synthetic onnx model of channel-split blocks. Each block splits its input into `num_groups` groups, by
+    a Split op or by `num_groups` Slice ops of the same tensor, applies a Relu to some of the groups, and concats the
+    groups back. The Slice ops share the initializer of their axes.
+    """
+    rng = random.Random(seed)
+    channels = channels or num_groups
+    bounds = [0] + sorted(rng.sample(range(1, channels), num_groups - 1)) + [channels]
+    nodes, initializers = [], []
+
+    def add_initializer(name, values):
+        initializers.append(numpy_helper.from_array(np.array(values, np.int64), name))
+        return name
+
+    axes = add_initializer("axes", [1])
+    tensor = "input"
+    for i in range(num_blocks):
+        if i % 2:
+            groups = [f"split{i}.out{j}" for j in range(num_groups)]
+            split = add_initializer(f"split{i}.split", [end - start for start, end in zip(bounds, bounds[1:])])
+            nodes.append(helper.make_node("Split", [tensor, split], groups, name=f"split{i}", axis=1))
+        else:
+            groups = []
+            for j, (start, end) in enumerate(zip(bounds, bounds[1:])):
+                name = f"slice{i}_{j}"
+                starts, ends = add_initializer(f"{name}.starts", [start]), add_initializer(f"{name}.ends", [end])
+                nodes.append(helper.make_node("Slice", [tensor, starts, ends, axes], [f"{name}.out"], name=name))
+                groups.append(f"{name}.out")
+        for j, group in enumerate(groups):
+            if rng.random() < 0.5:
+                nodes.append(helper.make_node("Relu", [group], [f"relu{i}_{j}.out"], name=f"relu{i}_{j}"))
+                groups[j] = f"relu{i}_{j}.out"
+        nodes.append(helper.make_node("Concat", groups, [f"concat{i}.out"], name=f"concat{i}", axis=1))
+        tensor = f"concat{i}.out"
+    nodes.append(helper.make_node("Relu", [tensor], ["output"], name="output"))
+
+    graph = helper.make_graph(
+        nodes, "slices", [helper.make_tensor_value_info("input", TensorProto.FLOAT, [1, channels, hw, hw])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, [1, channels, hw, hw])], initializers,
+    )
+    return helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+
+
+if __name__ == '__main__':
+    models = [build_slice_model(num_blocks, num_groups, seed=seed)
+              for num_blocks, num_groups in [(1, 2), (2, 3), (4, 8), (6, 32)] for seed in range(3)]
+    models.append(build_onnx_model(4, channels=8, hw=8))
+    for model in models:
+        graph = OnnxConverter(model).convert()
+        expected = LegacyOnnxConverter(model).convert()
+        assert list(graph.items()) == list(expected.items())
+    print(f"test onnx converter: pass, {len(models)} models give the same graphs")
@@ -0,0 +1,102 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Check that the onnx models loaded without weights are converted to the same nn-Meter IR graphs as the fully loaded
+# models, for models with the weights embedded and in external data, and that the loading falls back to `onnx.load` for
+# files which could not be parsed without weights.
+# Usage: python tests/unit_test/test_onnx_loading.py
+import os
+import tempfile
+import numpy as np
+import onnx
+from onnx import helper, numpy_helper, TensorProto
+from nn_meter.ir_converter import model_file_to_graph
+from nn_meter.ir_converter.utils import onnx_model_to_graph
+from nn_meter.ir_converter.onnx_converter.utils import load_model_without_weights
+
+
+def build_onnx_model(num_blocks, channels=64, hw=56, seed=0):
+    """ return a synthetic onnx model of conv-bn-relu blocks with residual adds, followed by a reshape and a gemm, whose
+    weights are random float32 initializers
+    """
+    rng = np.random.default_rng(seed)
+    nodes, initializers = [], []
+
+    def add_initializer(name, array):
+        initializers.append(numpy_helper.from_array(array, name))
+        return name
+
+    tensor = "input"
+    for i in range(num_blocks):
+        conv = f"conv{i}"
+        nodes.append(helper.make_node(
+            "Conv", [tensor, add_initializer(f"{conv}.weight", rng.random((channels, channels, 3, 3), np.float32))],
+            [f"{conv}.out"], name=conv, kernel_shape=[3, 3], pads=[1, 1, 1, 1], strides=[1, 1],
+        ))
+        bn_params = [add_initializer(f"bn{i}.{param}", rng.random(channels, np.float32))
+                     for param in ["scale", "bias", "mean", "var"]]
+        nodes.append(helper.make_node("BatchNormalization", [f"{conv}.out"] + bn_params, [f"bn{i}.out"], name=f"bn{i}"))
+        nodes.append(helper.make_node("Relu", [f"bn{i}.out"], [f"relu{i}.out"], name=f"relu{i}"))
+        if i % 2:
+            nodes.append(helper.make_node("Add", [f"relu{i}.out", tensor], [f"add{i}.out"], name=f"add{i}"))
+            tensor = f"add{i}.out"
+        else:
+            tensor = f"relu{i}.out"
+    nodes.append(helper.make_node("GlobalAveragePool", [tensor], ["gap.out"], name="gap"))
+    shape = add_initializer("reshape.shape", np.array([1, channels], np.int64))
+    nodes.append(helper.make_node("Reshape", ["gap.out", shape], ["reshape.out"], name="reshape"))
+    weight = add_initializer("fc.weight", rng.random((1000, channels), np.float32))
+    nodes.append(helper.make_node("Gemm", ["reshape.out", weight], ["output"], name="fc", transB=1))
+
+    graph = helper.make_graph(
+        nodes, "synthetic", [helper.make_tensor_value_info("input", TensorProto.FLOAT, [1, channels, hw, hw])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, [1, 1000])], initializers,
+    )
+    return helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+
+
+def save_onnx_model(model, filename, external_data=False):
+    if external_data:
+        onnx.save_model(model, filename, save_as_external_data=True, location=os.path.basename(filename) + ".data")
+    else:
+        onnx.save_model(model, filename)
+
+
+if __name__ == '__main__':
+    model = build_onnx_model(8)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for external_data in [False, True]:
+            filename = os.path.join(tmpdir, f"model_{external_data}.onnx")
+            save_onnx_model(model, filename, external_data)
+            expected = onnx_model_to_graph(onnx.load(filename))
+            assert model_file_to_graph(filename, "onnx") == expected
+            assert model_file_to_graph(filename, "onnx", load_weights=False) == expected
+
+            # the weights are larger than the max payload size, so that their data are skipped
+            weights = [tensor for tensor in model.graph.initializer if tensor.name.endswith(".weight")]
+            assert weights and all(np.prod(tensor.dims) * 4 > 1024 for tensor in weights)
+            stripped = load_model_without_weights(filename, max_payload_size=1024)
+            weights = [tensor for tensor in stripped.graph.initializer if tensor.name.endswith(".weight")]
+            assert weights and all(len(tensor.dims) > 0 and not tensor.raw_data for tensor in weights)
+            shape = next(tensor for tensor in stripped.graph.initializer if tensor.name == "reshape.shape")
+            assert numpy_helper.to_array(shape).tolist() == [1, 64]
+            if not external_data:
+                assert stripped.ByteSize() < os.path.getsize(filename) // 100
+            print(f"test onnx loading without weights, external_data={external_data}: pass")
+
+        # an unknown field of the deprecated group wire type, which is skipped by `onnx.load` but not supported by the
+        # parser of `load_model_without_weights`
+        filename = os.path.join(tmpdir, "model_group.onnx")
+        with open(filename, "wb") as fp:
+            # keys of field 99 with the wire types of start group (3) and end group (4), in two-byte varints
+            start_group, end_group = 99 << 3 | 3, 99 << 3 | 4
+            fp.write(model.SerializeToString() + bytes([start_group & 0x7f | 0x80, start_group >> 7])
+                     + bytes([end_group & 0x7f | 0x80, end_group >> 7]))
+        expected = onnx_model_to_graph(onnx.load(filename))
+        try:
+            load_model_without_weights(filename)
+            assert False, "the group wire type should not be supported"
+        except ValueError:
+            pass
+        assert model_file_to_graph(filename, "onnx", load_weights=False) == expected
+        print("test onnx loading without weights, fallback to onnx.load: pass")
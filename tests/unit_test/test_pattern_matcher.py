@@ -0,0 +1,75 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Check that `PatternMatcher` finds the same subgraphs as VF2 (`ModelGraph.find_subgraphs`) for all fusion units, on the
+# test models and on random graphs, and that the adjacency view of `ModelGraph` is kept up to date across fusions.
+# Usage: python tests/unit_test/test_pattern_matcher.py
+import os
+import json
+import glob
+import random
+import tempfile
+from nn_meter.utils.graph_tool import ModelGraph, _AdjacencyView
+from nn_meter.kernel_detector.rule_reader import RuleReader
+from nn_meter.kernel_detector.utils.ir_tools import convert_nodes
+from nn_meter.kernel_detector.utils.match_helper import MatchHelper
+from nn_meter.kernel_detector.utils.pattern_matcher import PatternMatcher
+from graph_helper import make_fusion_rules, write_rule_files, random_graph
+
+
+FUSION_RULES = make_fusion_rules([
+    ("conv", "bn"), ("conv", "bn", "relu"), ("dwconv", "bn", "relu"), ("add", "relu"), ("relu", "relu", "relu")
+])
+OP_TYPES = ["conv", "dwconv", "bn", "relu", "add", "mul", "div", "gap", "avgpool", "BiasAdd", "hardsigmoid", "reshape",
+            "transpose", "dummy"]
+
+
+def canonical(matches):
+    return sorted(tuple(match.items()) for match in matches)
+
+
+def check_graph(model_graph, rule_reader):
+    """ fuse the graph unit by unit as `RuleSplitter.fuse_multiop_blocks` does, and compare the matches before each step
+    """
+    num_matches = 0
+    for type, blocks in rule_reader.fusion_units.items():
+        for block in blocks:
+            expected = model_graph.find_subgraphs(block, MatchHelper.op_type_matcher)
+            matches = PatternMatcher(block).find(model_graph)
+            assert canonical(matches) == canonical(expected), f"Mismatched subgraphs of fusion unit {type}"
+            num_matches += len(matches)
+            for subgraph in expected:
+                model_graph.fuse(subgraph.keys(), type)
+
+            # the adjacency view maintained across fusions should be the same as a rebuilt one
+            adjacency = model_graph.get_adjacency()
+            rebuilt = _AdjacencyView(model_graph.get_graph())
+            assert adjacency.preds == rebuilt.preds and adjacency.types == rebuilt.types
+            assert {name: adjacency.get_succs(name) for name in adjacency.succs} == \
+                {name: rebuilt.get_succs(name) for name in rebuilt.succs}
+            assert {t: list(names) for t, names in adjacency.by_type.items() if names} == \
+                {t: list(names) for t, names in rebuilt.by_type.items()}
+    return num_matches
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmpdir:
+        rule_reader = RuleReader(write_rule_files(tmpdir, FUSION_RULES, mons=[None])[0])
+
+    for model_file in glob.glob("material/testmodels/*.json"):
+        with open(model_file, "r") as fp:
+            model_graph = ModelGraph(graph=convert_nodes(json.load(fp)))
+        model_graph.refresh()
+        num_matches = check_graph(model_graph, rule_reader)
+        print(f"{os.path.basename(model_file)}: {num_matches} matches are the same as VF2")
+
+    rng = random.Random(0)
+    num_matches = 0
+    for _ in range(300):
+        # mostly chains, with some branches, residual connections and multi-edges
+        graph = random_graph(rng.randint(5, 80), rng, OP_TYPES, branch_prob=0.2, multi_edge_prob=0.05,
+                             with_shapes=False, shuffle=False)
+        model_graph = ModelGraph(graph=graph)
+        model_graph.refresh()
+        num_matches += check_graph(model_graph, rule_reader)
+    print(f"random graphs: {num_matches} matches are the same as VF2")
@@ -0,0 +1,56 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Test the prediction server on localhost. Usage: python tests/unit_test/test_prediction_server.py [<predictor-name>]
+import sys
+import json
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from nn_meter import load_latency_predictor
+from nn_meter.predictor.prediction_server import PredictionServer
+
+
+def post(url, content):
+    request = urllib.request.Request(
+        url, data=json.dumps(content).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+if __name__ == '__main__':
+    predictor_name = sys.argv[1] if len(sys.argv) > 1 else "cortexA76cpu_tflite21"
+    model_file = "material/testmodels/mobilenetv3small_0.json"
+    predictor = load_latency_predictor(predictor_name)
+    with open(model_file, "r") as fp:
+        graph = json.load(fp)
+
+    # build some variants of the test model with different input resolution of the first conv
+    graphs = []
+    for hw in [224, 192, 160, 128]:
+        variant = json.loads(json.dumps(graph))
+        variant["conv1.conv/Conv2D"]["attr"]["input_shape"] = [[1, hw, hw, 3]]
+        graphs.append(variant)
+    expected = [predictor.predict(g, "nnmeter-ir") for g in graphs]
+
+    server = PredictionServer({predictor_name: predictor}, ("127.0.0.1", 0), batch_window=0.05)
+    server.start()
+    url = "http://%s:%d" % server.server_address[:2]
+    try:
+        with ThreadPoolExecutor(16) as pool:
+            results = list(pool.map(lambda i: post(url + "/predict", {"model": graphs[i % 4]}), range(32)))
+        for i, result in enumerate(results):
+            assert result["latency"] == expected[i % 4], (result, expected[i % 4])
+
+        result = post(url + "/predict", {"model": model_file, "model_type": "nnmeter-ir", "predictor": predictor_name})
+        assert result["latency"] == expected[0]
+
+        with urllib.request.urlopen(url + "/stats") as response:
+            stats = json.loads(response.read())[predictor_name]
+        assert stats["requests"] == 33 and stats["errors"] == 0
+        assert stats["batches"] < 33, "requests are not coalesced"
+        print(stats)
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("test prediction server: pass")
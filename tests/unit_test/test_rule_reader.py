@@ -0,0 +1,50 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Check that the compiled fusion rules are cached by the rule file content, and that the fusible matrix and rule flags
+# are the same as given by the rules.
+# Usage: python tests/unit_test/test_rule_reader.py
+import os
+import json
+import time
+import tempfile
+import itertools
+from nn_meter.kernel_detector import KernelDetector
+from nn_meter.kernel_detector.rule_reader import RuleReader, compile_fusion_rules
+
+
+RULES = {
+    "BF_conv_bn": {"obey": True},
+    "BF_conv_relu": {"obey": True},
+    "BF_bn_relu": {"obey": False},
+    "BF_add_relu": {"obey": True},
+    "BF_conv_bn_relu": {"obey": True},
+    "MON": {"obey": 1},
+    "FN": {"obey": None},
+}
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmpdir:
+        rule_file, same_file, other_file = [os.path.join(tmpdir, f"fusion_rules_{i}.json") for i in range(3)]
+        for filename, rules in [(rule_file, RULES), (same_file, RULES), (other_file, {**RULES, "MON": {"obey": 0}})]:
+            with open(filename, "w") as fp:
+                json.dump(rules, fp)
+
+        compiled = compile_fusion_rules(rule_file)
+        assert compile_fusion_rules(same_file) is compiled
+        assert compile_fusion_rules(other_file) is not compiled
+        assert RuleReader(rule_file).compiled is compiled
+
+        pairs = {("conv", "bn"), ("conv", "relu"), ("add", "relu")}
+        types = ["conv", "bn", "relu", "add", "dwconv", "unknown"]
+        for node_type, outnode_type in itertools.product(types, types):
+            assert compiled.is_fusible(node_type, outnode_type) == ((node_type, outnode_type) in pairs)
+        assert compiled.query_rule("MON") == 1 and compiled.query_rule("FN") is True
+        assert compile_fusion_rules(other_file).query_rule("MON") == 0
+        assert set(compiled.fusion_units) == {"conv-bn-relu", "se", "hswish", "channelshuffle", "gap"}
+
+        since = time.time()
+        for _ in range(100):
+            KernelDetector(rule_file)
+        print(f"built 100 detectors of cached rules in {time.time() - since:.3f} s")
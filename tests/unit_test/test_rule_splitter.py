@@ -0,0 +1,104 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Check that `RuleSplitter.split` gives the same basic blocks and fusion graph as the previous stepping algorithm, with
+# MON=0 and MON=1, on the test models and on random DAGs.
+# Usage: python tests/unit_test/test_rule_splitter.py
+import os
+import copy
+import json
+import glob
+import random
+import tempfile
+from nn_meter.utils.graph_tool import ModelGraph
+from nn_meter.kernel_detector.rule_reader import RuleReader
+from nn_meter.kernel_detector.rule_splitter import RuleSplitter
+from nn_meter.kernel_detector.utils.ir_tools import convert_nodes
+from nn_meter.kernel_detector.utils.fusion_aware_graph import FusionAwareGraph
+from graph_helper import make_fusion_rules, write_rule_files, random_graph
+
+
+FUSION_RULES = make_fusion_rules([
+    ("conv", "bn"), ("conv", "relu"), ("bn", "relu"), ("dwconv", "bn"), ("dwconv", "relu"), ("add", "relu"),
+    ("relu", "add"), ("relu", "conv"), ("bn", "add"), ("conv", "hswish")
+])
+OP_TYPES = ["conv", "dwconv", "bn", "relu", "add", "hswish", "concat", "gap"]
+
+
+def legacy_split(splitter, model_graph):
+    """ the previous implementation of `RuleSplitter.split`
+    """
+    splitter.preprocess(model_graph)
+    fusion_graph = FusionAwareGraph(model_graph)
+
+    i = -1
+    while i < len(fusion_graph) - 1:
+        i += 1
+        if fusion_graph.is_fused(i):
+            continue
+        fusion_graph.mark_ready(i)
+        if not fusion_graph.get_outbounds(i):
+            continue
+        # MON
+        mon = splitter.rule_reader.query_rule("MON")
+        if mon == 0:  # can't fuse if having multiple out node
+            if len(fusion_graph.get_outbounds(i)) > 1:
+                continue
+        # FN: TODO: which one is the first node
+        fused = False
+        for j in fusion_graph.get_outbounds(i):
+            if fusion_graph.is_fused(j):
+                continue
+            outnode_type = fusion_graph.get_type(j)
+            node_type = fusion_graph.get_type(i)
+            if not splitter.rule_reader.is_fusible(node_type, outnode_type):
+                continue
+            # fuse node
+            if mon == 0:
+                fusion_graph.fuse(i, j)
+            else:
+                fusion_graph.fuse(i, j, True)
+            fusion_graph.mark_ready(j)
+            fused = True
+            if mon == 1:  # only fused to first outnode
+                break
+        if fused:
+            i -= 1
+
+    return fusion_graph, fusion_graph.get_basicblocks()
+
+
+def check_graph(graph, splitter):
+    model_graph = ModelGraph(graph=convert_nodes(graph), deepcopy=False)
+    model_graph.refresh()
+    legacy_graph = copy.deepcopy(model_graph)
+
+    bbs = splitter.split(model_graph)
+    fusion_graph = splitter._fusion_graph
+    expected_fusion_graph, expected_bbs = legacy_split(splitter, legacy_graph)
+    assert bbs == expected_bbs
+    # the outbounds should be the same sets, iterated in the same order
+    assert [list(outbounds) for outbounds in fusion_graph._outbounds] == \
+        [list(outbounds) for outbounds in expected_fusion_graph._outbounds]
+    assert fusion_graph._uf._parent == expected_fusion_graph._uf._parent
+    assert fusion_graph._ready == expected_fusion_graph._ready
+    return len(bbs)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmpdir:
+        splitters = [RuleSplitter(RuleReader(rule_file)) for rule_file in write_rule_files(tmpdir, FUSION_RULES)]
+
+    for mon, splitter in enumerate(splitters):
+        for model_file in glob.glob("material/testmodels/*.json"):
+            with open(model_file, "r") as fp:
+                num_bbs = check_graph(json.load(fp), splitter)
+            print(f"MON={mon} {os.path.basename(model_file)}: {num_bbs} basic blocks are the same")
+
+        rng = random.Random(mon)
+        num_bbs = 0
+        for _ in range(500):
+            graph = random_graph(rng.randint(2, 300), rng, OP_TYPES, chain_prob=0.8, branch_prob=0.5, max_branches=2,
+                                 window=10, with_shapes=False, shuffle=False)
+            num_bbs += check_graph(graph, splitter)
+        print(f"MON={mon} random DAGs: {num_bbs} basic blocks are the same")
@@ -0,0 +1,80 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+# Check that the kernels rebound from the cached templates of `KernelDetector` are the same as those detected from
+# scratch, on resolution and channel variants of the test model and of random graphs, and that the predicted latency is
+# the same.
+# Usage: python tests/unit_test/test_template_cache.py [<predictor-name>]
+import os
+import sys
+import json
+import random
+import tempfile
+from nn_meter import load_latency_predictor
+from nn_meter.kernel_detector import KernelDetector
+from nn_meter.kernel_detector.template_cache import hash_topology
+from nn_meter.kernel_detector.utils.ir_tools import convert_nodes
+from graph_helper import random_graph, write_rule_files, detect
+
+
+def rescale(graph, rng):
+    """ return a variant of the graph of the same topology, with random resolution, channels and kernel sizes
+    """
+    hw, cin, ks = rng.choice([224, 192, 160, 128]) / 224, rng.choice([0.5, 0.75, 1.0, 1.5]), rng.choice([3, 5, 7])
+
+    def scale_shape(shape):
+        if len(shape) == 4 and all(isinstance(dim, int) for dim in shape):
+            return [shape[0], max(1, int(shape[1] * hw)), max(1, int(shape[2] * hw)), max(1, int(shape[3] * cin))]
+        return shape
+
+    variant = json.loads(json.dumps(graph))
+    for node in variant.values():
+        attr = node["attr"]
+        for key in ["input_shape", "output_shape"]:
+            if key in attr:
+                attr[key] = [scale_shape(shape) for shape in attr[key]]
+        if "ks" in attr["attr"]:
+            attr["attr"]["ks"] = [ks, ks]
+    return variant
+
+
+def get_kernel_items(kernels):
+    """ return the kernels as lists of items to compare the key order as well
+    """
+    return None if kernels is None else [list(kernel.items()) for kernel in kernels]
+
+
+if __name__ == '__main__':
+    predictor_name = sys.argv[1] if len(sys.argv) > 1 else "cortexA76cpu_tflite21"
+    predictor = load_latency_predictor(predictor_name)
+    with open("material/testmodels/mobilenetv3small_0.json", "r") as fp:
+        graph = json.load(fp)
+    rng = random.Random(0)
+    variants = [rescale(graph, rng) for _ in range(8)]
+    assert len({hash_topology(convert_nodes(variant)) for variant in variants}) == 1
+
+    expected = [predictor.predict(variant, "nnmeter-ir") for variant in variants]
+    assert len(set(expected)) > 1
+    expected_kernels = [get_kernel_items(detect(predictor.kd, variant)) for variant in variants]
+    cache = predictor.enable_detection_cache()
+    assert [predictor.predict(variant, "nnmeter-ir") for variant in variants] == expected
+    assert [get_kernel_items(detect(predictor.kd, variant)) for variant in variants] == expected_kernels
+    assert cache.stats()["misses"] == 1 and len(cache) == 1
+    predictor.disable_detection_cache()
+    print(f"test template cache on variants of the test model: pass, {cache.stats()}")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for rule_file in write_rule_files(tmpdir):
+            for compact in [False, True]:
+                kd = KernelDetector(rule_file, compact=compact)
+                cached_kd = KernelDetector(rule_file, compact=compact)
+                cache = cached_kd.enable_template_cache()
+                num_kernels = 0
+                for _ in range(200):
+                    graph = random_graph(rng.randint(2, 100), rng)
+                    for variant in [graph] + [rescale(graph, rng) for _ in range(3)]:
+                        kernels = get_kernel_items(detect(kd, variant))
+                        assert get_kernel_items(detect(cached_kd, variant)) == kernels
+                        num_kernels += len(kernels or [])
+                print(f"{os.path.basename(rule_file)} compact={compact}: {num_kernels} kernels are the same, "
+                      f"{cache.stats()}")